@@ -15,6 +15,8 @@
 # Quick sample generator. We are using Unix tools instead of raw /proc data
 # for having a chance to work both on GNU/Linux and MacOSX.
 # Some of commands below might require small change to work on your platform.
+# On GNU/Linux, src/python/analyzer/collector.py reads the same metrics from
+# /proc without spawning any process.
 
 for i in `seq 1000`; do
   timestamp=`date +%s`
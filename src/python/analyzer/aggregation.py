@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+"""Aggregation of OpenTSDB dumps into a host x feature matrix, ported from
+the Clojure prototype (mg.core). Dumps are made of lines such as:
+
+    sys.cpu.user 1356998400 42.5 web01
+    put sys.cpu.user 1356998400 42.5 host=web01 cpu=0
+
+Metric and host names are interned to integer ids in order of appearance,
+and the count, sum, min and max of the values of every (host, metric)
+pair are accumulated into numpy arrays, chunk by chunk, in a single pass
+over the dump: values of a chunk are grouped by (host, metric) with a
+sort, and every group is reduced at once. The mean is derived from the sum
+and the count."""
+
+import sys
+import numpy
+from itertools import islice
+from optparse import OptionParser
+from sampleloader import CHUNK_SIZE, LoadReport
+
+AGGREGATES = ['sum', 'min', 'max', 'mean']
+
+
+class Interner(object):
+    """Maps names to consecutive integer ids, in order of appearance"""
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        """Get the id of a name, giving it a new one if needed"""
+
+        id = self.ids.get(name)
+        if id is None:
+            id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return id
+
+    def intern_all(self, names):
+        """Get the ids of a list of names, as an array"""
+
+        get = self.ids.get
+        ids = [get(name) for name in names]
+        if None in ids:
+            ids = [self.intern(name) for name in names]
+        return numpy.array(ids, dtype=numpy.intp)
+
+
+def parse_line(line):
+    """Parse a line into a (metric, host, value) tuple. Raise a ValueError
+       if the line is invalid."""
+
+    fields = line.split()
+    if fields and fields[0] == 'put':
+        fields = fields[1:]
+    if len(fields) < 4:
+        raise ValueError('expected at least 4 fields: %r' % line)
+    host = fields[3]
+    for tag in fields[3:]:
+        if tag.startswith('host='):
+            host = tag
+    return fields[0], host_name(host), float(fields[2])
+
+
+def host_name(field):
+    """Get the host of a 'host=name' tag, or of a bare host field"""
+
+    if field.startswith('host='):
+        return field[5:]
+    return field
+
+
+class HostMetricAggregator(object):
+    """Accumulates count, sum, min and max of values by (host, metric) into
+       (hosts x metrics) arrays. Arrays are allocated for 'hosts' hosts
+       and 'metrics' metrics, and grown by doubling when needed."""
+
+    def __init__(self, hosts=1024, metrics=16):
+        self.hosts = Interner()
+        self.metrics = Interner()
+        self.report = LoadReport()
+        self.count = numpy.zeros((hosts, metrics))
+        self.sum = numpy.zeros((hosts, metrics))
+        self.min = numpy.empty((hosts, metrics))
+        self.max = numpy.empty((hosts, metrics))
+        self.min.fill(numpy.inf)
+        self.max.fill(-numpy.inf)
+
+    def reserve(self, hosts, metrics):
+        """Grow arrays so that they hold at least 'hosts' x 'metrics'"""
+
+        rows, columns = self.count.shape
+        if hosts <= rows and metrics <= columns:
+            return
+        while rows < hosts:
+            rows *= 2
+        while columns < metrics:
+            columns *= 2
+        for name, fill in [('count', 0), ('sum', 0), ('min', numpy.inf),
+                           ('max', -numpy.inf)]:
+            old = getattr(self, name)
+            new = numpy.empty((rows, columns))
+            new.fill(fill)
+            new[:old.shape[0], :old.shape[1]] = old
+            setattr(self, name, new)
+
+    def add(self, metric, host, value):
+        """Add a single value"""
+
+        h = self.hosts.intern(host)
+        m = self.metrics.intern(metric)
+        self.reserve(h + 1, m + 1)
+        self.count[h, m] += 1
+        self.sum[h, m] += value
+        self.min[h, m] = min(self.min[h, m], value)
+        self.max[h, m] = max(self.max[h, m], value)
+
+    def add_lines(self, lines):
+        """Parse and add a chunk of lines at once. Lines are expected as
+           'metric timestamp value host' first, and parsed one by one only
+           if some are not."""
+
+        rows = [line.split() for line in lines]
+        try:
+            metrics = [row[0] for row in rows]
+            hosts = [host_name(row[3]) for row in rows]
+            values = numpy.array([float(row[2]) for row in rows])
+            if 'put' in metrics or any(len(row) != 4 for row in rows):
+                raise ValueError
+        except (IndexError, ValueError):
+            metrics, hosts, values = [], [], []
+            for line in lines:
+                if not line.strip():
+                    continue
+                self.report.lines += 1
+                try:
+                    metric, host, value = parse_line(line)
+                except ValueError:
+                    self.report.reject(self.report.lines, line)
+                    continue
+                metrics.append(metric)
+                hosts.append(host)
+                values.append(value)
+            values = numpy.array(values)
+        else:
+            self.report.lines += len(rows)
+        if len(values) == 0:
+            return
+        h = self.hosts.intern_all(hosts)
+        m = self.metrics.intern_all(metrics)
+        self.reserve(len(self.hosts), len(self.metrics))
+        # Group values by (host, metric) cell, then reduce every group
+        cells = h * self.count.shape[1] + m
+        order = numpy.argsort(cells, kind='mergesort')
+        cells = cells[order]
+        values = values[order]
+        starts = numpy.flatnonzero(numpy.concatenate(
+            ([True], cells[1:] != cells[:-1])))
+        cells = cells[starts]
+        count, total = self.count.reshape(-1), self.sum.reshape(-1)
+        low, high = self.min.reshape(-1), self.max.reshape(-1)
+        count[cells] += numpy.diff(numpy.append(starts, len(values)))
+        total[cells] += numpy.add.reduceat(values, starts)
+        low[cells] = numpy.minimum(low[cells],
+                                   numpy.minimum.reduceat(values, starts))
+        high[cells] = numpy.maximum(high[cells],
+                                    numpy.maximum.reduceat(values, starts))
+
+    def load(self, path, chunk_size=CHUNK_SIZE):
+        """Aggregate a whole dump, reading it by chunks of lines"""
+
+        f = open(path, 'r')
+        try:
+            while True:
+                lines = list(islice(f, chunk_size))
+                if not lines:
+                    break
+                self.add_lines(lines)
+        finally:
+            f.close()
+        return self
+
+    def aggregate(self, name):
+        """Get the (hosts x metrics) array of an aggregate. Pairs without
+           any value get NaN."""
+
+        hosts, metrics = len(self.hosts), len(self.metrics)
+        count = self.count[:hosts, :metrics]
+        if name == 'mean':
+            result = self.sum[:hosts, :metrics] / numpy.maximum(count, 1)
+        elif name in ['sum', 'min', 'max']:
+            result = getattr(self, name)[:hosts, :metrics].copy()
+        else:
+            raise ValueError('unknown aggregate: %s' % name)
+        result[count == 0] = numpy.nan
+        return result
+
+    def matrix(self, aggregates=('mean',)):
+        """Build the feature matrix: one row per host, one column per
+           aggregate of every metric, named '<aggregate>-<metric>'. As with
+           the joins of mg.core, hosts missing a metric are left out.
+           Returns the matrix, its host names and its column names."""
+
+        columns = ['%s-%s' % (aggregate, metric)
+                   for metric in self.metrics.names
+                   for aggregate in aggregates]
+        arrays = [self.aggregate(aggregate) for aggregate in aggregates]
+        X = numpy.dstack(arrays).reshape(len(self.hosts), len(columns))
+        complete = self.count[:len(self.hosts), :len(self.metrics)] \
+            .all(axis=1)
+        hosts = [host for host, keep in zip(self.hosts.names, complete)
+                 if keep]
+        return X[complete], hosts, columns
+
+
+def rescale(X):
+    """Rescale every column of X into [0, 1]. Constant columns become 0."""
+
+    X = numpy.asarray(X, dtype=float)
+    low = X.min(axis=0)
+    span = X.max(axis=0) - low
+    span[span == 0] = numpy.inf
+    return (X - low) / span
+
+
+def parse_args(argv):
+    parser = OptionParser(usage='%prog [options] INPUT [THRESHOLD]',
+                          description='Find outlier hosts of an OpenTSDB '
+                          'dump.')
+    parser.add_option('-a', '--aggregates', dest='aggregates',
+                      default='mean',
+                      help='Comma-separated aggregates of every metric to '
+                      'use as features, among: %s (default: %%default).'
+                      % ', '.join(AGGREGATES))
+    parser.add_option('-o', '--output', dest='output',
+                      help='Also write the feature matrix into this file.')
+    (options, args) = parser.parse_args(args=argv)
+    if len(args) not in [1, 2]:
+        parser.print_help()
+        sys.exit(1)
+    options.aggregates = options.aggregates.split(',')
+    unknown = [name for name in options.aggregates
+               if name not in AGGREGATES]
+    if unknown:
+        parser.error('unknown aggregates: %s' % ', '.join(unknown))
+    return (options, args)
+
+
+if __name__ == "__main__":
+    from gaussian import DEFAULT_THRESHOLD, MultivariateGaussian
+    (options, args) = parse_args(sys.argv[1:])
+    epsilon = DEFAULT_THRESHOLD
+    if len(args) == 2:
+        epsilon = float(args[1])
+    aggregator = HostMetricAggregator().load(args[0])
+    if aggregator.report.bad_lines > 0:
+        print(aggregator.report)
+    A, hosts, columns = aggregator.matrix(options.aggregates)
+    if options.output:
+        numpy.savetxt(options.output, A, header=' '.join(columns))
+    print('Metrics: %d, hosts: %d' % (len(aggregator.metrics), len(hosts)))
+    if len(hosts) < 2:
+        sys.exit(0)
+    X = rescale(A)
+    p = rescale(MultivariateGaussian().fit(X).pdf(X)[:, numpy.newaxis])
+    outliers = numpy.nonzero(p[:, 0] < epsilon)[0]
+    print('Outliers: %d' % len(outliers))
+    for i in outliers:
+        print('%g %s' % (p[i, 0], hosts[i]))
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+"""Approximate hierarchical clustering of series too long to be clustered
+exactly.
+
+Exact clustering needs O(n^2) memory and time at least, which a month of
+5-second samples cannot afford. Instead, a uniform sample of at most
+'sample_size' vectors is kept while they arrive (reservoir sampling), and
+only the sample is clustered. Every vector is then labelled like the
+nearest vector of the sample, by blocks of rows, in a second pass over the
+input: vectors are not kept, so that memory and time are bounded by the
+sample size. compare() reports how close the result is to exact clustering,
+on inputs small enough for it."""
+
+import random
+import numpy
+from array import array
+from clustering import Dendrogram, linkage
+from distances import block_size, cdist
+
+SAMPLE_SIZE = 2000
+
+
+class Reservoir(object):
+    """Uniform sample of at most 'size' items of a stream (algorithm R).
+       'indices' are the positions of the sampled items in the stream."""
+
+    def __init__(self, size, seed=None):
+        self.size = size
+        self.random = random.Random(seed)
+        self.items = []
+        self.indices = []
+        self.seen = 0
+
+    def add(self, item):
+        """Offer an item to the sample"""
+
+        if len(self.items) < self.size:
+            self.items.append(item)
+            self.indices.append(self.seen)
+        else:
+            slot = self.random.randint(0, self.seen)
+            if slot < self.size:
+                self.items[slot] = item
+                self.indices[slot] = self.seen
+        self.seen += 1
+
+
+def assign(X, points, labels, metric='sqeuclidean'):
+    """Label every row of X like its nearest row of 'points'. X is processed
+       by blocks of rows, to bound memory by the number of points."""
+
+    X = numpy.atleast_2d(numpy.asarray(X, dtype=float))
+    points = numpy.atleast_2d(numpy.asarray(points, dtype=float))
+    labels = numpy.asarray(labels)
+    result = numpy.empty(len(X), dtype=labels.dtype)
+    step = block_size(len(points), X.shape[1])
+    for start in range(0, len(X), step):
+        distances = cdist(X[start:start + step], points, metric)
+        result[start:start + step] = labels[distances.argmin(axis=1)]
+    return result
+
+
+class ApproximateClustering(object):
+    """Clusters vectors of 'dimension' features through a sample of at most
+       'sample_size' of them. Only the sample is kept: vectors are labelled
+       afterwards, by blocks, against the sampled vectors (see labels())."""
+
+    def __init__(self, dimension, sample_size=SAMPLE_SIZE, seed=None):
+        self.dimension = dimension
+        self.reservoir = Reservoir(sample_size, seed)
+
+    def __len__(self):
+        return self.reservoir.seen
+
+    def add(self, vector):
+        """Offer a vector to the sample"""
+
+        if len(vector) != self.dimension:
+            raise ValueError('expected %d features, got %d'
+                             % (self.dimension, len(vector)))
+        self.reservoir.add(array('d', vector))
+
+    def sample(self):
+        """Get the positions of the sampled vectors, in order, and the
+           (sample x dimension) matrix of these vectors"""
+
+        order = sorted(range(len(self.reservoir.indices)),
+                       key=self.reservoir.indices.__getitem__)
+        indices = numpy.array([self.reservoir.indices[i] for i in order],
+                              dtype=int)
+        points = numpy.array([self.reservoir.items[i] for i in order],
+                             dtype=float).reshape(-1, self.dimension)
+        return indices, points
+
+    def dendrogram(self, method='median', metric='sqeuclidean'):
+        """Cluster the sample. The positions of the sampled vectors and the
+           vectors themselves are kept in the dendrogram data, as 'indices'
+           and 'points'."""
+
+        indices, points = self.sample()
+        Z = linkage(points, method, metric)
+        return Dendrogram(Z, {'indices': indices, 'points': points})
+
+    def labels(self, dendrogram, X, k=2, threshold=None,
+               metric='sqeuclidean'):
+        """Label a block of vectors X by cutting the dendrogram of the sample
+           (see Dendrogram.cut) and assigning vectors to their nearest sampled
+           vector."""
+
+        if threshold is not None:
+            k = None
+        X = numpy.asarray(X, dtype=float).reshape(-1, self.dimension)
+        points = dendrogram.data['points']
+        if len(points) < 2:
+            return numpy.zeros(len(X), dtype=int)
+        return assign(X, points, dendrogram.cut(k, threshold), metric)
+
+
+def rand_index(a, b):
+    """Rand index and adjusted Rand index of two flat clusterings: the
+       fraction of pairs of points on which both agree (being in the same
+       cluster or not), and the same corrected for chance (1 for identical
+       clusterings, around 0 for independent ones)."""
+
+    a = numpy.unique(numpy.asarray(a), return_inverse=True)[1].ravel()
+    b = numpy.unique(numpy.asarray(b), return_inverse=True)[1].ravel()
+    n = len(a)
+    pairs = lambda counts: (counts * (counts - 1) / 2.0).sum()
+    contingency = numpy.bincount(a * (b.max() + 1) + b).astype(float)
+    both = pairs(contingency)
+    in_a = pairs(numpy.bincount(a).astype(float))
+    in_b = pairs(numpy.bincount(b).astype(float))
+    total = n * (n - 1) / 2.0
+    if total == 0:
+        return 1.0, 1.0
+    rand = (total + 2 * both - in_a - in_b) / total
+    expected = in_a * in_b / total
+    maximum = (in_a + in_b) / 2.0
+    if maximum == expected:
+        return rand, 1.0
+    return rand, (both - expected) / (maximum - expected)
+
+
+def compare(X, sample_size=SAMPLE_SIZE, k=2, threshold=None,
+            method='median', metric='sqeuclidean', seed=None, labels=None):
+    """Cluster X both exactly and approximately, and report how close they
+       are. Only meant for inputs small enough to be clustered exactly.
+       'labels' are the approximate labels of X, if they are known already:
+       no other sample is drawn then."""
+
+    X = numpy.atleast_2d(numpy.asarray(X, dtype=float))
+    exact = Dendrogram(linkage(X, method, metric))
+    if threshold is not None:
+        k = None
+    expected = exact.cut(k, threshold)
+    if labels is None:
+        approximate = ApproximateClustering(X.shape[1], sample_size, seed)
+        for vector in X:
+            approximate.add(vector)
+        labels = approximate.labels(approximate.dendrogram(method, metric),
+                                    X, k, threshold, metric)
+    actual = numpy.asarray(labels, dtype=int)
+    rand, adjusted = rand_index(expected, actual)
+    return {'points': len(X), 'sample': min(sample_size, len(X)),
+            'rand_index': rand, 'adjusted_rand_index': adjusted,
+            'exact_sizes': numpy.bincount(expected).tolist(),
+            'approximate_sizes': numpy.bincount(actual).tolist()}
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+"""Analyze many series at once, spreading them over a pool of processes.
+
+Every series gets its own file of anomalies, and one line into a merged
+summary.tsv file. Aligned series, sharing the same timestamps, can also be
+analyzed together by a MultiSeriesClassifier."""
+
+import os
+import math
+import sys
+import glob
+import multiprocessing
+import numpy
+from optparse import OptionParser
+from superlist import SuperList
+from numericringbuffer import NumericRingBuffer
+from multiringbuffer import MultiSeriesClassifier
+from onlineclustering import OnlineClustering
+from features import FeatureExtractor
+from sampleloader import LoadReport, load
+
+WINDOW_SIZE = 20
+PERCENTAGES = [50, 90, 99]
+COLUMNS = ['series', 'samples', 'ignored', 'min', 'mean', 'max'] + \
+    ['p%d' % p for p in PERCENTAGES] + ['anomalies']
+
+
+def find_series(patterns):
+    """Expand files, directories (all their .sample files) and glob patterns
+       into a sorted list of files."""
+
+    result = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            result.update(glob.glob(os.path.join(pattern, '*.sample')))
+        else:
+            result.update(path for path in glob.glob(pattern)
+                          if os.path.isfile(path))
+    return sorted(result)
+
+
+def series_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def series_names(paths):
+    """Name series after their path relative to the deepest directory
+       holding all of them, without extension and with separators replaced
+       by dots: series of a single directory are named after their file.
+       Raise a ValueError if two series would get the same name."""
+
+    parts = [os.path.abspath(path).split(os.sep) for path in paths]
+    common = len(os.path.commonprefix([p[:-1] for p in parts]))
+    names = [os.path.splitext('.'.join(p[common:]))[0] for p in parts]
+    seen = {}
+    for path, name in zip(paths, names):
+        if name in seen:
+            raise ValueError('%s and %s would both be named %s'
+                             % (seen[name], path, name))
+        seen[name] = path
+    return names
+
+
+def analyze(path, output, window_size=WINDOW_SIZE, name=None):
+    """Analyze one series: write its anomalies (timestamp and value) into
+       the output folder, and return its row of the summary. The series is
+       named after its file by default."""
+
+    report = LoadReport()
+    timestamps, values = load(path, report=report)
+    if name is None:
+        name = series_name(path)
+    row = summarize(name, values, report)
+    buffer = NumericRingBuffer(window_size)
+    extractor = FeatureExtractor(buffer)
+    model = OnlineClustering()
+    anomalies = []
+    for timestamp, value in zip(timestamps, values):
+        buffer.append(value, timestamp)
+        if buffer.size > 1:
+            if model.classify(extractor.vector()):
+                anomalies.append('%d %s\n' % (timestamp, value))
+    write_anomalies(output, row, anomalies)
+    return row
+
+
+def summarize(name, values, report):
+    """Get the row of the summary of a series, but for its anomalies"""
+
+    row = {'series': name, 'samples': len(values),
+           'ignored': report.bad_lines, 'anomalies': 0}
+    if len(values) > 0:
+        sl = SuperList(values)
+        row['min'] = sl.percentage(0)
+        row['max'] = sl.percentage(100)
+        row['mean'] = math.fsum(values) / len(values)
+        for p, value in zip(PERCENTAGES, sl.percentages(PERCENTAGES)):
+            row['p%d' % p] = value
+    return row
+
+
+def write_anomalies(output, row, anomalies):
+    """Write the anomalies of a series, and count them into its row"""
+
+    f = open(os.path.join(output, row['series'] + '.anomalies.dat'), 'w')
+    f.write(''.join(anomalies))
+    f.close()
+    row['anomalies'] = len(anomalies)
+
+
+def analyze_task(task):
+    """Pool entry point"""
+
+    return analyze(*task)
+
+
+def run(paths, output, workers=None, chunksize=1, window_size=WINDOW_SIZE):
+    """Analyze every series with a pool of 'workers' processes (one per CPU
+       by default), giving them 'chunksize' series at a time. Returns the
+       summary rows, sorted by series name (see series_names)."""
+
+    tasks = [(path, output, window_size, name)
+             for path, name in zip(paths, series_names(paths))]
+    pool = multiprocessing.Pool(workers)
+    try:
+        rows = list(pool.imap_unordered(analyze_task, tasks, chunksize))
+    finally:
+        pool.close()
+        pool.join()
+    rows.sort(key=lambda row: row['series'])
+    write_summary(rows, os.path.join(output, 'summary.tsv'))
+    return rows
+
+
+def run_aligned(paths, output, window_size=WINDOW_SIZE):
+    """Analyze series sharing the same timestamps together: features of
+       all of them are computed at once by a MultiSeriesClassifier, in the
+       current process. Returns the summary rows, sorted by series name.
+       Raise a ValueError if series are not aligned."""
+
+    names = series_names(paths)
+    rows, columns = [], []
+    for path, name in zip(paths, names):
+        report = LoadReport()
+        timestamps, values = load(path, report=report)
+        if columns and list(timestamps) != list(columns[0][0]):
+            raise ValueError('%s is not aligned with %s' % (path, paths[0]))
+        rows.append(summarize(name, values, report))
+        columns.append((timestamps, values))
+    anomalies = [[] for path in paths]
+    if columns:
+        timestamps = columns[0][0]
+        matrix = numpy.column_stack([values for t, values in columns])
+        classifier = MultiSeriesClassifier(len(paths), window_size)
+        for timestamp, values in zip(timestamps, matrix):
+            labels = classifier.add(values, timestamp)
+            if labels is None:
+                continue
+            for i in numpy.flatnonzero(labels):
+                anomalies[i].append('%d %s\n' % (timestamp, values[i]))
+    for row, lines in zip(rows, anomalies):
+        write_anomalies(output, row, lines)
+    rows.sort(key=lambda row: row['series'])
+    write_summary(rows, os.path.join(output, 'summary.tsv'))
+    return rows
+
+
+def write_summary(rows, path):
+    lines = ['\t'.join(COLUMNS) + '\n']
+    for row in rows:
+        lines.append('\t'.join(str(row.get(column, ''))
+                               for column in COLUMNS) + '\n')
+    f = open(path, 'w')
+    f.write(''.join(lines))
+    f.close()
+
+
+def parse_args(argv):
+    parser = OptionParser(usage='%prog [options] OUTPUT_FOLDER SERIES...',
+                          description='Analyze many series in parallel. '
+                          'SERIES are files, directories or glob patterns.')
+    parser.add_option('-j', '--workers', dest='workers', type='int',
+                      help='Number of processes, one per CPU by default.')
+    parser.add_option('-c', '--chunksize', dest='chunksize', type='int',
+                      default=1,
+                      help='Number of series given to a process at once.')
+    parser.add_option('-w', '--window', dest='window', type='int',
+                      default=WINDOW_SIZE,
+                      help='Size of the window features are computed on.')
+    parser.add_option('-a', '--aligned', dest='aligned', action='store_true',
+                      default=False,
+                      help='Series share the same timestamps: analyze them '
+                      'together, in a single process, computing features '
+                      'of all of them at once.')
+    (options, args) = parser.parse_args(args=argv)
+    if len(args) < 2:
+        parser.print_help()
+        sys.exit(1)
+    return (options, args)
+
+
+if __name__ == "__main__":
+    (options, args) = parse_args(sys.argv[1:])
+    output = args[0]
+    paths = find_series(args[1:])
+    if not paths:
+        print('No series found.')
+        sys.exit(2)
+    try:
+        series_names(paths)
+    except ValueError as e:
+        print(e)
+        sys.exit(2)
+    if not os.path.isdir(output):
+        os.makedirs(output)
+    if options.aligned:
+        try:
+            rows = run_aligned(paths, output, options.window)
+        except ValueError as e:
+            print(e)
+            sys.exit(2)
+    else:
+        rows = run(paths, output, options.workers, options.chunksize,
+                   options.window)
+    print('%d series analyzed, %d anomalies, summary in %s'
+          % (len(rows), sum(row['anomalies'] for row in rows),
+             os.path.join(output, 'summary.tsv')))
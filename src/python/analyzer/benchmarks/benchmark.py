@@ -0,0 +1,360 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks of the analyzer data structures and clustering.
+
+Every benchmark runs its operation by batches at growing sizes (window,
+list or input sizes), on the values of samples/simple-metrics and on
+synthetic series. It reports throughput, percentiles of the latency of one
+operation (measured per batch) and the peak memory allocated, as JSON.
+
+Results can be compared against a previous run saved with --output: the
+exit status is 1 when a benchmark got slower than the tolerance. Runs with
+CPython or PyPy alike; benchmarks needing a missing module are skipped."""
+
+import os
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, parentdir)
+import sys
+import gc
+import json
+import math
+import time
+import random
+import fnmatch
+import platform
+import shutil
+import atexit
+import tempfile
+from optparse import OptionParser
+from ringbuffer import RingBuffer
+from numericringbuffer import NumericRingBuffer
+from superlist import SuperList
+from sampleloader import load
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+try:
+    import resource
+except ImportError:
+    resource = None
+
+timer = getattr(time, 'perf_counter', time.time)
+
+SAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(
+    parentdir))), 'samples', 'simple-metrics')
+BATCHES = 20
+TOLERANCE = 10.0
+BENCHMARKS = []
+TEMPORARY = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, TEMPORARY, True)
+
+
+def benchmark(name, sizes, batch=None):
+    """Register a benchmark. The decorated function gets a size and returns
+       a function running 'batch' operations (by default, as many as the
+       size) on the state it has set up."""
+
+    def register(function):
+        BENCHMARKS.append((name, sizes, batch, function))
+        return function
+    return register
+
+
+def sample_values():
+    """Values of every sample file, in order"""
+
+    values = []
+    for name in sorted(os.listdir(SAMPLES)):
+        if name.endswith('.sample'):
+            values.extend(load(os.path.join(SAMPLES, name))[1])
+    return values
+
+
+def synthetic(n, seed=42):
+    """Random walk with daily-like seasonality and a few spikes"""
+
+    rng = random.Random(seed)
+    level = 0.0
+    values = []
+    for i in range(n):
+        level += rng.gauss(0, 0.1)
+        value = level + math.sin(i * 2 * math.pi / 288) + rng.gauss(0, 0.2)
+        if rng.random() < 0.001:
+            value += 10
+        values.append(value)
+    return values
+
+
+def cycle(values, n):
+    """First n values of 'values' repeated"""
+
+    return (values * (n // len(values) + 1))[:n]
+
+
+VALUES = sample_values() + synthetic(20000)
+
+
+@benchmark('ringbuffer.append', [10, 100, 1000], 10000)
+def ringbuffer_append(size):
+    buffer = RingBuffer(size)
+    values = cycle(VALUES, 10000)
+
+    def run():
+        for x in values:
+            buffer.append(x)
+    return run
+
+
+def numeric_statistic(statistic):
+    """Append a value then compute 'statistic', as classifiers do"""
+
+    def setup(size):
+        buffer = NumericRingBuffer(size)
+        buffer.extend(VALUES[:size])
+        values = cycle(VALUES[size:], 1000)
+
+        def run():
+            for x in values:
+                buffer.append(x)
+                statistic(buffer)
+        return run
+    return setup
+
+
+for name, statistic in [
+        ('append', lambda buffer: None),
+        ('mean', lambda buffer: buffer.mean()),
+        ('variance', lambda buffer: buffer.variance()),
+        ('min', lambda buffer: buffer.min()),
+        ('max', lambda buffer: buffer.max()),
+        ('expected_value', lambda buffer: buffer.expected_value()),
+        ('shannon_entropy', lambda buffer: buffer.shannon_entropy()),
+        ('percentage', lambda buffer: buffer.percentage(90)),
+        ('slope', lambda buffer: buffer.slope()),
+        ('residual_variance', lambda buffer: buffer.residual_variance())]:
+    benchmark('numericringbuffer.' + name, [20, 200, 2000],
+              1000)(numeric_statistic(statistic))
+
+
+@benchmark('superlist.percentage', [1000, 10000, 100000], 1000)
+def superlist_percentage(size):
+    values = SuperList(cycle(VALUES, size))
+    values.sorted_view()
+
+    def run():
+        for p in range(1000):
+            values.percentage(p / 10.0)
+    return run
+
+
+@benchmark('superlist.percentage_lower_than', [1000, 10000, 100000], 1000)
+def superlist_percentage_lower_than(size):
+    values = SuperList(cycle(VALUES, size))
+    queries = VALUES[:1000]
+    values.sorted_view()
+
+    def run():
+        for x in queries:
+            values.percentage_lower_than(x)
+    return run
+
+
+@benchmark('superlist.append_percentage', [1000, 10000], 10)
+def superlist_append_percentage(size):
+    values = SuperList(cycle(VALUES, size))
+
+    def run():
+        for x in VALUES[:10]:
+            values.append(x)
+            values.percentage(90)
+    return run
+
+
+@benchmark('sampleloader.load', [10000, 100000])
+def sampleloader_load(size):
+    path = os.path.join(TEMPORARY, 'bench-%d.sample' % size)
+    f = open(path, 'w')
+    f.write(''.join('%d %s\n' % (1341056580 + 5 * i, repr(x))
+                    for i, x in enumerate(cycle(VALUES, size))))
+    f.close()
+
+    def run():
+        load(path)
+    return run
+
+
+def load_classifier():
+    """Import hierarchical-clustering.py, whose name is not a module name"""
+
+    path = os.path.join(parentdir, 'hierarchical-clustering.py')
+    try:
+        from importlib.machinery import SourceFileLoader
+        return SourceFileLoader('hierarchical_clustering', path).load_module()
+    except ImportError:
+        import imp
+        return imp.load_source('hierarchical_clustering', path)
+
+
+@benchmark('hierarchical.hcluster', [100, 300, 1000], 1)
+def hierarchical_hcluster(size):
+    module = load_classifier()
+    classifier = module.HierarchicalClassifier(TEMPORARY)
+    for x in VALUES[:size]:
+        classifier.add(x)
+
+    def run():
+        classifier.hcluster(classifier.vectors)
+    return run
+
+
+def percentile(values, p):
+    """Value under which are p% of the sorted 'values'"""
+
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+
+def peak_memory(run):
+    """Peak of memory allocated while running a batch, in bytes. Measured
+       with tracemalloc when available, else as the growth of the maximum
+       resident set size (which only shows new peaks of the process)."""
+
+    if tracemalloc is not None:
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+    if resource is not None:
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        run()
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return (after - before) * 1024
+    return None
+
+
+def measure(name, size, batch, setup, batches=BATCHES):
+    """Run a benchmark at one size and return its result"""
+
+    run = setup(size)
+    batch = batch or size
+    run()  # Warm up caches, and PyPy's JIT
+    gc.collect()
+    durations = []
+    for i in range(batches):
+        start = timer()
+        run()
+        durations.append(timer() - start)
+    latencies = sorted(d / batch for d in durations)
+    total = math.fsum(durations)
+    return {'name': name, 'size': size, 'ops': batch * batches,
+            'throughput': batch * batches / total if total else None,
+            'p50_us': percentile(latencies, 50) * 1e6,
+            'p90_us': percentile(latencies, 90) * 1e6,
+            'p99_us': percentile(latencies, 99) * 1e6,
+            'peak_bytes': peak_memory(run)}
+
+
+def run_all(patterns=('*',), quick=False, batches=BATCHES):
+    """Run matching benchmarks and return the report"""
+
+    results = []
+    for name, sizes, batch, setup in BENCHMARKS:
+        if not any(fnmatch.fnmatchcase(name, p) for p in patterns):
+            continue
+        if quick:
+            sizes = sizes[:1]
+        for size in sizes:
+            try:
+                result = measure(name, size, batch, setup, batches)
+            except ImportError as e:
+                sys.stderr.write('%s skipped: %s\n' % (name, e))
+                break
+            sys.stderr.write('%-40s %8d %14.1f ops/s  p50 %10.2f us\n'
+                             % (name, size, result['throughput'] or 0,
+                                result['p50_us']))
+            results.append(result)
+    return {'python': '%s %s' % (platform.python_implementation(),
+                                 platform.python_version()),
+            'machine': platform.machine(),
+            'results': results}
+
+
+def compare(report, baseline, tolerance=TOLERANCE):
+    """Print throughput changes against a baseline report. Return the
+       number of benchmarks slower by more than 'tolerance' percents."""
+
+    reference = dict(((r['name'], r['size']), r)
+                     for r in baseline['results'])
+    regressions = 0
+    print('Baseline: %s, current: %s' % (baseline['python'],
+                                         report['python']))
+    for result in report['results']:
+        old = reference.get((result['name'], result['size']))
+        if old is None or not old['throughput'] or not result['throughput']:
+            continue
+        change = 100.0 * (result['throughput'] / old['throughput'] - 1)
+        flag = ''
+        if change < -tolerance:
+            flag = '  REGRESSION'
+            regressions += 1
+        print('%-40s %8d %+8.1f%%%s' % (result['name'], result['size'],
+                                        change, flag))
+    return regressions
+
+
+def parse_args(argv):
+    parser = OptionParser(usage='%prog [options] [BENCHMARK_PATTERN...]',
+                          description='Benchmark the analyzers.')
+    parser.add_option('-o', '--output', dest='output',
+                      help='Write the JSON report to this file instead of '
+                      'the standard output.')
+    parser.add_option('-b', '--baseline', dest='baseline',
+                      help='Compare throughputs with this JSON report.')
+    parser.add_option('-t', '--tolerance', dest='tolerance', type='float',
+                      default=TOLERANCE,
+                      help='Slowdown percentage considered as a regression '
+                      '(default: %default).')
+    parser.add_option('-n', '--batches', dest='batches', type='int',
+                      default=BATCHES,
+                      help='Number of timed batches (default: %default).')
+    parser.add_option('-q', '--quick', dest='quick', action='store_true',
+                      default=False,
+                      help='Only run the smallest size of each benchmark.')
+    parser.add_option('-l', '--list', dest='list', action='store_true',
+                      default=False, help='List the benchmarks and exit.')
+    return parser.parse_args(args=argv)
+
+
+if __name__ == "__main__":
+    (options, args) = parse_args(sys.argv[1:])
+    if options.list:
+        for name, sizes, batch, setup in BENCHMARKS:
+            print('%s %s' % (name, ' '.join(str(size) for size in sizes)))
+        sys.exit(0)
+    report = run_all(args or ['*'], options.quick, options.batches)
+    if options.output:
+        f = open(options.output, 'w')
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.close()
+    elif not options.baseline:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    if options.baseline:
+        f = open(options.baseline)
+        baseline = json.load(f)
+        f.close()
+        if compare(report, baseline, options.tolerance):
+            sys.exit(1)
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+"""Time windows of several lengths over a single store of pre-aggregated
+buckets.
+
+Values are accumulated into buckets of fixed durations at several
+resolutions (for instance 5 seconds, 1 minute and 15 minutes), each level
+being a RingBuffer of its last buckets. A bucket holds the count, mean and
+sum of squared deviations (m2), min, max and histogram of its values, and
+buckets merge exactly, so the statistics of any time window are composed
+from a few of them: coarse buckets in its middle, finer ones at its edges.
+Raw values are not kept at all.
+
+Windows are defined by time, not by number of values: missing samples
+simply leave buckets empty (or absent), so gaps in sample files do not
+stretch windows over older data."""
+
+import math
+from features import DEFAULT_FEATURES, FeatureExtractor
+from ringbuffer import RingBuffer
+
+# (bucket duration in seconds, number of buckets) of every level
+DEFAULT_RESOLUTIONS = [(5, 240), (60, 180), (900, 96)]
+
+
+class Bucket(object):
+    """Statistics of the values of a time interval, identified by 'key':
+       its start divided by its duration. 'blur' is the one used for the
+       bins of its histogram.
+
+       Buckets offer the statistics of NumericRingBuffer that do not need
+       the values themselves, so that registered features built on them
+       (see features.py) can be extracted from buckets."""
+
+    __slots__ = ('key', 'blur', 'count', 'mean_value', 'm2', 'min_value',
+                 'max_value', 'histogram')
+
+    def __init__(self, key=None, blur=0):
+        self.key = key
+        self.blur = blur
+        self.count = 0
+        self.mean_value = 0.0
+        self.m2 = 0.0
+        self.min_value = None
+        self.max_value = None
+        self.histogram = {}
+
+    def add(self, x, bin):
+        """Account for value x, counted in the given histogram bin"""
+
+        self.count += 1
+        delta = x - self.mean_value
+        self.mean_value += delta / self.count
+        self.m2 += delta * (x - self.mean_value)
+        if self.min_value is None or x < self.min_value:
+            self.min_value = x
+        if self.max_value is None or x > self.max_value:
+            self.max_value = x
+        self.histogram[bin] = self.histogram.get(bin, 0) + 1
+
+    def merge(self, other):
+        """Account for the values of another bucket"""
+
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean_value - self.mean_value
+        self.mean_value += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count \
+            / count
+        self.count = count
+        if self.min_value is None or other.min_value < self.min_value:
+            self.min_value = other.min_value
+        if self.max_value is None or other.max_value > self.max_value:
+            self.max_value = other.max_value
+        for bin, n in other.histogram.items():
+            self.histogram[bin] = self.histogram.get(bin, 0) + n
+
+    @property
+    def appended(self):
+        """Number of values, which tells FeatureExtractor when they change"""
+
+        return self.count
+
+    def sum(self):
+        return self.mean_value * self.count
+
+    def mean(self):
+        return self.mean_value
+
+    def variance(self):
+        """Population variance"""
+
+        if self.count == 0: return 0.0
+        return max(0.0, self.m2 / self.count)
+
+    def min(self):
+        return self.min_value
+
+    def max(self):
+        return self.max_value
+
+    def expected_value(self):
+        if self.count == 0: return 0
+        return math.fsum(bin * n for bin, n in self.histogram.items()) \
+            / self.count
+
+    def shannon_entropy(self, base=2):
+        if len(self.histogram) < 2: return 0.0
+        n = float(self.count)
+        entropy = -math.fsum(c / n * math.log(c / n)
+                             for c in self.histogram.values())
+        return max(0.0, entropy / math.log(base))
+
+
+class BucketWindow(object):
+    """Multi-resolution store of buckets. Durations of 'resolutions' must
+       be increasing multiples of each other. 'blur' quantizes values of
+       histograms, as in NumericRingBuffer.
+
+       Values are expected in time order. A late value still updates its
+       buckets when the finest level holds its bucket, and is counted in
+       'dropped' otherwise."""
+
+    def __init__(self, resolutions=DEFAULT_RESOLUTIONS, blur=0):
+        unit = resolutions[0][0]
+        self.unit = unit
+        self.blur = blur
+        self.widths = []
+        self.levels = []
+        for width, size in resolutions:
+            ratio = width / float(unit)
+            if ratio != int(ratio) or (self.widths and
+                                       int(ratio) % self.widths[-1]):
+                raise ValueError('bucket durations must be multiples of '
+                                 'each other')
+            if self.widths and int(ratio) <= self.widths[-1]:
+                raise ValueError('bucket durations must be increasing')
+            self.widths.append(int(ratio))
+            self.levels.append(RingBuffer(size))
+        self.dropped = 0
+
+    def bin(self, x):
+        """Get the histogram bin 'x' falls into"""
+
+        if not self.blur:
+            return x
+        return math.floor(x / self.blur + 0.5) * self.blur
+
+    def position(self, level, key):
+        """Position (0 = most recent) of the first bucket of a level whose
+           key is not greater than 'key', or the size of the level"""
+
+        buffer = self.levels[level]
+        low, high = 0, buffer.size
+        while low < high:
+            middle = (low + high) // 2
+            if buffer.get(middle).key > key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def find(self, level, key):
+        """Get the bucket of a level with the given key, or None"""
+
+        buffer = self.levels[level]
+        position = self.position(level, key)
+        if position < buffer.size and buffer.get(position).key == key:
+            return buffer.get(position)
+        return None
+
+    def append(self, x, timestamp):
+        """Add value x, sampled at 'timestamp' (in seconds)"""
+
+        x = float(x)
+        unit = int(math.floor(timestamp / float(self.unit)))
+        last = self.levels[0].last()
+        if last is not None and unit < last.key and \
+           self.find(0, unit) is None:
+            self.dropped += 1
+            return
+        bin = self.bin(x)
+        for level, buffer in enumerate(self.levels):
+            key = unit // self.widths[level]
+            bucket = buffer.last()
+            if bucket is None or key > bucket.key:
+                bucket = Bucket(key, self.blur)
+                buffer.append(bucket)
+            elif key < bucket.key:
+                bucket = self.find(level, key)
+                if bucket is None:
+                    continue
+            bucket.add(x, bin)
+
+    def known_from(self, level):
+        """Smallest key whose bucket a level still knows about (buckets
+           older than the first value are known to be empty)"""
+
+        buffer = self.levels[level]
+        if buffer.size < buffer.max_size:
+            return None
+        return buffer.oldest().key
+
+    def knows(self, level, key):
+        start = self.known_from(level)
+        return start is None or key >= start
+
+    def plan(self, start, end):
+        """Decompose [start, end), in units of the finest duration, into
+           (level, first key, last key) runs of buckets: the coarsest
+           buckets that fit, and finer ones where they do not. If fine
+           buckets at the start were forgotten already, the window starts
+           at the start of a coarser bucket instead."""
+
+        runs = []
+        position = start
+        while position < end:
+            choice = None
+            for level in range(len(self.levels) - 1, -1, -1):
+                width = self.widths[level]
+                if position % width == 0 and position + width <= end and \
+                   self.knows(level, position // width):
+                    choice = level
+                    break
+            if choice is None:
+                for level in range(len(self.levels)):
+                    if self.knows(level, position // self.widths[level]):
+                        choice = level
+                        break
+            if choice is None:
+                raise ValueError('window longer than the stored history')
+            key = position // self.widths[choice]
+            if runs and runs[-1][0] == choice and runs[-1][2] == key - 1:
+                runs[-1] = (choice, runs[-1][1], key)
+            else:
+                runs.append((choice, key, key))
+            position = (key + 1) * self.widths[choice]
+        return runs
+
+    def window(self, length, end=None):
+        """Get a Bucket summarizing the values of the last 'length' seconds
+           (rounded up to the finest duration), up to 'end' (by default,
+           the end of the most recent bucket)."""
+
+        result = Bucket(blur=self.blur)
+        last = self.levels[0].last()
+        if last is None:
+            return result
+        if end is None:
+            end = last.key + 1
+        else:
+            end = int(math.ceil(end / float(self.unit)))
+        start = end - int(math.ceil(length / float(self.unit)))
+        for level, first, final in self.plan(start, end):
+            buffer = self.levels[level]
+            for position in range(self.position(level, final), buffer.size):
+                bucket = buffer.get(position)
+                if bucket.key < first:
+                    break
+                result.merge(bucket)
+        return result
+
+    def features(self, lengths, names=DEFAULT_FEATURES):
+        """Get the vector of the given registered features over windows of
+           every given length. Raise a ValueError for features needing more
+           than the statistics of a Bucket, such as percentiles or slopes."""
+
+        vector = []
+        for length in lengths:
+            extractor = FeatureExtractor(self.window(length), names)
+            for name in names:
+                try:
+                    vector.append(extractor.get(name))
+                except AttributeError:
+                    raise ValueError('feature %s cannot be computed from '
+                                     'buckets' % name)
+        return vector
@@ -0,0 +1,342 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+"""Agglomerative hierarchical clustering engine.
+
+The result is a SciPy-like linkage matrix 'Z' of (n - 1) rows: row 'i'
+merges clusters Z[i, 0] and Z[i, 1] (smallest id first) at distance
+Z[i, 2] into a cluster of Z[i, 3] points, which gets id n + i. Ids lower
+than n are the input points.
+
+Distances between clusters live in a condensed matrix (see distances.pdist,
+for the available metrics) and are updated with Lance-Williams formulas
+after each merge:
+
+  - single, complete and average linkages are reducible, and are built
+    with the nearest-neighbor chain algorithm, in O(n^2);
+  - median linkage (the merged vector is the average of both merged
+    vectors, whatever their sizes) is what the original classifier
+    computes. Merges may be inverted, so it keeps the nearest neighbor of
+    every cluster instead, which is O(n^2) in most cases. It only supports
+    euclidean and squared euclidean distances.
+
+Results are read from the matrix itself with iterative passes over its
+rows (see leaf_labels), trees of ClusterNode objects are only built on
+demand by to_tree. A Dendrogram keeps a matrix with data about its points,
+can be saved and loaded again, and cuts it into flat clusters in O(n)."""
+
+import numpy
+from distances import pdist
+
+METHODS = ['single', 'complete', 'average', 'median']
+
+
+def condensed_index(n, i, j):
+    """Index of distance (i, j) into a condensed matrix of n points"""
+
+    if i > j:
+        i, j = j, i
+    return n * i - i * (i + 1) // 2 + (j - i - 1)
+
+
+def row_indices(n, i):
+    """Indices of distances (i, k) for every k into a condensed matrix of n
+       points. Index of (i, i) is meaningless."""
+
+    k = numpy.arange(n)
+    low = numpy.minimum(k, i)
+    high = numpy.maximum(k, i)
+    result = n * low - low * (low + 1) // 2 + (high - low - 1)
+    result[i] = 0
+    return result
+
+
+def lance_williams(method, d_ik, d_jk, d_ij, size_i, size_j, size_k):
+    """Distances between the merge of clusters i and j and other clusters k"""
+
+    if method == 'single':
+        return numpy.minimum(d_ik, d_jk)
+    if method == 'complete':
+        return numpy.maximum(d_ik, d_jk)
+    if method == 'average':
+        return (size_i * d_ik + size_j * d_jk) / float(size_i + size_j)
+    if method == 'median':
+        return 0.5 * d_ik + 0.5 * d_jk - 0.25 * d_ij
+    raise ValueError('unknown method: %s' % method)
+
+
+def nn_chain(D, n, method):
+    """Nearest-neighbor chain algorithm. Returns the unsorted list of
+       (slot_i, slot_j, distance) merges: a slot is the index of the first
+       point of a cluster."""
+
+    active = numpy.ones(n, dtype=bool)
+    size = numpy.ones(n)
+    merges = []
+    chain = []
+    for step in range(n - 1):
+        if not chain:
+            chain.append(int(numpy.argmax(active)))
+        while True:
+            a = chain[-1]
+            row = D[row_indices(n, a)]
+            row[~active] = numpy.inf
+            row[a] = numpy.inf
+            b = int(numpy.argmin(row))
+            # Prefer the previous element of the chain on ties, so that the
+            # chain always ends on a pair of reciprocal nearest neighbors
+            if len(chain) > 1 and row[chain[-2]] <= row[b]:
+                b = chain[-2]
+            if len(chain) > 1 and b == chain[-2]:
+                break
+            chain.append(b)
+        a, b = chain.pop(), chain.pop()
+        i, j = min(a, b), max(a, b)
+        d_ij = D[condensed_index(n, i, j)]
+        merges.append((i, j, d_ij))
+        merge_slots(D, n, active, size, method, i, j, d_ij)
+    return merges
+
+
+def merge_slots(D, n, active, size, method, i, j, d_ij):
+    """Merge cluster of slot j into the one of slot i, updating distances"""
+
+    row_i = row_indices(n, i)
+    row_j = row_indices(n, j)
+    active[i] = active[j] = False
+    others = numpy.nonzero(active)[0]
+    D[row_i[others]] = lance_williams(method, D[row_i[others]],
+                                      D[row_j[others]], d_ij,
+                                      size[i], size[j], size[others])
+    active[i] = True
+    size[i] += size[j]
+    return row_i, others
+
+
+def generic(D, n, method):
+    """Merge the closest pair of clusters until only one is left, keeping the
+       nearest neighbor of every cluster. Returns merges in order."""
+
+    active = numpy.ones(n, dtype=bool)
+    size = numpy.ones(n)
+    nearest = numpy.zeros(n, dtype=int)
+    nearest_distance = numpy.empty(n)
+
+    def update_nearest(k):
+        row = D[row_indices(n, k)]
+        row[~active] = numpy.inf
+        row[k] = numpy.inf
+        nearest[k] = numpy.argmin(row)
+        nearest_distance[k] = row[nearest[k]]
+
+    for k in range(n):
+        update_nearest(k)
+    merges = []
+    for step in range(n - 1):
+        a = int(numpy.argmin(nearest_distance))
+        b = int(nearest[a])
+        i, j = min(a, b), max(a, b)
+        d_ij = D[condensed_index(n, i, j)]
+        merges.append((i, j, d_ij))
+        row_i, others = merge_slots(D, n, active, size, method, i, j, d_ij)
+        nearest_distance[j] = numpy.inf
+        if len(others) == 0:
+            break
+        update_nearest(i)
+        stale = others[(nearest[others] == i) | (nearest[others] == j)]
+        for k in stale:
+            update_nearest(k)
+        closer = others[D[row_i[others]] < nearest_distance[others]]
+        nearest[closer] = i
+        nearest_distance[closer] = D[row_i[closer]]
+    return merges
+
+
+def label(merges, n):
+    """Build the linkage matrix from (slot_i, slot_j, distance) merges given
+       in order."""
+
+    Z = numpy.zeros((n - 1, 4))
+    ids = numpy.arange(n)
+    size = numpy.ones(n)
+    for step, (i, j, d) in enumerate(merges):
+        a, b = ids[i], ids[j]
+        Z[step] = [min(a, b), max(a, b), d, size[i] + size[j]]
+        ids[i] = n + step
+        size[i] += size[j]
+    return Z
+
+
+def linkage(X, method='average', metric='euclidean', **params):
+    """Hierarchical clustering of rows of X. See module documentation.
+       Extra parameters are given to the metric."""
+
+    if method not in METHODS:
+        raise ValueError('unknown method: %s' % method)
+    if method == 'median' and metric not in ['euclidean', 'sqeuclidean']:
+        raise ValueError('median linkage needs euclidean distances')
+    n = len(X)
+    if n < 2:
+        return numpy.zeros((0, 4))
+    if method == 'median':
+        # Lance-Williams update is exact for median linkage on squared
+        # euclidean distances only. Taking the root afterwards keeps the
+        # same merges.
+        D = pdist(X, 'sqeuclidean')
+        merges = generic(D, n, method)
+        Z = label(merges, n)
+        if metric == 'euclidean':
+            numpy.sqrt(Z[:, 2], Z[:, 2])
+        return Z
+    D = pdist(X, metric, **params)
+    merges = nn_chain(D, n, method)
+    # Chain merges are not found in order of distance
+    merges.sort(key=lambda merge: merge[2])
+    return label(merges, n)
+
+
+def leaf_labels(Z, roots):
+    """Label every point with the index in 'roots' of the cluster (among
+       disjoint cluster ids) it belongs to, or -1. Done in one pass over Z,
+       from the last merge to the first."""
+
+    Z = numpy.asarray(Z)
+    n = len(Z) + 1
+    labels = [-1] * (2 * n - 1)
+    for index, root in enumerate(roots):
+        labels[int(root)] = index
+    for i in range(n - 2, -1, -1):
+        label = labels[n + i]
+        if label >= 0:
+            labels[int(Z[i, 0])] = label
+            labels[int(Z[i, 1])] = label
+    return numpy.array(labels[:n], dtype=int)
+
+
+class ClusterNode(object):
+    """Node of the tree of a linkage matrix. Leaves have no children and
+       keep the id of their point, other nodes have the id n + i of the row
+       of Z that built them."""
+
+    __slots__ = ('id', 'left', 'right', 'distance', 'count', 'vec')
+
+    def __init__(self, id, left=None, right=None, distance=0.0, count=1,
+                 vec=None):
+        self.id = id
+        self.left = left
+        self.right = right
+        self.distance = distance
+        self.count = count
+        self.vec = vec
+
+    def is_leaf(self):
+        return self.left is None
+
+
+def to_tree(Z, vectors=None):
+    """Build the tree of ClusterNode of a linkage matrix and return its
+       root. When the 'vectors' of the points are given, every node gets
+       one: the average of the vectors of its children, as in median
+       linkage."""
+
+    Z = numpy.asarray(Z)
+    n = len(Z) + 1
+    if vectors is None:
+        nodes = [ClusterNode(i) for i in range(n)]
+    else:
+        nodes = [ClusterNode(i, vec=numpy.asarray(vectors[i], dtype=float))
+                 for i in range(n)]
+    for i in range(n - 1):
+        left = nodes[int(Z[i, 0])]
+        right = nodes[int(Z[i, 1])]
+        vec = None
+        if vectors is not None:
+            vec = (left.vec + right.vec) / 2.0
+        nodes.append(ClusterNode(n + i, left, right, Z[i, 2], int(Z[i, 3]),
+                                 vec))
+    return nodes[-1]
+
+
+class Dendrogram(object):
+    """Linkage matrix 'Z' of a clustering, along with 'data': arrays of
+       values about its points (one value per point) stored with it."""
+
+    def __init__(self, Z, data=None):
+        self.Z = numpy.asarray(Z, dtype=float)
+        self.n = len(self.Z) + 1
+        self.data = dict((name, numpy.asarray(value))
+                         for name, value in (data or {}).items())
+        self.heights = None
+
+    def save(self, path):
+        """Save into a numpy .npz file (the extension is added if missing)"""
+
+        arrays = dict(('data_' + name, value)
+                      for name, value in self.data.items())
+        numpy.savez(path, Z=self.Z, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Load a dendrogram saved with save()"""
+
+        f = numpy.load(path)
+        try:
+            data = dict((name[5:], f[name]) for name in f.files
+                        if name.startswith('data_'))
+            return cls(f['Z'], data)
+        finally:
+            f.close()
+
+    def roots_after(self, merges):
+        """Ids of the clusters left after the first 'merges' merges"""
+
+        merged = numpy.zeros(self.n + merges, dtype=bool)
+        merged[self.Z[:merges, :2].astype(int).ravel()] = True
+        return numpy.nonzero(~merged)[0]
+
+    def cophenetic_heights(self):
+        """Height of every cluster: the greatest merge distance inside it.
+           Heights never decrease toward the root, even when the merges of
+           median linkage are inverted."""
+
+        if self.heights is None:
+            heights = [0.0] * (2 * self.n - 1)
+            for i, (a, b, d, size) in enumerate(self.Z.tolist()):
+                heights[self.n + i] = max(d, heights[int(a)],
+                                          heights[int(b)])
+            self.heights = numpy.array(heights)
+        return self.heights
+
+    def cut(self, k=None, threshold=None):
+        """Label every point with its flat cluster, numbered after cluster
+           ids. Either 'k' clusters are kept, undoing the last merges, or
+           the largest clusters whose height is at most 'threshold'."""
+
+        if (k is None) == (threshold is None):
+            raise ValueError('cut needs either k or threshold')
+        if k is not None:
+            if not 1 <= k <= self.n:
+                raise ValueError('cannot cut %d points into %d clusters'
+                                 % (self.n, k))
+            return leaf_labels(self.Z, self.roots_after(self.n - k))
+        heights = self.cophenetic_heights()
+        parents = numpy.empty(2 * self.n - 1, dtype=int)
+        parents[-1] = -1
+        parents[self.Z[:, :2].astype(int).ravel()] = \
+            numpy.repeat(numpy.arange(self.n, 2 * self.n - 1), 2)
+        low = heights <= threshold
+        low[:self.n] = True
+        # Low clusters whose parent is not, or the root when it is low
+        roots = low & ~numpy.append(low[parents[:-1]], False)
+        return leaf_labels(self.Z, numpy.nonzero(roots)[0])
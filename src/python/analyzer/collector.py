@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+"""Collect system metrics from /proc into sample files or binary stores.
+
+This replaces samples-generator.sh on GNU/Linux: /proc/loadavg,
+/proc/vmstat, /proc/meminfo and /proc/diskstats are kept open and re-read
+from offset 0 at each tick, so sampling spawns no process and costs a few
+system calls. Metrics are named after the files of samples/simple-metrics
+where they exist ('load-avg', 'vmstat_free', 'vmstat_faults'), then after
+their source: 'vmstat_<field>', 'meminfo_<field>' (kB),
+'diskstats_<device>_<field>' and 'load-avg-5', 'load-avg-15'.
+
+Samples are buffered and written by batches, to '<metric>.sample' text
+files or '<metric>.store' binary stores (see seriesstore). Timestamps are
+in seconds, or in milliseconds when the interval is below one second."""
+
+import os
+import sys
+import time
+import fnmatch
+from optparse import OptionParser
+
+PROC = '/proc'
+INTERVAL = 5.0
+BATCH = 12
+READ_SIZE = 65536
+DEFAULT_METRICS = ['load-avg', 'vmstat_free', 'vmstat_faults',
+                   'meminfo_MemAvailable', 'diskstats_*_io_ticks']
+DISKSTATS_FIELDS = {0: 'reads', 2: 'sectors_read', 4: 'writes',
+                    6: 'sectors_written', 8: 'in_flight', 9: 'io_ticks'}
+IGNORED_DEVICES = ('loop', 'ram')
+
+# Clock used to schedule ticks, immune to system time changes if possible
+monotonic = getattr(time, 'monotonic', time.time)
+
+
+class ProcFile(object):
+    """File of /proc kept open, whose whole content is read again on each
+       call to read()."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        self.size = READ_SIZE
+
+    def pread(self, size):
+        """Read 'size' bytes from the start of the file"""
+
+        if hasattr(os, 'pread'):
+            return os.pread(self.fd, size, 0)
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        return os.read(self.fd, size)
+
+    def read(self):
+        """Get the current content of the file, as a string"""
+
+        data = self.pread(self.size)
+        while len(data) == self.size:
+            # The file may be larger than the buffer: retry with a bigger one
+            self.size *= 2
+            data = self.pread(self.size)
+        return data.decode('ascii', 'replace')
+
+    def close(self):
+        os.close(self.fd)
+
+
+def parse_loadavg(data):
+    """Parse /proc/loadavg"""
+
+    fields = data.split()
+    return {'load-avg': float(fields[0]), 'load-avg-5': float(fields[1]),
+            'load-avg-15': float(fields[2])}
+
+
+def parse_vmstat(data):
+    """Parse /proc/vmstat"""
+
+    result = {}
+    for line in data.splitlines():
+        fields = line.split()
+        if len(fields) == 2:
+            result['vmstat_' + fields[0]] = float(fields[1])
+    # Names used by samples-generator.sh
+    if 'vmstat_nr_free_pages' in result:
+        result['vmstat_free'] = result['vmstat_nr_free_pages']
+    if 'vmstat_pgfault' in result:
+        result['vmstat_faults'] = result['vmstat_pgfault']
+    return result
+
+
+def parse_meminfo(data):
+    """Parse /proc/meminfo"""
+
+    result = {}
+    for line in data.splitlines():
+        fields = line.split()
+        if len(fields) >= 2 and fields[0].endswith(':'):
+            result['meminfo_' + fields[0][:-1]] = float(fields[1])
+    return result
+
+
+def parse_diskstats(data):
+    """Parse /proc/diskstats, ignoring loop and ram devices"""
+
+    result = {}
+    for line in data.splitlines():
+        fields = line.split()
+        if len(fields) < 14 or fields[2].startswith(IGNORED_DEVICES):
+            continue
+        prefix = 'diskstats_%s_' % fields[2]
+        for index, name in DISKSTATS_FIELDS.items():
+            result[prefix + name] = float(fields[3 + index])
+    return result
+
+
+SOURCES = [('loadavg', parse_loadavg), ('vmstat', parse_vmstat),
+           ('meminfo', parse_meminfo), ('diskstats', parse_diskstats)]
+
+
+class Collector(object):
+    """Samples the metrics matching the given glob patterns. Sources
+       providing none of them are not read at all."""
+
+    def __init__(self, patterns=DEFAULT_METRICS, root=PROC):
+        self.sources = []
+        self.metrics = set()
+        for name, parse in SOURCES:
+            path = os.path.join(root, name)
+            if not os.path.exists(path):
+                continue
+            source = ProcFile(path)
+            metrics = [metric for metric in parse(source.read())
+                       if any(fnmatch.fnmatchcase(metric, pattern)
+                              for pattern in patterns)]
+            if metrics:
+                self.sources.append((source, parse))
+                self.metrics.update(metrics)
+            else:
+                source.close()
+
+    def sample(self):
+        """Get a dictionary of the current value of every metric"""
+
+        result = {}
+        for source, parse in self.sources:
+            for metric, value in parse(source.read()).items():
+                if metric in self.metrics:
+                    result[metric] = value
+        return result
+
+    def run(self, writer, interval=INTERVAL, count=None):
+        """Sample metrics every 'interval' seconds, 'count' times (forever
+           by default), and give them to 'writer'. Ticks missed because
+           the machine was too busy are skipped rather than made up."""
+
+        scale = 1000 if interval < 1 else 1
+        start = monotonic()
+        tick = samples = 0
+        while True:
+            writer.add(int(time.time() * scale), self.sample())
+            samples += 1
+            if count is not None and samples >= count:
+                break
+            elapsed = monotonic() - start
+            tick = max(tick + 1, int(elapsed / interval) + 1)
+            time.sleep(max(0.0, start + tick * interval - monotonic()))
+        writer.flush()
+
+    def close(self):
+        for source, parse in self.sources:
+            source.close()
+        self.sources = []
+
+
+class SampleWriter(object):
+    """Buffers samples of many metrics and appends them to their file every
+       'batch' ticks, as 'timestamp value' lines or into binary stores."""
+
+    def __init__(self, folder, store=False, batch=BATCH):
+        self.folder = folder
+        self.store = store
+        self.batch = batch
+        self.pending = {}
+        self.ticks = 0
+
+    def path(self, metric):
+        """Get the file of a metric"""
+
+        extension = self.store and '.store' or '.sample'
+        return os.path.join(self.folder, metric + extension)
+
+    def add(self, timestamp, values):
+        """Add the values of a tick, flushing them if the batch is full"""
+
+        for metric, value in values.items():
+            self.pending.setdefault(metric, []).append((timestamp, value))
+        self.ticks += 1
+        if self.ticks >= self.batch:
+            self.flush()
+
+    def flush(self):
+        """Write pending samples"""
+
+        if self.store and self.pending:
+            import seriesstore
+        for metric, samples in self.pending.items():
+            if self.store:
+                timestamps, values = zip(*samples)
+                seriesstore.append(self.path(metric), timestamps, values)
+            else:
+                f = open(self.path(metric), 'a')
+                f.write(''.join('%d %.15g\n' % sample for sample in samples))
+                f.close()
+        self.pending = {}
+        self.ticks = 0
+
+
+def parse_args(argv):
+    parser = OptionParser(usage='%prog [options] OUTPUT_FOLDER',
+                          description='Collect system metrics from /proc.')
+    parser.add_option('-i', '--interval', dest='interval', type='float',
+                      default=INTERVAL,
+                      help='Seconds between samples (default: %default).')
+    parser.add_option('-n', '--count', dest='count', type='int',
+                      help='Number of samples to collect (default: forever).')
+    parser.add_option('-m', '--metrics', dest='metrics',
+                      default=','.join(DEFAULT_METRICS),
+                      help='Comma-separated glob patterns of the metrics '
+                      'to collect (default: %default).')
+    parser.add_option('-b', '--batch', dest='batch', type='int',
+                      default=BATCH,
+                      help='Number of samples written at once '
+                      '(default: %default).')
+    parser.add_option('-s', '--store', dest='store', action='store_true',
+                      default=False,
+                      help='Write binary stores instead of sample files.')
+    parser.add_option('-l', '--list', dest='list', action='store_true',
+                      default=False,
+                      help='List the available metrics and exit.')
+    (options, args) = parser.parse_args(args=argv)
+    if len(args) != 1 and not options.list:
+        parser.print_help()
+        sys.exit(1)
+    options.metrics = options.metrics.split(',')
+    return (options, args)
+
+
+if __name__ == "__main__":
+    (options, args) = parse_args(sys.argv[1:])
+    if options.list:
+        collector = Collector(['*'])
+        for metric in sorted(collector.metrics):
+            print(metric)
+        sys.exit(0)
+    collector = Collector(options.metrics)
+    if not collector.metrics:
+        print('No metric matches %s.' % ', '.join(options.metrics))
+        sys.exit(2)
+    if not os.path.isdir(args[0]):
+        os.makedirs(args[0])
+    writer = SampleWriter(args[0], options.store, options.batch)
+    try:
+        collector.run(writer, options.interval, options.count)
+    except KeyboardInterrupt:
+        writer.flush()
+    collector.close()
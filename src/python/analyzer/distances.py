@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+"""Batched distance computations between feature vectors.
+
+A metric is a function computing the matrix of distances between rows of
+two 2-D arrays, optionally with a 'prepare' function transforming the
+input vectors first (e.g. whitening them for Mahalanobis distance). New
+metrics can be added with register_metric()."""
+
+import numpy
+
+# Upper bound of the number of floats of temporary arrays
+BLOCK_ELEMENTS = 1 << 22
+
+METRICS = {}
+
+
+def register_metric(name, function, prepare=None):
+    """Register a metric. 'function(A, B)' returns the (len(A), len(B))
+       matrix of distances, and 'prepare(X, **params)', if any, returns
+       the vectors 'function' is to be applied on."""
+
+    METRICS[name] = (function, prepare)
+
+
+def sqeuclidean(A, B):
+    differences = A[:, numpy.newaxis, :] - B[numpy.newaxis, :, :]
+    return (differences ** 2).sum(axis=2)
+
+
+def euclidean(A, B):
+    return numpy.sqrt(sqeuclidean(A, B))
+
+
+def whiten(X, VI=None):
+    """Transform X so that Mahalanobis distances of X for the inverse
+       covariance matrix VI are euclidean distances of the result. VI
+       defaults to the pseudo-inverse of the covariance matrix of X."""
+
+    if VI is None:
+        VI = numpy.linalg.pinv(numpy.atleast_2d(numpy.cov(X, rowvar=False)))
+    # VI is symmetric positive semi-definite: VI = L * L^T
+    w, V = numpy.linalg.eigh(VI)
+    L = V * numpy.sqrt(numpy.maximum(w, 0))
+    return X.dot(L)
+
+
+def cosine(A, B):
+    return numpy.maximum(0.0, 1.0 - A.dot(B.T))
+
+
+def normalize(X):
+    """Scale rows of X to unit length, leaving null rows untouched"""
+
+    norms = numpy.sqrt((X ** 2).sum(axis=1))
+    norms[norms == 0] = 1.0
+    return X / norms[:, numpy.newaxis]
+
+
+register_metric('euclidean', euclidean)
+register_metric('sqeuclidean', sqeuclidean)
+register_metric('mahalanobis', euclidean, whiten)
+register_metric('cosine', cosine, normalize)
+
+
+def get_metric(metric):
+    try:
+        return METRICS[metric]
+    except KeyError:
+        raise ValueError('unknown metric: %s' % metric)
+
+
+def block_size(n, d):
+    """Number of rows to process at once against n vectors of d features"""
+
+    return max(1, BLOCK_ELEMENTS // max(1, n * d))
+
+
+def cdist(A, B, metric='euclidean', **params):
+    """Matrix of distances between rows of A and rows of B"""
+
+    function, prepare = get_metric(metric)
+    A = numpy.atleast_2d(numpy.asarray(A, dtype=float))
+    B = numpy.atleast_2d(numpy.asarray(B, dtype=float))
+    if prepare is not None:
+        X = prepare(numpy.vstack((A, B)), **params)
+        A, B = X[:len(A)], X[len(A):]
+    result = numpy.empty((len(A), len(B)))
+    step = block_size(len(B), A.shape[1])
+    for start in range(0, len(A), step):
+        result[start:start + step] = function(A[start:start + step], B)
+    return result
+
+
+def pdist(X, metric='euclidean', **params):
+    """Condensed matrix of distances between rows of X: the upper triangle
+       of the distance matrix, row by row, as a flat array. Rows are
+       processed by blocks to bound memory."""
+
+    function, prepare = get_metric(metric)
+    X = numpy.atleast_2d(numpy.asarray(X, dtype=float))
+    if prepare is not None:
+        X = prepare(X, **params)
+    n = len(X)
+    result = numpy.empty(n * (n - 1) // 2)
+    step = block_size(n, X.shape[1])
+    offset = 0
+    for start in range(0, n - 1, step):
+        stop = min(start + step, n - 1)
+        block = function(X[start:stop], X[start:])
+        rows = numpy.arange(start, stop)[:, numpy.newaxis]
+        columns = numpy.arange(start, n)[numpy.newaxis, :]
+        values = block[columns > rows]
+        result[offset:offset + len(values)] = values
+        offset += len(values)
+    return result
@@ -14,45 +14,67 @@
 
 import sys
 from superlist import SuperList
+from quantilesketch import QuantileSketch
+from sampleloader import LoadReport, iter_chunks
 from optparse import OptionParser
 
 
 class DistributionAnalyzer:
 
-    def __init__(self):
-        self.list = SuperList()
+    def __init__(self, sketch=None):
+        """Values are kept into a SuperList, unless a QuantileSketch is given:
+           then memory does not depend on the number of values anymore, and
+           results are approximated."""
+
+        self.sketch = sketch
+        if sketch is None:
+            self.list = SuperList()
+        else:
+            self.list = sketch
 
     def add(self, value):
         self.list.append(value)
 
+    def add_all(self, values):
+        self.list.extend(values)
+
     def get_size(self):
         return len(self.list)
 
+    def error_bound(self):
+        """Get a printable rank error bound, when values are sketched"""
+
+        if self.sketch is None:
+            return ""
+        return " (+/- %.2f%%)" % (100.0 * self.sketch.error())
+
     def print_percentage(self, percentage):
-        value = self.list.percentage(percentage)
-        print(str(percentage) + "% under " + str(value))
+        self.print_percentages([percentage])
+
+    def print_percentages(self, percentages):
+        values = self.list.percentages(percentages)
+        for percentage, value in zip(percentages, values):
+            print(str(percentage) + "% under " + str(value)
+                  + self.error_bound())
 
     def print_default_percentages(self):
-        self.print_percentage(50)
-        self.print_percentage(75)
-        self.print_percentage(90)
-        self.print_percentage(99)
-        self.print_percentage(100)
+        self.print_percentages([50, 75, 90, 99, 100])
 
     def find_percentage_lower_than(self, value):
         p = self.list.percentage_lower_than(value)
-        print("%.2f%% of values are < %s" % (p, value))
+        print("%.2f%% of values are < %s%s" % (p, value, self.error_bound()))
 
     def find_percentage_greater_than(self, value):
         p = self.list.percentage_greater_than(value)
-        print("%.2f%% of values are > %s" % (p, value))
+        print("%.2f%% of values are > %s%s" % (p, value, self.error_bound()))
 
     def find_percentage_between(self, low, high):
         low, high = min(low, high), max(low, high)
-        a = self.list.percentage_greater_than(high)
-        b = self.list.percentage_lower_than(low)
+        b, c = self.list.percentages_lower_than([low, high])
+        a = 100 - c
         result = 100.0 - (a + b)
-        print("%.2f of values are in [ %s, %s ]" % (result, low, high))
+        print("%.2f of values are in [ %s, %s ]%s"
+              % (result, low, high, self.error_bound()))
 
 
 def parse_args(argv):
@@ -68,6 +90,10 @@ def parse_args(argv):
     parser.add_option('-g', '--greater-than', dest='gt', metavar='VALUE',
                       type='float',
                       help='Get percentage of values greater than the supplied value.')
+    parser.add_option('-k', '--sketch', dest='sketch', metavar='K',
+                      type='int',
+                      help='Stream values through a quantile sketch of accuracy K '
+                      '(e.g. 200) instead of keeping them all in memory.')
     (options, args) = parser.parse_args(args=argv)
     if options.file is None:
         parser.print_help()
@@ -77,17 +103,19 @@ def parse_args(argv):
 
 if __name__ == "__main__":
     (options, args) = parse_args(sys.argv[1:])
-    analyzer = DistributionAnalyzer()
+    if options.sketch is None:
+        analyzer = DistributionAnalyzer()
+    else:
+        analyzer = DistributionAnalyzer(QuantileSketch(options.sketch))
     action_performed = False
     index = options.cindex
     sep = options.sep
-    f = open(options.file, 'rb')
-    for line in f:
-        try:
-            analyzer.add(float(line.split(sep)[index].replace(',', '.')))
-        except IndexError as e:
-            print("Ignored line, column %i not found." % index)
-    f.close()
+    report = LoadReport()
+    for (values,) in iter_chunks(options.file, [index], sep, report=report):
+        analyzer.add_all(values)
+    if report.bad_lines > 0:
+        print("Ignored lines, column %i not found or invalid: %s"
+              % (index, report))
     if analyzer.get_size() == 0:
         print("No valid lines, exit.")
         sys.exit(2)
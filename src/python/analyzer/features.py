@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+"""Registry of the features extracted from a window of values.
+
+A feature is a function of a NumericRingBuffer and of the values of the
+features it depends on. MultiRingBuffer implements the same statistics, as
+arrays holding one value per series, so that every registered feature works
+on it too. A FeatureExtractor computes the features it is asked for lazily,
+at most once per appended value: dependencies shared by several features are
+computed once, and unused features cost nothing."""
+
+FEATURES = {}
+
+# Features of the original classifier
+DEFAULT_FEATURES = ['mean', 'shannon_entropy', 'variance', 'expected_value']
+
+
+def register_feature(name, function, depends=()):
+    """Register 'function(buffer, *values_of_depends)' as feature 'name'.
+       Dependencies must be registered already."""
+
+    for dependency in depends:
+        if dependency not in FEATURES:
+            raise ValueError('unknown feature: %s' % dependency)
+    FEATURES[name] = (function, tuple(depends))
+
+
+def expected_value(buffer, mean):
+    """Expected value equals the mean unless values are blurred"""
+
+    if buffer.blur:
+        return buffer.expected_value()
+    return mean
+
+
+register_feature('mean', lambda buffer: buffer.mean())
+register_feature('variance', lambda buffer: buffer.variance())
+register_feature('std', lambda buffer, variance: variance ** 0.5,
+                 ['variance'])
+register_feature('shannon_entropy', lambda buffer: buffer.shannon_entropy())
+register_feature('expected_value', expected_value, ['mean'])
+register_feature('min', lambda buffer: buffer.min())
+register_feature('max', lambda buffer: buffer.max())
+register_feature('range', lambda buffer, low, high: high - low,
+                 ['min', 'max'])
+register_feature('median', lambda buffer: buffer.percentage(50))
+register_feature('p90', lambda buffer: buffer.percentage(90))
+register_feature('p99', lambda buffer: buffer.percentage(99))
+register_feature('slope', lambda buffer: buffer.slope())
+register_feature('trend_value',
+                 lambda buffer: buffer.trend_value())
+register_feature('residual_variance',
+                 lambda buffer: buffer.residual_variance())
+
+
+class FeatureExtractor(object):
+    """Computes features of a NumericRingBuffer on demand, caching them until
+       the next value is appended to the buffer."""
+
+    def __init__(self, buffer, names=DEFAULT_FEATURES):
+        for name in names:
+            if name not in FEATURES:
+                raise ValueError('unknown feature: %s' % name)
+        self.buffer = buffer
+        self.names = list(names)
+        self.cache = {}
+        self.version = None
+
+    def get(self, name):
+        """Get the current value of a feature"""
+
+        if self.version != self.buffer.appended:
+            self.cache.clear()
+            self.version = self.buffer.appended
+        try:
+            return self.cache[name]
+        except KeyError:
+            pass
+        function, depends = FEATURES[name]
+        value = function(self.buffer, *[self.get(d) for d in depends])
+        self.cache[name] = value
+        return value
+
+    def vector(self):
+        """Get the vector of the extractor's features"""
+
+        return [self.get(name) for name in self.names]
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+"""Multivariate gaussian anomaly detection, ported from the Octave
+(multivariate-gaussian.m) and Clojure (mg.core) prototypes."""
+
+import sys
+import math
+import numpy
+
+# Outlier detection threshold
+DEFAULT_THRESHOLD = 1e-02
+
+# Number of vectors scored at once
+BLOCK_SIZE = 65536
+
+
+class MultivariateGaussian(object):
+    """Gaussian model of feature vectors. Parameters are factored once when
+       they are set: vectors are then scored by whitening them, without
+       solving any system nor computing any determinant.
+
+       Singular covariance matrices (e.g. with a constant or duplicated
+       feature, which made LAPACK DGESV fail in the Clojure prototype) are
+       handled with a pseudo-inverse and a pseudo-determinant: the density
+       is then the one of the subspace the vectors actually live in."""
+
+    def __init__(self, mu=None, sigma=None):
+        self.mu = None
+        self.sigma = None
+        if mu is not None:
+            self.set_parameters(mu, sigma)
+
+    def fit(self, X, ddof=1):
+        """Estimate mu (means vector) and sigma (covariance matrix) of the
+           input (m x n) matrix."""
+
+        X = numpy.atleast_2d(numpy.asarray(X, dtype=float))
+        mu = X.mean(axis=0)
+        sigma = numpy.atleast_2d(numpy.cov(X, rowvar=False, ddof=ddof))
+        self.set_parameters(mu, sigma)
+        return self
+
+    def set_parameters(self, mu, sigma):
+        """Set parameters and factor the covariance matrix."""
+
+        self.mu = numpy.asarray(mu, dtype=float).ravel()
+        self.sigma = numpy.atleast_2d(numpy.asarray(sigma, dtype=float))
+        try:
+            L = numpy.linalg.cholesky(self.sigma)
+            # Whitening: (x - mu) * W has identity covariance
+            self.whitening = numpy.linalg.inv(L).T
+            self.log_det = 2.0 * numpy.log(numpy.diag(L)).sum()
+            self.rank = len(self.mu)
+            self.singular = False
+        except numpy.linalg.LinAlgError:
+            w, V = numpy.linalg.eigh(self.sigma)
+            tolerance = max(w.max(), 0.0) * len(w) * numpy.finfo(float).eps
+            kept = w > tolerance
+            self.whitening = V[:, kept] / numpy.sqrt(w[kept])
+            self.log_det = numpy.log(w[kept]).sum()
+            self.rank = int(kept.sum())
+            self.singular = True
+        self.log_norm = -0.5 * (self.rank * math.log(2 * math.pi) +
+                                self.log_det)
+
+    def mahalanobis(self, X):
+        """Squared Mahalanobis distances of rows of X to the mean."""
+
+        X = numpy.atleast_2d(numpy.asarray(X, dtype=float))
+        result = numpy.empty(len(X))
+        for start in range(0, len(X), BLOCK_SIZE):
+            Z = (X[start:start + BLOCK_SIZE] - self.mu).dot(self.whitening)
+            result[start:start + BLOCK_SIZE] = (Z ** 2).sum(axis=1)
+        return result
+
+    def logpdf(self, X):
+        """Log-density of every row of X."""
+
+        return self.log_norm - 0.5 * self.mahalanobis(X)
+
+    def pdf(self, X):
+        """Density of every row of X."""
+
+        return numpy.exp(self.logpdf(X))
+
+    def outliers(self, X, epsilon=DEFAULT_THRESHOLD):
+        """Indices of rows of X whose density is lower than epsilon."""
+
+        return numpy.nonzero(self.logpdf(X) < math.log(epsilon))[0]
+
+
+def cholesky_update(L, x):
+    """Update in place the lower Cholesky factor L of a matrix A into the
+       one of A + x * x^T, in O(n^2)."""
+
+    x = numpy.array(x, dtype=float)
+    for k in range(len(x)):
+        r = math.hypot(L[k, k], x[k])
+        c = r / L[k, k]
+        s = x[k] / L[k, k]
+        L[k, k] = r
+        L[k + 1:, k] = (L[k + 1:, k] + s * x[k + 1:]) / c
+        x[k + 1:] = c * x[k + 1:] - s * L[k + 1:, k]
+
+
+def solve_lower(L, B):
+    """Solve L * X = B for a lower triangular L, by forward substitution."""
+
+    X = numpy.array(B, dtype=float)
+    for k in range(len(L)):
+        X[k] -= L[k, :k].dot(X[:k])
+        X[k] /= L[k, k]
+    return X
+
+
+class IncrementalGaussian(MultivariateGaussian):
+    """Gaussian model updated with each new feature vector, in O(n^2) for n
+       features, instead of being estimated again from the whole history.
+
+       The mean vector and the Cholesky factor of the scatter matrix (sum of
+       outer products of deviations to the mean) are updated with a rank-one
+       update. With a 'forgetting' factor lower than 1, the weight of past
+       vectors is multiplied by it at each update, so that the model follows
+       the recent distribution. The scatter matrix starts as 'prior' times
+       the identity matrix, to keep it definite until enough vectors have
+       been seen."""
+
+    def __init__(self, dimension, forgetting=1.0, prior=1e-6):
+        self.forgetting = forgetting
+        self.weight = 0.0
+        self.mu = numpy.zeros(dimension)
+        self.L = numpy.sqrt(prior) * numpy.eye(dimension)
+        self.rank = dimension
+        self.singular = False
+        self.refresh()
+
+    def update(self, x):
+        """Add a new vector to the model."""
+
+        x = numpy.asarray(x, dtype=float)
+        previous = self.forgetting * self.weight
+        self.weight = previous + 1.0
+        delta = x - self.mu
+        self.mu = self.mu + delta / self.weight
+        self.L *= math.sqrt(self.forgetting)
+        cholesky_update(self.L, math.sqrt(previous / self.weight) * delta)
+        self.refresh()
+
+    def update_all(self, X):
+        for x in numpy.atleast_2d(X):
+            self.update(x)
+
+    def refresh(self):
+        """Update the normalization constant of the density."""
+
+        weight = max(self.weight, 1.0)
+        self.log_det = 2.0 * numpy.log(numpy.diag(self.L)).sum() \
+            - len(self.mu) * math.log(weight)
+        self.log_norm = -0.5 * (self.rank * math.log(2 * math.pi) +
+                                self.log_det)
+
+    def covariance(self):
+        """Current (weighted, population) covariance matrix."""
+
+        return self.L.dot(self.L.T) / max(self.weight, 1.0)
+
+    @property
+    def sigma(self):
+        """Covariance matrix, as in MultivariateGaussian. It is computed from
+           the Cholesky factor on access, so that updates stay O(n^2)."""
+
+        return self.covariance()
+
+    def mahalanobis(self, X):
+        """Squared Mahalanobis distances of rows of X to the mean."""
+
+        X = numpy.atleast_2d(numpy.asarray(X, dtype=float))
+        result = numpy.empty(len(X))
+        scale = math.sqrt(max(self.weight, 1.0))
+        for start in range(0, len(X), BLOCK_SIZE):
+            A = (X[start:start + BLOCK_SIZE] - self.mu).T
+            Z = solve_lower(self.L, A) * scale
+            result[start:start + BLOCK_SIZE] = (Z ** 2).sum(axis=0)
+        return result
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in [2, 3]:
+        print('Usage: gaussian.py INPUT [THRESHOLD]')
+        sys.exit(1)
+    epsilon = DEFAULT_THRESHOLD
+    if len(sys.argv) == 3:
+        epsilon = float(sys.argv[2])
+    X = numpy.loadtxt(sys.argv[1], ndmin=2)
+    outliers = MultivariateGaussian().fit(X).outliers(X, epsilon)
+    print('%d anomalies have been detected' % len(outliers))
+    for i in outliers:
+        print(i + 1)
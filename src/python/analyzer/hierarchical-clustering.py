@@ -20,10 +20,19 @@
 
 import sys
 import math
-import numpypy # Comment if you don't use pypy
+try:
+    import numpypy # Only needed (and available) with pypy
+except ImportError:
+    pass
 from numpy import *
 from ringbuffer import RingBuffer
 from numericringbuffer import NumericRingBuffer
+from sampleloader import LoadReport, iter_chunks
+from clustering import Dendrogram, linkage, to_tree
+from onlineclustering import OnlineClustering
+from approximateclustering import SAMPLE_SIZE, ApproximateClustering, compare
+from features import DEFAULT_FEATURES, FEATURES, FeatureExtractor
+from optparse import OptionParser
 
 BUFFER_SIZE = 20
 
@@ -39,47 +48,21 @@ def euclidian(v, w):
     return sqrt(sum((v - w) ** 2))
 
 
-def merge_vectors(v, w):
-    """Compute an average merged vector from v and w."""
-
-    return [(v[i] + w[i]) / 2.0 for i in range(len(v))]
-
-
-class ClusterNode:
-    """Represents a node of hierarchical tree that will be built by our
-       algorithm."""
-
-    def __init__(self, vec, left=None, right=None, distance=0.0, id=None,
-                 meta={}):
-        """Ctor
-        Args:
-           vector:   vector of features
-           left:     left ClusterNode's child
-           right:    right ClusterNode's child
-           distance: current's distance
-           id:       used when clustering. Positive id means it's a leaf
-           count:    used for weighted average
-           meta:     map of extra metadata."""
-
-        self.left = left
-        self.right = right
-        self.vec = vec
-        self.id = id
-        self.distance = distance
-        self.meta = meta
-
-
 class HierarchicalClassifier(object):
 
-    def __init__(self, output_folder):
+    def __init__(self, output_folder, features=DEFAULT_FEATURES):
         """Constructor. 'Counter' is the number of values we have added
-           so far."""
+           so far. 'features' are the names of the features of the vectors
+           (see features.py)."""
 
         self.values = NumericRingBuffer(BUFFER_SIZE)
-        self.nodes = []
+        self.extractor = FeatureExtractor(self.values, features)
+        self.vectors = []
+        self.numbers = []
+        self.originals = []
         self.counter = 0
-        self.output = open(output_folder + '/anomalies.dat', 'wb')
-        self.orig = open(output_folder + '/original-serie.dat', 'wb')
+        self.output = open(output_folder + '/anomalies.dat', 'w')
+        self.orig = open(output_folder + '/original-serie.dat', 'w')
 
     def __del__(self):
         """Destructor. Properly close opened file descriptors."""
@@ -87,120 +70,276 @@ class HierarchicalClassifier(object):
         self.output.close()
         self.orig.close()
 
-    def add(self, value):
-        """Add a new value. We store the current number of the value in the
-           map of metadata in 'n' key."""
+    def add(self, value, timestamp=None):
+        """Add a new value. Its vector of features is kept along with its
+           number in the serie and the value itself."""
 
-        self.values.append(value)
+        self.values.append(value, timestamp)
         self.counter += 1
         if self.values.size > 1:
-            self.orig.write(str(value) + '\n')
-            vector = [
-                self.values.mean(),
-                self.values.shannon_entropy(),
-                self.values.variance(),
-                self.values.expected_value(),
-            ]
-            metadata = { 'n': self.counter, 'v': value }
-            self.nodes.append(ClusterNode(vec=vector, meta=metadata))
-
-    def build_set_rec(self, tree, marker):
-        """Fill an array recursively from given tree."""
-
-        if not tree:
-            return []
-        current = []
-        if tree.id > 0:
-            current = [(tree.meta['n'], marker)]
-        return current + self.build_set_rec(tree.left, marker) \
-            + self.build_set_rec(tree.right, marker)
+            self.vectors.append(self.features())
+            self.numbers.append(self.counter)
+            self.originals.append(value)
 
-    def build_sets(self, tree):
-        """Build two classes from the given tree."""
+    def features(self):
+        """Get the vector of features of the current window."""
 
-        return [] + self.build_set_rec(tree.left, 0) \
-            + self.build_set_rec(tree.right, 1)
+        return self.extractor.vector()
 
-    def find_anomalies(self):
-        """Try to find anomalies according to what we have seen so far."""
+    def dendrogram(self):
+        """Cluster the values seen so far. Their numbers and the values
+           themselves are kept with the resulting Dendrogram."""
+
+        Z = self.hcluster(self.vectors, squared_euclidian)
+        return Dendrogram(Z, {'numbers': self.numbers,
+                              'originals': self.originals})
 
-        tree = self.hcluster(self.nodes, squared_euclidian)
-        sets = self.build_sets(tree)
-        sets = sorted(sets, key = lambda elt: elt[0])
-        for elt in sets:
-            self.output.write(str(int(elt[0])) + ' ' + str(elt[1]) + '\n')
+    def build_sets(self, dendrogram, k=2, threshold=None):
+        """Build classes from the given dendrogram: 'k' classes, or classes
+           of values closer than 'threshold' when given. Returns (number of
+           the value, class) pairs."""
 
-    def hcluster(self, nodes, distance=euclidian):
+        numbers = dendrogram.data['numbers']
+        if len(numbers) < 2:
+            return []
+        if threshold is not None:
+            k = None
+        labels = dendrogram.cut(k, threshold)
+        return list(zip(numbers.tolist(), labels.tolist()))
+
+    def tree(self, Z):
+        """Get the tree of ClusterNode of the given linkage matrix, whose
+           leaf ids are indexes into 'vectors', 'numbers' and 'originals'."""
+
+        return to_tree(Z, self.vectors)
+
+    def find_anomalies(self, k=2, threshold=None, dendrogram=None):
+        """Try to find anomalies according to what we have seen so far, or
+           according to a previously computed dendrogram. Returns the
+           dendrogram, so that it can be cut again or saved."""
+
+        if dendrogram is None:
+            dendrogram = self.dendrogram()
+        self.orig.write(''.join('%s\n' % value for value
+                                in dendrogram.data['originals'].tolist()))
+        sets = self.build_sets(dendrogram, k, threshold)
+        self.output.write(''.join('%d %d\n' % elt for elt in sets))
+        return dendrogram
+
+    def hcluster(self, vectors, distance=euclidian):
         """Classif list of elements.
            Principle: each row start within it's individual cluster, then the
-           matrix is processed to find closest rows until each row fits in a
-           global hierarchical tree.
+           two closest clusters are merged until each row fits in a global
+           hierarchical tree. Merged clusters are represented by the average
+           of both merged vectors (median linkage), see clustering.linkage.
+           Returns the linkage matrix of the tree.
 
         Args:
-           nodes:      array of ClusterNode's
-           distance:  function computing distance between 2 vectors"""
-
-        distances = {}  # cache of (v, w) distances
-        currentclustid = -1
-
-        # clusters are initially just the individual rows
-        clust = [ClusterNode(vec=array(nodes[i].vec), id=i,
-                             meta=nodes[i].meta) \
-                     for i in range(len(nodes))]
-
-        while len(clust) > 1:
-
-            print('%d remaining clusters' % len(clust))
-            lowestpair = (0, 1)
-            closest = distance(clust[0].vec, clust[1].vec)
-
-            # loop through every pair looking for the smallest distance
-            # v_id and w_id are made local variable to avoid slow lookup
-            # several times. The try/except statement is prefered as well
-            # for performance issues (compared to `key not in distances`)
-            for i in range(len(clust)):
-                for j in range(i + 1, len(clust)):
-                    v_id = clust[i].id
-                    w_id = clust[j].id
-                    try:
-                        d = distances[(v_id, w_id)]
-                    except KeyError:
-                        distances[(v_id, w_id)] = \
-                            distance(clust[i].vec, clust[j].vec)
-                        d = distances[(v_id, w_id)]
-                    if d < closest:
-                        closest = d
-                        lowestpair = (i, j)
-
-            # calculate the average of the two clusters
-            merged_vector = merge_vectors(clust[lowestpair[0]].vec,
-                                          clust[lowestpair[1]].vec)
-
-            # create the new cluster
-            newcluster = ClusterNode(array(merged_vector),
-                                     left=clust[lowestpair[0]],
-                                     right=clust[lowestpair[1]],
-                                     distance=closest,
-                                     id=currentclustid)
-
-            # cluster ids that weren't in the original set are negative
-            currentclustid -= 1
-            del clust[lowestpair[1]]
-            del clust[lowestpair[0]]
-            clust.append(newcluster)
-
-        return clust[0]
+           vectors:   list of vectors of features
+           distance:  euclidian or squared_euclidian"""
+
+        if distance is squared_euclidian:
+            metric = 'sqeuclidean'
+        elif distance is euclidian:
+            metric = 'euclidean'
+        else:
+            raise ValueError('median linkage needs euclidean distances')
+        return linkage(array(vectors, dtype=float), 'median', metric)
+
+
+class OnlineClassifier(HierarchicalClassifier):
+    """Label each value as soon as it is added, instead of clustering the
+       whole serie at the end. Feature vectors are not kept: they go through
+       an incremental clustering model (see onlineclustering), so memory
+       does not grow with the serie. Anomalies are marked with 1."""
+
+    def __init__(self, output_folder, model=None,
+                 features=DEFAULT_FEATURES):
+        HierarchicalClassifier.__init__(self, output_folder, features)
+        if model is None:
+            model = OnlineClustering()
+        self.model = model
+
+    def add(self, value, timestamp=None):
+        """Add a new value and write its label right away."""
+
+        self.values.append(value, timestamp)
+        self.counter += 1
+        if self.values.size > 1:
+            label = self.model.classify(self.features())
+            self.orig.write('%s\n' % value)
+            self.output.write('%d %d\n' % (self.counter, label))
 
+    def find_anomalies(self):
+        """Values are already labelled, just flush the outputs."""
 
-if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print('Usage: hierarchical-clustering.py INPUT OUTPUT_FOLDER')
+        self.orig.flush()
+        self.output.flush()
+
+
+class ApproximateClassifier(HierarchicalClassifier):
+    """Cluster a uniform sample of at most 'sample_size' values, and label
+       the other ones like their nearest sampled value, so that long series
+       can be classified (see approximateclustering). Only the sample is
+       kept while values are added: they are labelled in a second pass over
+       the serie. With 'keep', vectors and labels are kept nonetheless, in
+       'vectors' and 'labels', to compare the result with exact clustering.
+       """
+
+    def __init__(self, output_folder, sample_size=SAMPLE_SIZE,
+                 features=DEFAULT_FEATURES, seed=None, keep=False):
+        HierarchicalClassifier.__init__(self, output_folder, features)
+        self.model = ApproximateClustering(len(features), sample_size, seed)
+        self.keep = keep
+        self.labels = []
+
+    def add(self, value, timestamp=None):
+        """Add a new value, offering its vector of features to the sample."""
+
+        self.values.append(value, timestamp)
+        self.counter += 1
+        if self.values.size > 1:
+            self.model.add(self.features())
+
+    def dendrogram(self):
+        """Cluster the sample. The dendrogram keeps the positions of the
+           sampled values and their vectors, as 'indices' and 'points'."""
+
+        return self.model.dendrogram('median', 'sqeuclidean')
+
+    def find_anomalies(self, k=2, threshold=None, dendrogram=None,
+                       chunks=()):
+        """Cut the dendrogram of the sample, and label values in a second
+           pass over 'chunks', the (timestamps, values) chunks of the serie
+           (see sampleloader.iter_chunks). Vectors of features are computed
+           again and labelled chunk by chunk."""
+
+        if dendrogram is None:
+            dendrogram = self.dendrogram()
+        values = NumericRingBuffer(BUFFER_SIZE)
+        extractor = FeatureExtractor(values, self.extractor.names)
+        counter = 0
+        for timestamps, chunk in chunks:
+            vectors, numbers, originals = [], [], []
+            for timestamp, value in zip(timestamps, chunk):
+                values.append(value, timestamp)
+                counter += 1
+                if values.size > 1:
+                    vectors.append(extractor.vector())
+                    numbers.append(counter)
+                    originals.append(value)
+            if not vectors:
+                continue
+            labels = self.model.labels(dendrogram, vectors, k, threshold)
+            self.orig.write(''.join('%s\n' % value for value in originals))
+            self.output.write(''.join('%d %d\n' % elt for elt
+                                      in zip(numbers, labels.tolist())))
+            if self.keep:
+                self.vectors.extend(vectors)
+                self.labels.extend(labels.tolist())
+        return dendrogram
+
+
+def make_parser():
+    parser = OptionParser(usage='%prog [options] INPUT OUTPUT_FOLDER',
+                          description='Find anomalies in a serie.')
+    parser.add_option('-o', '--online', dest='online', action='store_true',
+                      default=False,
+                      help='Label values while reading them, with bounded '
+                      'memory, instead of clustering the whole serie.')
+    parser.add_option('-f', '--features', dest='features',
+                      default=','.join(DEFAULT_FEATURES),
+                      help='Comma-separated features of the vectors, among: '
+                      '%s (default: %%default).' % ', '.join(sorted(FEATURES)))
+    parser.add_option('-k', '--classes', dest='classes', type='int',
+                      default=2,
+                      help='Number of classes to split values into '
+                      '(default: %default).')
+    parser.add_option('-t', '--threshold', dest='threshold', type='float',
+                      help='Split values into classes of values closer than '
+                      'this distance, instead of a number of classes.')
+    parser.add_option('-s', '--save', dest='save',
+                      help='Save the dendrogram into this .npz file.')
+    parser.add_option('-d', '--dendrogram', dest='dendrogram',
+                      action='store_true', default=False,
+                      help='INPUT is a dendrogram saved with --save: cut it '
+                      'without clustering the serie again.')
+    parser.add_option('-a', '--approximate', dest='sample_size', type='int',
+                      help='Only cluster a random sample of this many values, '
+                      'and label the other ones like the nearest one.')
+    parser.add_option('-q', '--quality', dest='quality', action='store_true',
+                      default=False,
+                      help='With --approximate, compare the classes with '
+                      'exact clustering (only for small series).')
+    return parser
+
+
+def parse_args(argv):
+    parser = make_parser()
+    (options, args) = parser.parse_args(args=argv)
+    if len(args) != 2:
+        parser.print_help()
         sys.exit(1)
-    filename = sys.argv[1]
-    output = sys.argv[2]
-    c = HierarchicalClassifier(output)
-    f = open(filename, 'rb')
-    for line in f:
-        c.add(float(line.split(' ')[1].replace(',', '.')))
-    c.find_anomalies()
-    f.close()
+    options.features = options.features.split(',')
+    unknown = [name for name in options.features if name not in FEATURES]
+    if unknown:
+        parser.error('unknown features: %s' % ', '.join(unknown))
+    if options.sample_size is not None and options.save:
+        parser.error('dendrograms of samples cannot be saved')
+    if options.quality and options.sample_size is None:
+        parser.error('--quality needs --approximate')
+    if options.classes < 1:
+        parser.error('--classes must be at least 1')
+    if options.online and options.save:
+        parser.error('online classification builds no dendrogram to save')
+    return (options, args)
+
+
+def check_classes(options, count):
+    """Exit with a usage error if 'count' clustered values cannot be split
+       into the requested number of classes"""
+
+    if options.threshold is None and 2 <= count < options.classes:
+        make_parser().error('cannot split %d values into %d classes'
+                            % (count, options.classes))
+
+
+if __name__ == "__main__":
+    (options, args) = parse_args(sys.argv[1:])
+    filename, output = args
+    if options.dendrogram:
+        c = HierarchicalClassifier(output, options.features)
+        dendrogram = Dendrogram.load(filename)
+        check_classes(options, dendrogram.n)
+        c.find_anomalies(options.classes, options.threshold, dendrogram)
+        sys.exit(0)
+    if options.online:
+        c = OnlineClassifier(output, features=options.features)
+    elif options.sample_size is not None:
+        c = ApproximateClassifier(output, options.sample_size,
+                                  options.features, keep=options.quality)
+    else:
+        c = HierarchicalClassifier(output, options.features)
+    report = LoadReport()
+    for timestamps, values in iter_chunks(filename, report=report):
+        for timestamp, value in zip(timestamps, values):
+            c.add(value, timestamp)
+    if report.bad_lines > 0:
+        print(report)
+    if options.online:
+        c.find_anomalies()
+    elif options.sample_size is not None:
+        check_classes(options, len(c.model.reservoir.items))
+        c.find_anomalies(options.classes, options.threshold,
+                         chunks=iter_chunks(filename))
+    else:
+        check_classes(options, len(c.numbers))
+        dendrogram = c.find_anomalies(options.classes, options.threshold)
+        if options.save:
+            dendrogram.save(options.save)
+    if options.quality:
+        report = compare(c.vectors, options.sample_size,
+                         options.classes, options.threshold,
+                         labels=c.labels)
+        for key in sorted(report):
+            print('%s: %s' % (key, report[key]))
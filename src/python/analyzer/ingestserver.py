@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+"""Ingest daemon analyzing live metric streams (Python 3 only).
+
+Samples are read as plaintext lines over TCP, UDP or a Unix socket, in any
+of the following forms:
+
+    1341056580 1.12                           (timestamp value)
+    load.1min 1.12 1341056580                 (Graphite)
+    load.1min 1341056580 1.12 web01           (OpenTSDB output, see mg)
+    put load.1min 1341056580 1.12 host=web01  (OpenTSDB telnet)
+
+Every series gets its own window of values and online clustering model
+(as in batchanalyzer), and anomalies are written as 'series timestamp
+value' lines as soon as they are detected.
+
+Lines are not parsed as they arrive: a connection buffers them, and the
+buffer is drained by batches of lines from the event loop so that a busy
+connection cannot starve the other ones. Reading from a connection is
+paused while its buffer is over a limit, which bounds the memory used by
+each client and pushes back on the fast ones."""
+
+import sys
+import asyncio
+from optparse import OptionParser
+from numericringbuffer import NumericRingBuffer
+from onlineclustering import OnlineClustering
+from features import DEFAULT_FEATURES, FEATURES, FeatureExtractor
+from sampleloader import LoadReport
+
+WINDOW_SIZE = 20
+DEFAULT_SERIES = 'default'
+MAX_SERIES = 100000
+MAX_BUFFER = 1 << 20
+MAX_LINE = 4096
+BATCH_SIZE = 1 << 16
+
+
+def series_key(metric, tags):
+    """Name of the series of a metric and its 'key=value' tags"""
+
+    if not tags:
+        return metric
+    return '%s{%s}' % (metric, ','.join(sorted(tags)))
+
+
+def parse_line(line, default_series=DEFAULT_SERIES):
+    """Parse a line into a (series, timestamp, value) tuple. Raise a
+       ValueError if the line is invalid."""
+
+    fields = line.split()
+    if fields and fields[0] == 'put':
+        if len(fields) < 4:
+            raise ValueError('incomplete put: %r' % line)
+        for tag in fields[4:]:
+            if '=' not in tag:
+                raise ValueError('invalid tag: %r' % tag)
+        return (series_key(fields[1], fields[4:]), float(fields[2]),
+                float(fields[3]))
+    if len(fields) == 2:
+        return (default_series, float(fields[0]),
+                float(fields[1].replace(',', '.')))
+    if len(fields) == 3:
+        return (fields[0], float(fields[2]), float(fields[1]))
+    if len(fields) == 4:
+        return (series_key(fields[0], ['host=' + fields[3]]),
+                float(fields[1]), float(fields[2]))
+    raise ValueError('unexpected number of fields: %r' % line)
+
+
+class Series(object):
+    """Window and model of a single series"""
+
+    __slots__ = ('values', 'extractor', 'model')
+
+    def __init__(self, window_size, features, model):
+        self.values = NumericRingBuffer(window_size)
+        self.extractor = FeatureExtractor(self.values, features)
+        self.model = model
+
+    def add(self, timestamp, value):
+        """Add a sample, return 1 if it is an anomaly, 0 otherwise"""
+
+        self.values.append(value, timestamp)
+        if self.values.size < 2:
+            return 0
+        return self.model.classify(self.extractor.vector())
+
+
+class IngestServer(object):
+    """Routes samples to their series, and writes anomalies to 'output'.
+
+       At most 'max_series' series are tracked: samples of further series
+       are rejected, so that a misbehaving client cannot exhaust memory."""
+
+    def __init__(self, output=None, window_size=WINDOW_SIZE,
+                 features=DEFAULT_FEATURES, model_factory=OnlineClustering,
+                 default_series=DEFAULT_SERIES, max_series=MAX_SERIES):
+        if output is None:
+            output = sys.stdout
+        self.output = output
+        self.window_size = window_size
+        self.features = features
+        self.model_factory = model_factory
+        self.default_series = default_series
+        self.max_series = max_series
+        self.series = {}
+        self.samples = 0
+        self.anomalies = 0
+        self.report = LoadReport()
+
+    def get_series(self, name):
+        """Get the series called 'name', creating it if needed. Return None
+           if there is no room for a new series."""
+
+        series = self.series.get(name)
+        if series is None and len(self.series) < self.max_series:
+            series = Series(self.window_size, self.features,
+                            self.model_factory())
+            self.series[name] = series
+        return series
+
+    def sample(self, name, timestamp, value):
+        """Add a sample to its series, return 1 if it is an anomaly"""
+
+        series = self.get_series(name)
+        if series is None:
+            return None
+        self.samples += 1
+        label = series.add(timestamp, value)
+        if label:
+            self.anomalies += 1
+            self.output.write('%s %d %s\n' % (name, timestamp, value))
+        return label
+
+    def ingest(self, lines):
+        """Parse and add a batch of lines"""
+
+        for line in lines:
+            if not line.strip():
+                continue
+            self.report.lines += 1
+            try:
+                name, timestamp, value = parse_line(line, self.default_series)
+            except ValueError:
+                self.report.reject(self.report.lines, line)
+                continue
+            if self.sample(name, timestamp, value) is None:
+                self.report.reject(self.report.lines, line)
+        self.output.flush()
+
+
+class StreamProtocol(asyncio.Protocol):
+    """Connection of a TCP or Unix socket client"""
+
+    def __init__(self, server, loop, max_buffer=MAX_BUFFER,
+                 batch_size=BATCH_SIZE):
+        self.server = server
+        self.loop = loop
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.buffer = bytearray()
+        self.transport = None
+        self.paused = False
+        self.scheduled = False
+        self.closed = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.buffer.extend(data)
+        if len(self.buffer) > self.max_buffer and not self.paused:
+            self.transport.pause_reading()
+            self.paused = True
+        if not self.scheduled:
+            self.scheduled = True
+            self.loop.call_soon(self.drain)
+
+    def drain(self):
+        """Ingest the complete lines of at most 'batch_size' bytes of the
+           buffer, and schedule another call if more are waiting."""
+
+        self.scheduled = False
+        end = self.buffer.rfind(b'\n', 0, self.batch_size) + 1
+        if end == 0:
+            end = self.buffer.find(b'\n') + 1
+        if end == 0 and len(self.buffer) > MAX_LINE:
+            # No line is that long, drop the garbage
+            self.server.report.lines += 1
+            self.server.report.reject(self.server.report.lines,
+                                      self.buffer[:80].decode('ascii',
+                                                              'replace'))
+            del self.buffer[:]
+        if end > 0:
+            lines = self.buffer[:end].decode('ascii', 'replace')
+            del self.buffer[:end]
+            self.server.ingest(lines.splitlines())
+        if self.buffer.find(b'\n') >= 0:
+            self.scheduled = True
+            self.loop.call_soon(self.drain)
+        elif self.closed and self.buffer:
+            # Last line, without end of line
+            lines = self.buffer.decode('ascii', 'replace')
+            del self.buffer[:]
+            self.server.ingest([lines])
+        if self.paused and len(self.buffer) <= self.max_buffer // 2 \
+           and not self.closed:
+            self.transport.resume_reading()
+            self.paused = False
+
+    def eof_received(self):
+        self.closed = True
+        if not self.scheduled:
+            self.drain()
+
+    def connection_lost(self, exc):
+        self.closed = True
+        if not self.scheduled:
+            self.drain()
+
+
+class DatagramProtocol(asyncio.DatagramProtocol):
+    """UDP endpoint: every datagram holds whole lines"""
+
+    def __init__(self, server):
+        self.server = server
+
+    def datagram_received(self, data, address):
+        self.server.ingest(data.decode('ascii', 'replace').splitlines())
+
+
+def listen(loop, server, host='127.0.0.1', port=None, udp_port=None,
+           unix_path=None):
+    """Start listening on the given endpoints, return the list of asyncio
+       servers and transports to close on shutdown."""
+
+    listeners = []
+    if port is not None:
+        listeners.append(loop.run_until_complete(
+            loop.create_server(lambda: StreamProtocol(server, loop), host,
+                               port)))
+    if udp_port is not None:
+        transport, protocol = loop.run_until_complete(
+            loop.create_datagram_endpoint(lambda: DatagramProtocol(server),
+                                          local_addr=(host, udp_port)))
+        listeners.append(transport)
+    if unix_path is not None:
+        listeners.append(loop.run_until_complete(
+            loop.create_unix_server(lambda: StreamProtocol(server, loop),
+                                    unix_path)))
+    return listeners
+
+
+def parse_args(argv):
+    parser = OptionParser(usage='%prog [options]',
+                          description='Detect anomalies in live metric '
+                          'streams.')
+    parser.add_option('-H', '--host', dest='host', default='127.0.0.1',
+                      help='Address to listen on (default: %default).')
+    parser.add_option('-p', '--port', dest='port', type='int',
+                      help='TCP port to listen on.')
+    parser.add_option('-u', '--udp', dest='udp_port', type='int',
+                      help='UDP port to listen on.')
+    parser.add_option('-s', '--socket', dest='unix_path',
+                      help='Unix socket to listen on.')
+    parser.add_option('-w', '--window', dest='window', type='int',
+                      default=WINDOW_SIZE,
+                      help='Size of the window features are computed on.')
+    parser.add_option('-f', '--features', dest='features',
+                      default=','.join(DEFAULT_FEATURES),
+                      help='Comma-separated features of the vectors '
+                      '(default: %default).')
+    parser.add_option('-m', '--max-series', dest='max_series', type='int',
+                      default=MAX_SERIES,
+                      help='Maximum number of series (default: %default).')
+    (options, args) = parser.parse_args(args=argv)
+    if args or (options.port is None and options.udp_port is None
+                and options.unix_path is None):
+        parser.print_help()
+        sys.exit(1)
+    options.features = options.features.split(',')
+    unknown = [name for name in options.features if name not in FEATURES]
+    if unknown:
+        parser.error('unknown features: %s' % ', '.join(unknown))
+    return (options, args)
+
+
+if __name__ == "__main__":
+    (options, args) = parse_args(sys.argv[1:])
+    server = IngestServer(window_size=options.window,
+                          features=options.features,
+                          max_series=options.max_series)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    listeners = listen(loop, server, options.host, options.port,
+                       options.udp_port, options.unix_path)
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    for listener in listeners:
+        listener.close()
+    loop.close()
+    sys.stderr.write('%d samples, %d series, %d anomalies\n%s\n'
+                     % (server.samples, len(server.series), server.anomalies,
+                        server.report))
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import math
+import numpy
+from features import DEFAULT_FEATURES, FeatureExtractor
+from onlineclustering import OnlineClustering
+
+
+class MultiRingBuffer(object):
+    """Ring buffer of several aligned series: each append adds one value per
+       series, at a timestamp shared by all of them. Values are stored into
+       a (max_size x series) numpy array, and statistics are computed for
+       all the series at once, with the same semantics as NumericRingBuffer.
+
+       Means, variances and the co-moments of values and timestamps are
+       maintained by the same shifted Welford updates as NumericRingBuffer,
+       one value per series, and recomputed once per turn of the buffer.
+       Other statistics are computed from the window by numpy."""
+
+    def __init__(self, max_size, series, blur=0):
+        self.max_size = max_size
+        self.series = series
+        self.blur = blur
+        self.data = numpy.zeros((max_size, series))
+        self.timestamps = numpy.zeros(max_size)
+        self.head = 0
+        self.size = 0
+        self.appended = 0
+        self.shift = numpy.zeros(series)
+        self.running_mean = numpy.zeros(series)
+        self.m2 = numpy.zeros(series)
+        self.time_shift = 0.0
+        self.time_mean = 0.0
+        self.time_m2 = 0.0
+        self.comoment = numpy.zeros(series)
+
+    def append(self, values, timestamp=None):
+        """Append one value per series. Without 'timestamp', the position
+           of the values in the series is used."""
+
+        values = numpy.asarray(values, dtype=float)
+        if timestamp is None:
+            timestamp = self.appended
+        timestamp = float(timestamp)
+        if self.size == self.max_size:
+            self.evict(self.data[self.head], self.timestamps[self.head])
+        else:
+            self.size += 1
+        self.data[self.head] = values
+        self.timestamps[self.head] = timestamp
+        self.insert(values, timestamp)
+        self.head += 1
+        if self.head == self.max_size:
+            self.head = 0
+            self.resync()
+
+    def insert(self, x, timestamp):
+        """Account for values entering the window"""
+
+        self.appended += 1
+        if self.size == 1:
+            self.shift = x.copy()
+            self.time_shift = timestamp
+        y = x - self.shift
+        delta = y - self.running_mean
+        self.running_mean += delta / self.size
+        self.m2 += delta * (y - self.running_mean)
+        t = timestamp - self.time_shift
+        delta = t - self.time_mean
+        self.time_mean += delta / self.size
+        self.time_m2 += delta * (t - self.time_mean)
+        self.comoment += delta * (y - self.running_mean)
+
+    def evict(self, x, timestamp):
+        """Account for values leaving the window. Called before the buffer
+           overwrites them, so 'size' still includes them."""
+
+        remaining = self.size - 1
+        if remaining == 0:
+            self.running_mean = numpy.zeros(self.series)
+            self.m2 = numpy.zeros(self.series)
+            self.time_mean = 0.0
+            self.time_m2 = 0.0
+            self.comoment = numpy.zeros(self.series)
+            return
+        y = x - self.shift
+        delta = y - self.running_mean
+        self.running_mean -= delta / remaining
+        self.m2 -= delta * (y - self.running_mean)
+        t = timestamp - self.time_shift
+        delta = t - self.time_mean
+        self.time_mean -= delta / remaining
+        self.time_m2 -= delta * (t - self.time_mean)
+        self.comoment -= delta * (y - self.running_mean)
+
+    def resync(self):
+        """Recompute running values from the window"""
+
+        window = self.window()
+        self.shift = window.mean(axis=0)
+        centered = window - self.shift
+        self.running_mean = centered.mean(axis=0)
+        centered -= self.running_mean
+        self.m2 = (centered ** 2).sum(axis=0)
+        timestamps = self.timestamps[:self.size]
+        self.time_shift = timestamps.mean()
+        times = timestamps - self.time_shift
+        self.time_mean = times.mean()
+        times -= self.time_mean
+        self.time_m2 = (times ** 2).sum()
+        self.comoment = times.dot(centered)
+
+    def window(self):
+        """Get current values, one column per series. Rows are not in order
+           of insertion once the buffer is full."""
+
+        return self.data[:self.size]
+
+    def last(self):
+        """Get last appended values"""
+
+        if self.size == 0:
+            return None
+        return self.data[self.head - 1]
+
+    def mean(self):
+        if self.size == 0:
+            return numpy.zeros(self.series)
+        return self.shift + self.running_mean
+
+    def variance(self):
+        """Get current (population) variance of every series"""
+
+        if self.size == 0:
+            return numpy.zeros(self.series)
+        return numpy.maximum(0.0, self.m2 / self.size)
+
+    def slope(self):
+        """Get the least-squares slope of every series against timestamps.
+           0 until two distinct timestamps are in the window."""
+
+        if self.size < 2 or self.time_m2 <= 0:
+            return numpy.zeros(self.series)
+        return self.comoment / self.time_m2
+
+    def trend_value(self):
+        """Get the value of the least-squares line of every series at the
+           last timestamp of the window"""
+
+        if self.size == 0:
+            return numpy.zeros(self.series)
+        elapsed = (self.timestamps[self.head - 1] - self.time_shift
+                   - self.time_mean)
+        return self.mean() + self.slope() * elapsed
+
+    def residual_variance(self):
+        """Get the variance of every series around its least-squares line,
+           with n - 2 degrees of freedom"""
+
+        if self.size < 3:
+            return numpy.zeros(self.series)
+        sse = self.m2
+        if self.time_m2 > 0:
+            sse = sse - self.comoment ** 2 / self.time_m2
+        return numpy.maximum(0.0, sse / (self.size - 2))
+
+    def min(self):
+        if self.size == 0:
+            return None
+        return self.window().min(axis=0)
+
+    def max(self):
+        if self.size == 0:
+            return None
+        return self.window().max(axis=0)
+
+    def binned(self):
+        """Get the window, with values quantized to the nearest multiple of
+           'blur' if any"""
+
+        window = self.window()
+        if not self.blur:
+            return window
+        return numpy.floor(window / self.blur + 0.5) * self.blur
+
+    def expected_value(self):
+        if self.size == 0:
+            return numpy.zeros(self.series)
+        if not self.blur:
+            return self.mean()
+        return self.binned().mean(axis=0)
+
+    def shannon_entropy(self, base=2):
+        """Get current entropy of every series. Counts of distinct values are
+           obtained by sorting each column and numbering runs of equal
+           values: entropy is log(n) - sum(c * log(c)) / n."""
+
+        n = self.size
+        if n == 0:
+            return numpy.zeros(self.series)
+        ordered = numpy.sort(self.binned(), axis=0)
+        new_run = numpy.ones(ordered.shape, dtype=bool)
+        new_run[1:] = ordered[1:] != ordered[:-1]
+        runs = numpy.cumsum(new_run, axis=0) - 1
+        keys = runs + numpy.arange(self.series) * n
+        counts = numpy.bincount(keys.ravel(), minlength=n * self.series)
+        counts = counts.reshape(self.series, n).astype(float)
+        xlogx = counts * numpy.log(numpy.maximum(counts, 1.0))
+        entropy = (math.log(n) - xlogx.sum(axis=1) / n) / math.log(base)
+        return numpy.maximum(0.0, entropy)
+
+    def percentage(self, percentage):
+        """Get the value under which there are xx% of the values, for every
+           series."""
+
+        if self.size == 0:
+            return None
+        index = min(self.size - 1, int(self.size * float(percentage / 100.0)))
+        return numpy.partition(self.window(), index, axis=0)[index]
+
+    def features(self, names=DEFAULT_FEATURES):
+        """Get a (series x features) matrix of registered features (see
+           features.py), by default those used by the classifiers."""
+
+        return numpy.column_stack(FeatureExtractor(self, names).vector())
+
+
+class MultiSeriesClassifier(object):
+    """Online anomaly detection over many aligned series: features of every
+       series are computed at once by a MultiRingBuffer, then each series is
+       labelled by its own model."""
+
+    def __init__(self, series, window_size=20, model_factory=OnlineClustering,
+                 features=DEFAULT_FEATURES):
+        self.values = MultiRingBuffer(window_size, series)
+        self.features = FeatureExtractor(self.values, features)
+        self.models = [model_factory() for i in range(series)]
+
+    def add(self, values, timestamp=None):
+        """Add one value per series. Returns the array of labels (1 for
+           anomalies), or None while the window holds a single value."""
+
+        self.values.append(values, timestamp)
+        if self.values.size < 2:
+            return None
+        features = numpy.column_stack(self.features.vector())
+        return numpy.array([model.classify(vector) for model, vector
+                            in zip(self.models, features)])
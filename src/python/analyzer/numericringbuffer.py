@@ -13,13 +13,212 @@
 # see <http://www.gnu.org/licenses/>.
 
 import math
+import bisect
+from array import array
+from collections import deque
 from ringbuffer import  RingBuffer
 
+def xlogx(count):
+    """Contribution of a histogram bin to the entropy sum"""
+
+    if count < 2: return 0.0
+    return count * math.log(count)
+
+
 class NumericRingBuffer(RingBuffer):
-    """Extends RingBuffer for implementing some calculs on numeric elements"""
+    """Extends RingBuffer for implementing some calculs on numeric elements.
+
+       Mean and variance are running values (Welford's algorithm) updated
+       when a value enters or leaves the window, and min/max are read from
+       monotonic deques, so they all cost O(1) per sample. Running values are
+       kept relative to a 'shift' close to the mean, and are recomputed from
+       the window once per turn of the buffer to bound the rounding drift.
+
+       A value -> count histogram is maintained the same way, along with the
+       sums needed by shannon_entropy() and expected_value(). A non-zero
+       'blur' quantizes values to the nearest multiple of it before counting
+       them, which bounds the histogram size on float metrics.
+
+       Order statistics (percentage(), rank(), sort()) rely on a sorted copy
+       of the window. It is only built on first use, then kept up to date
+       with binary searches on append and eviction.
+
+       Each value comes with a timestamp (its position in the serie by
+       default), and the co-moments of values and timestamps are maintained
+       the same way as the variance, which gives the least-squares trend of
+       the window (slope(), trend_value(), residual_variance()) in O(1)
+       too.
+
+       When 'check' is set, every statistic is also computed the naive way
+       and an AssertionError is raised if both results disagree."""
+
+    def __init__(self, max_size, blur=0, check=False):
+        """Init with max size"""
+
+        RingBuffer.__init__(self, max_size)
+        self.blur = blur
+        self.check = check
+        self.appended = 0
+        self.shift = 0.0
+        self.running_mean = 0.0
+        self.m2 = 0.0
+        self.timestamps = array('d', [0.0]) * max_size
+        self.time_shift = 0.0
+        self.time_mean = 0.0
+        self.time_m2 = 0.0
+        self.comoment = 0.0
+        self.min_candidates = deque()
+        self.max_candidates = deque()
+        self.histogram = {}
+        self.sum_xlogx = 0.0
+        self.sum_bins = 0.0
+        self.ordered = None
+
+    def allocate(self, max_size):
+        """Store values into a contiguous array of doubles"""
+
+        return array('d', [0.0]) * max_size
+
+    def append(self, x, timestamp=None):
+        """Append a new element, updating running statistics. Without
+           'timestamp', the position of the element in the serie is used."""
+
+        x = float(x)
+        if timestamp is None:
+            timestamp = self.appended
+        timestamp = float(timestamp)
+        if self.size == self.max_size:
+            self.evict(self.data[self.head], self.timestamps[self.head])
+        self.timestamps[self.head] = timestamp
+        RingBuffer.append(self, x)
+        self.insert(x, timestamp)
+        if self.head == 0:
+            self.resync()
+
+    def bin(self, x, blur=None):
+        """Get the histogram bin 'x' falls into"""
+
+        if blur is None:
+            blur = self.blur
+        if not blur:
+            return x
+        return math.floor(x / blur + 0.5) * blur
+
+    def insert(self, x, timestamp):
+        """Account for a value entering the window"""
+
+        self.appended += 1
+        if self.size == 1:
+            self.shift = x
+            self.time_shift = timestamp
+        y = x - self.shift
+        delta = y - self.running_mean
+        self.running_mean += delta / self.size
+        self.m2 += delta * (y - self.running_mean)
+        t = timestamp - self.time_shift
+        delta = t - self.time_mean
+        self.time_mean += delta / self.size
+        self.time_m2 += delta * (t - self.time_mean)
+        self.comoment += delta * (y - self.running_mean)
+        # Candidates are (position, value) pairs: a value can be forgotten as
+        # soon as a more recent one is smaller (resp. greater) than it.
+        while self.min_candidates and self.min_candidates[-1][1] >= x:
+            self.min_candidates.pop()
+        self.min_candidates.append((self.appended, x))
+        while self.max_candidates and self.max_candidates[-1][1] <= x:
+            self.max_candidates.pop()
+        self.max_candidates.append((self.appended, x))
+        oldest = self.appended - self.max_size
+        while self.min_candidates[0][0] <= oldest:
+            self.min_candidates.popleft()
+        while self.max_candidates[0][0] <= oldest:
+            self.max_candidates.popleft()
+        key = self.bin(x)
+        count = self.histogram.get(key, 0)
+        self.histogram[key] = count + 1
+        self.sum_xlogx += xlogx(count + 1) - xlogx(count)
+        self.sum_bins += key
+        if self.ordered is not None:
+            bisect.insort(self.ordered, x)
+
+    def evict(self, x, timestamp):
+        """Account for a value leaving the window. Called before the buffer
+           overwrites it, so 'size' still includes it."""
+
+        key = self.bin(x)
+        count = self.histogram[key]
+        if count == 1:
+            del self.histogram[key]
+        else:
+            self.histogram[key] = count - 1
+        self.sum_xlogx += xlogx(count - 1) - xlogx(count)
+        self.sum_bins -= key
+        if self.ordered is not None:
+            del self.ordered[bisect.bisect_left(self.ordered, x)]
+        remaining = self.size - 1
+        if remaining == 0:
+            self.running_mean = 0.0
+            self.m2 = 0.0
+            self.time_mean = 0.0
+            self.time_m2 = 0.0
+            self.comoment = 0.0
+            return
+        y = x - self.shift
+        delta = y - self.running_mean
+        self.running_mean -= delta / remaining
+        self.m2 -= delta * (y - self.running_mean)
+        t = timestamp - self.time_shift
+        delta = t - self.time_mean
+        self.time_mean -= delta / remaining
+        self.time_m2 -= delta * (t - self.time_mean)
+        self.comoment -= delta * (y - self.running_mean)
+
+    def resync(self):
+        """Recompute running values from the window"""
+
+        if self.size == 0: return
+        self.shift = math.fsum(self) / self.size
+        self.running_mean = math.fsum(elt - self.shift for elt in self) \
+            / self.size
+        self.m2 = math.fsum((elt - self.shift - self.running_mean) ** 2
+                            for elt in self)
+        timestamps = self.timestamps[0:self.size]
+        self.time_shift = math.fsum(timestamps) / self.size
+        self.time_mean = math.fsum(t - self.time_shift for t in timestamps) \
+            / self.size
+        self.time_m2 = math.fsum((t - self.time_shift - self.time_mean) ** 2
+                                 for t in timestamps)
+        self.comoment = math.fsum(
+            (t - self.time_shift - self.time_mean)
+            * (x - self.shift - self.running_mean)
+            for x, t in zip(self.data[0:self.size], timestamps))
+        self.sum_xlogx = math.fsum(xlogx(count)
+                                   for count in self.histogram.values())
+        self.sum_bins = math.fsum(key * count
+                                  for key, count in self.histogram.items())
+
+    def verify(self, name, actual, expected, scale=0.0):
+        """Raise an AssertionError if an incremental result differs from the
+           naive one. Only used in check mode. 'scale' is the magnitude of
+           the terms 'expected' results from, when it can be much smaller
+           than them."""
+
+        tolerance = 1e-9 * max(1.0, abs(expected), scale)
+        if abs(actual - expected) > tolerance:
+            raise AssertionError('%s: incremental %r != naive %r'
+                                 % (name, actual, expected))
 
     def mean(self):
-        """Compute the current mean value"""
+        """Get the current mean value"""
+
+        if self.size == 0: return 0
+        result = self.shift + self.running_mean
+        if self.check:
+            self.verify('mean', result, self.naive_mean())
+        return result
+
+    def naive_mean(self):
+        """Compute the current mean value by scanning the buffer"""
 
         total = 0
         if self.size == 0: return 0
@@ -27,55 +226,147 @@ class NumericRingBuffer(RingBuffer):
             total += elt
         return float(total / float(self.size))
 
+    def count(self, x):
+        """Count occurrences of x"""
+
+        if self.blur:
+            return RingBuffer.count(self, x)
+        return self.histogram.get(x, 0)
+
+    def distinct(self):
+        """Retrieve list of distinct elements (or bins, when blurred)"""
+
+        return list(self.histogram)
+
     def p_x(self, x):
-        """Get probablity of seeing 'x' into the buffer"""
+        """Get probablity of seeing 'x' (or its bin, when blurred) into the
+           buffer"""
 
         if self.size == 0: return 0
-        return float(self.count(x) / float(self.size))
+        return float(self.histogram.get(self.bin(x), 0) / float(self.size))
 
     def expected_value(self):
         """Get current expected value"""
 
-        result = 0.0
         if self.size == 0: return 0
-        for elt in self.distinct():
-            result += self.p_x(elt) * elt
+        result = self.sum_bins / self.size
+        if self.check:
+            self.verify('expected_value', result, self.naive_expected_value())
         return result
 
+    def naive_expected_value(self):
+        """Compute current expected value by counting every distinct bin"""
+
+        result = 0.0
+        if self.size == 0: return 0
+        values = [self.bin(elt) for elt in self]
+        for elt in set(values):
+            result += values.count(elt) * elt
+        return result / self.size
+
     def shannon_entropy(self, base=2, blur=0):
         """Get current entropy of values within the current buffer. Getting '0'
            means there is no surprise, we still get the same value.
-           FIXME: Use a blur parameter? (or should it be applied at an higher
-           level ?"""
+           Values are counted by bins of the buffer's blur, unless another
+           non-zero 'blur' is given, in which case the entropy is computed
+           by scanning the buffer."""
+
+        if blur and blur != self.blur:
+            return self.naive_shannon_entropy(base, blur)
+        if len(self.histogram) < 2: return 0.0
+        n = self.size
+        entropy = (math.log(n) - self.sum_xlogx / n) / math.log(base)
+        result = max(0.0, entropy)
+        if self.check:
+            self.verify('shannon_entropy', result,
+                        self.naive_shannon_entropy(base))
+        return result
+
+    def naive_shannon_entropy(self, base=2, blur=None):
+        """Compute current entropy by counting every distinct bin"""
 
         entropy = 0.0
-        X = self.distinct()
-        n = len(X)
-        for i in range(n):
-            X_i = X[i]
-            P_i = self.p_x(X_i)
+        values = [self.bin(elt, blur) for elt in self]
+        for X_i in set(values):
+            P_i = values.count(X_i) / float(self.size)
             entropy += P_i * math.log(P_i, base)
         return -entropy
 
     def variance(self):
-        """Get current variance"""
+        """Get current (population) variance"""
+
+        if self.size == 0: return 0.0
+        result = max(0.0, self.m2 / self.size)
+        if self.check:
+            self.verify('variance', result, self.naive_variance())
+        return result
+
+    def naive_variance(self):
+        """Compute current (population) variance by scanning the buffer"""
 
         variance = 0.0
-        mean = self.mean()
-        for i in range(self.size):
-            X_i = self.get(i)
-            variance += self.p_x(X_i) * ((X_i - mean)**2)
-        return variance
+        if self.size == 0: return variance
+        mean = self.naive_mean()
+        for elt in self:
+            variance += (elt - mean) ** 2
+        return variance / self.size
+
+    def sorted_window(self):
+        """Get the sorted index of the window, building it if needed"""
+
+        if self.ordered is None:
+            self.ordered = sorted(self)
+        return self.ordered
+
+    def sort(self):
+        """Retrieve list of sorted data."""
+
+        return list(self.sorted_window())
 
     def percentage(self, percentage):
         """Get the value under which there are xx% of the values."""
 
-        sorted = self.sort()
+        sorted = self.sorted_window()
+        size = len(sorted)
+        index = min(size - 1, int(size * float(percentage / 100.0)))
+        result = sorted[index]
+        if self.check:
+            self.verify('percentage', result,
+                        self.naive_percentage(percentage))
+        return result
+
+    def naive_percentage(self, percentage):
+        """Get the value under which there are xx% of the values by sorting
+           the window."""
+
+        sorted = self[0:self.size]
+        sorted.sort()
         size = len(sorted)
         index = min(size - 1, int(size * float(percentage / 100.0)))
         return sorted[index]
 
+    def rank(self, x):
+        """Get the number of values strictly lower than x"""
+
+        return bisect.bisect_left(self.sorted_window(), x)
+
+    def percentage_lower_than(self, x):
+        """Get the percentage of values strictly lower than x"""
+
+        if self.size == 0: return 0
+        return 100.0 * self.rank(x) / self.size
+
     def min(self):
+        """Get the smallest value of the window"""
+
+        if self.size == 0: return None
+        result = self.min_candidates[0][1]
+        if self.check:
+            self.verify('min', result, self.naive_min())
+        return result
+
+    def naive_min(self):
+        if self.size == 0: return None
         result = self[0]
         for elt in self:
             if elt < result:
@@ -83,8 +374,83 @@ class NumericRingBuffer(RingBuffer):
         return result
 
     def max(self):
+        """Get the greatest value of the window"""
+
+        if self.size == 0: return None
+        result = self.max_candidates[0][1]
+        if self.check:
+            self.verify('max', result, self.naive_max())
+        return result
+
+    def naive_max(self):
+        if self.size == 0: return None
         result = self[0]
         for elt in self:
             if elt > result:
                 result = elt
         return result
+
+    def pairs(self):
+        """Get the (timestamp, value) pairs of the window, in storage order"""
+
+        return zip(self.timestamps[0:self.size], self.data[0:self.size])
+
+    def slope(self):
+        """Get the least-squares slope of values against timestamps, in
+           value units per timestamp unit. 0 until two distinct timestamps
+           are in the window."""
+
+        if self.size < 2 or self.time_m2 <= 0: return 0.0
+        result = self.comoment / self.time_m2
+        if self.check:
+            self.verify('slope', result, self.naive_slope())
+        return result
+
+    def naive_slope(self):
+        """Compute the least-squares slope by scanning the window"""
+
+        if self.size < 2: return 0.0
+        pairs = list(self.pairs())
+        time_mean = math.fsum(t for t, x in pairs) / self.size
+        mean = math.fsum(x for t, x in pairs) / self.size
+        sxx = math.fsum((t - time_mean) ** 2 for t, x in pairs)
+        if sxx <= 0: return 0.0
+        sxy = math.fsum((t - time_mean) * (x - mean) for t, x in pairs)
+        return sxy / sxx
+
+    def trend_value(self):
+        """Get the value of the least-squares line at the last timestamp of
+           the window. Unlike its intercept at timestamp 0, it stays of the
+           same magnitude as the values when timestamps are epochs."""
+
+        if self.size == 0: return 0.0
+        elapsed = (self.timestamps[self.head - 1] - self.time_shift
+                   - self.time_mean)
+        return self.mean() + self.slope() * elapsed
+
+    def residual_variance(self):
+        """Get the variance of values around the least-squares line, with
+           n - 2 degrees of freedom"""
+
+        if self.size < 3: return 0.0
+        sse = self.m2
+        if self.time_m2 > 0:
+            sse -= self.comoment ** 2 / self.time_m2
+        result = max(0.0, sse / (self.size - 2))
+        if self.check:
+            self.verify('residual_variance', result,
+                        self.naive_residual_variance(),
+                        self.m2 / (self.size - 2))
+        return result
+
+    def naive_residual_variance(self):
+        """Compute the residual variance by scanning the window"""
+
+        if self.size < 3: return 0.0
+        pairs = list(self.pairs())
+        slope = self.naive_slope()
+        time_mean = math.fsum(t for t, x in pairs) / self.size
+        mean = math.fsum(x for t, x in pairs) / self.size
+        sse = math.fsum((x - mean - slope * (t - time_mean)) ** 2
+                        for t, x in pairs)
+        return sse / (self.size - 2)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import numpy
+
+
+class OnlineClustering(object):
+    """Incremental clustering of feature vectors, labelling each vector as
+       soon as it arrives. Memory is bounded by the maximum number of
+       clusters.
+
+       Features are compared after being scaled by their running standard
+       deviation. A vector joins its nearest cluster, whose centroid moves
+       toward it (online k-means), unless it is further than 'threshold'
+       from every centroid: it then starts a new cluster, the two closest
+       clusters being merged first if there is no room left. Weights of
+       clusters are multiplied by 'decay' at each step so that the model
+       follows slow changes of the series.
+
+       A vector is an anomaly if its cluster holds less than 'min_weight'
+       of the total weight, i.e. if it looks like only a few recent
+       vectors."""
+
+    def __init__(self, max_clusters=8, threshold=3.0, min_weight=0.05,
+                 decay=1.0, warmup=20):
+        self.max_clusters = max_clusters
+        self.threshold = threshold
+        self.min_weight = min_weight
+        self.decay = decay
+        self.warmup = warmup
+        self.n = 0
+        self.clusters = 0
+        self.weights = numpy.zeros(max_clusters)
+        self.centroids = None
+        self.mean = None
+        self.m2 = None
+
+    def scale(self):
+        """Get current standard deviation of every feature"""
+
+        std = numpy.sqrt(self.m2 / max(1, self.n))
+        std[std == 0] = 1.0
+        return std
+
+    def update_scale(self, x):
+        """Update running mean and variance of every feature"""
+
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def distances(self, x):
+        """Scaled distances from x to every centroid"""
+
+        differences = (self.centroids[:self.clusters] - x) / self.scale()
+        return numpy.sqrt((differences ** 2).sum(axis=1))
+
+    def merge_closest(self):
+        """Merge the two closest clusters, to make room for a new one"""
+
+        scaled = self.centroids[:self.clusters] / self.scale()
+        differences = scaled[:, numpy.newaxis, :] - scaled[numpy.newaxis, :, :]
+        d = (differences ** 2).sum(axis=2)
+        d[numpy.diag_indices(self.clusters)] = numpy.inf
+        i, j = numpy.unravel_index(numpy.argmin(d), d.shape)
+        total = self.weights[i] + self.weights[j]
+        self.centroids[i] = (self.weights[i] * self.centroids[i] +
+                             self.weights[j] * self.centroids[j]) / total
+        self.weights[i] = total
+        last = self.clusters - 1
+        self.centroids[j] = self.centroids[last]
+        self.weights[j] = self.weights[last]
+        self.weights[last] = 0.0
+        self.clusters -= 1
+
+    def add_cluster(self, x):
+        if self.clusters == self.max_clusters:
+            self.merge_closest()
+        self.centroids[self.clusters] = x
+        self.clusters += 1
+        return self.clusters - 1
+
+    def classify(self, vector):
+        """Add a feature vector. Returns 1 if it is an anomaly, 0 otherwise"""
+
+        x = numpy.asarray(vector, dtype=float)
+        if self.centroids is None:
+            self.centroids = numpy.zeros((self.max_clusters, len(x)))
+            self.mean = numpy.zeros(len(x))
+            self.m2 = numpy.zeros(len(x))
+        self.weights *= self.decay
+        if self.clusters == 0:
+            cluster = self.add_cluster(x)
+        else:
+            distances = self.distances(x)
+            cluster = int(numpy.argmin(distances))
+            if distances[cluster] > self.threshold:
+                cluster = self.add_cluster(x)
+        self.weights[cluster] += 1.0
+        self.centroids[cluster] += \
+            (x - self.centroids[cluster]) / self.weights[cluster]
+        self.update_scale(x)
+        if self.n <= self.warmup:
+            return 0
+        if self.weights[cluster] < self.min_weight * self.weights.sum():
+            return 1
+        return 0
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import math
+import random
+import bisect
+
+
+class QuantileSketch(object):
+    """KLL quantile sketch: approximates the distribution of an unbounded
+       stream with a memory footprint only depending on 'k'.
+
+       Values are stored into a hierarchy of compactors. Items of level 'h'
+       stand for 2^h values of the stream. When a level is full, it is sorted
+       and one item out of two (randomly the odd or even ones) is promoted to
+       the next level, the others are dropped. Lower levels get geometrically
+       smaller capacities, so memory stays around 3 * k items.
+
+       The query API mimics SuperList so that both can be used by the
+       DistributionAnalyzer. Results are exact as long as nothing has been
+       compacted yet."""
+
+    def __init__(self, k=200, seed=None):
+        """Init with accuracy parameter 'k': the greater, the more accurate
+           and the larger."""
+
+        self.k = k
+        self.random = random.Random(seed)
+        self.compactors = []
+        self.n = 0
+        self.stored = 0
+        self.max_stored = 0
+        self.min = None
+        self.max = None
+        self.grow()
+
+    def __len__(self):
+        """Number of values seen so far"""
+
+        return self.n
+
+    def capacity(self, height):
+        """Number of items level 'height' can hold before being compacted"""
+
+        depth = len(self.compactors) - height - 1
+        return int(math.ceil(self.k * (2.0 / 3.0) ** depth)) + 1
+
+    def grow(self):
+        """Add a new level on top of the hierarchy"""
+
+        self.compactors.append([])
+        self.max_stored = sum(self.capacity(h)
+                              for h in range(len(self.compactors)))
+
+    def append(self, x):
+        """Add a new value"""
+
+        if self.n == 0:
+            self.min = self.max = x
+        elif x < self.min:
+            self.min = x
+        elif x > self.max:
+            self.max = x
+        self.compactors[0].append(x)
+        self.n += 1
+        self.stored += 1
+        if self.stored >= self.max_stored:
+            self.compress()
+
+    def extend(self, values):
+        """Add several values"""
+
+        for x in values:
+            self.append(x)
+
+    def compress(self):
+        """Compact levels until the sketch fits into its capacity again"""
+
+        for h in range(len(self.compactors)):
+            if self.stored < self.max_stored:
+                break
+            items = self.compactors[h]
+            if len(items) < self.capacity(h):
+                continue
+            if h + 1 == len(self.compactors):
+                self.grow()
+            items.sort()
+            # An odd item stays at this level so that weights remain exact
+            odd = len(items) % 2
+            promoted = items[odd + self.random.randint(0, 1)::2]
+            self.compactors[h] = items[:odd]
+            self.compactors[h + 1].extend(promoted)
+            self.stored -= len(items) - odd - len(promoted)
+
+    def merge(self, other):
+        """Merge another sketch built with the same 'k' into this one"""
+
+        if other.n == 0:
+            return
+        while len(self.compactors) < len(other.compactors):
+            self.grow()
+        for h, items in enumerate(other.compactors):
+            self.compactors[h].extend(items)
+        if self.n == 0:
+            self.min, self.max = other.min, other.max
+        else:
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.n += other.n
+        self.stored += other.stored
+        while self.stored >= self.max_stored:
+            self.compress()
+
+    def is_exact(self):
+        """True if no value has been dropped so far"""
+
+        return len(self.compactors[0]) == self.n
+
+    def error(self):
+        """Get the normalized rank error of a single query. Approximation
+           given for KLL sketches with a 99% confidence by Apache
+           DataSketches."""
+
+        if self.is_exact():
+            return 0.0
+        return min(1.0, 2.296 / self.k ** 0.9723)
+
+    def weighted_items(self):
+        """Get sorted (value, weight) pairs of stored items"""
+
+        items = []
+        for h, compactor in enumerate(self.compactors):
+            weight = 2 ** h
+            items.extend((x, weight) for x in compactor)
+        items.sort()
+        return items
+
+    def percentage(self, percentage, reverse=False):
+        """Get the value under/over which there are xx% of the values."""
+
+        return self.percentages([percentage], reverse)[0]
+
+    def percentages(self, percentages, reverse=False):
+        """Get the value under/over which there are xx% of the values, for
+           each of the given percentages, sorting stored items only once."""
+
+        if self.n == 0:
+            raise IndexError('empty sketch')
+        items = self.weighted_items()
+        cumulated = []
+        seen = 0
+        for x, weight in items:
+            seen += weight
+            cumulated.append(seen)
+        result = []
+        for percentage in percentages:
+            index = min(self.n - 1, int(self.n * float(percentage / 100.0)))
+            if reverse:
+                index = self.n - 1 - index
+            if index == 0:
+                result.append(self.min)
+            elif index == self.n - 1:
+                result.append(self.max)
+            else:
+                pos = bisect.bisect_right(cumulated, index)
+                result.append(items[min(pos, len(items) - 1)][0])
+        return result
+
+    def rank(self, value):
+        """Estimate the number of values strictly lower than 'value'"""
+
+        total = 0
+        for h, compactor in enumerate(self.compactors):
+            weight = 2 ** h
+            total += weight * sum(1 for x in compactor if x < value)
+        return total
+
+    def percentage_lower_than(self, value):
+        if self.n == 0:
+            return 0.0
+        return 100.0 * float(self.rank(value)) / float(self.n)
+
+    def percentages_lower_than(self, values):
+        """Get the percentage of values lower than each of the given
+           values."""
+
+        return [self.percentage_lower_than(value) for value in values]
+
+    def percentage_greater_than(self, value):
+        return 100 - self.percentage_lower_than(value)
@@ -12,53 +12,74 @@
 # of the GNU Lesser General Public License along with this program.  If not,
 # see <http://www.gnu.org/licenses/>.
 
+import numpy
+
+
 class RingBuffer(object):
     """Circular buffer, implementing convenient methods. Suppose to contain
        numerical values.
 
-       TODO: Put array logic into a traditional array structure.
+       Elements are stored into a preallocated array and 'head' points to
+       the slot the next element will be written to, so appending does not
+       shift anything. Positions are relative to the last appended element:
+       get(0) is the most recent one.
        """
 
     def __init__(self, max_size):
         """Init with max size"""
 
         self.max_size = max_size
-        # FIXME: Use zeros()
-        self.data = [None for i in xrange(max_size)]
+        self.data = self.allocate(max_size)
+        self.head = 0
         self.size = 0
 
+    def allocate(self, max_size):
+        """Build the underlying storage. Subclasses may override it to use a
+           typed array instead of a list of objects."""
+
+        return [None] * max_size
+
     def append(self, x):
         """Append a new element"""
 
-        self.data.pop(0)
-        self.data.append(x)
+        self.data[self.head] = x
+        self.head += 1
+        if self.head == self.max_size:
+            self.head = 0
         if (self.size < self.max_size):
             self.size += 1
 
+    def extend(self, values):
+        """Append several elements, for instance a slice of a series store"""
+
+        for x in values:
+            self.append(x)
+
     def get_data(self):
         """Get raw data"""
 
         return self.data
 
     def __iter__(self):
-        """Allow to iterate over the buffer. Beware that we are returning a new
-           list"""
+        """Allow to iterate over the buffer, from the most recent element to
+           the oldest one."""
 
-        result = []
         for i in range(self.size):
-            result.append(self.get(i))
-        return result.__iter__()
+            yield self.get(i)
 
     def get(self, pos):
         """Retrieve element a given position"""
 
-        return self.data[self.max_size - 1 - pos]
+        if pos < 0 or pos >= self.max_size:
+            raise IndexError('ring buffer index out of range')
+        return self.data[(self.head - 1 - pos) % self.max_size]
 
     def __getitem__(self, key):
         """Override the [] operator"""
 
         if isinstance(key, slice):
-            return [self.get(pos) for pos in range(key.start, key.stop)]
+            return [self.get(pos) for pos in
+                    range(*key.indices(self.size))]
         else:
             return self.get(key)
 
@@ -68,22 +89,50 @@ class RingBuffer(object):
         if (self.size == 0):
             return None
         else:
-            return self.data[self.max_size - 1]
+            return self.get(0)
+
+    def oldest(self):
+        """Get oldest element"""
+
+        if (self.size == 0):
+            return None
+        else:
+            return self.get(self.size - 1)
+
+    def view(self):
+        """Get the current window as one or two numpy segments, from the
+           oldest element to the most recent one. Nothing is copied, so the
+           segments are only valid until the next append. Requires a typed
+           array storage (see NumericRingBuffer)."""
+
+        if self.size == 0:
+            return []
+        memory = numpy.frombuffer(self.data, dtype=self.data.typecode)
+        start = (self.head - self.size) % self.max_size
+        if start + self.size <= self.max_size:
+            return [memory[start:start + self.size]]
+        return [memory[start:], memory[:self.head]]
 
     def count(self, x):
         """Count occurrences of x"""
 
-        return self.data.count(x)
+        if self.size == self.max_size:
+            return self.data.count(x)
+        # Not full yet: elements still sit at the beginning of the storage
+        return self.data[0:self.size].count(x)
 
     def distinct(self):
-        """Retrieve list of distinct elements. We do not consider the
-           initial 'None' elements."""
+        """Retrieve list of distinct elements, in order of first appearance.
+           We do not consider the initial 'None' elements."""
 
-        if self.size < self.max_size:
-            list = [self.get(i) for i in range(self.size)]
-        else:
-            list = self.data
-        return dict.fromkeys(list).keys()
+        seen = set()
+        result = []
+        for pos in range(self.size - 1, -1, -1):
+            elt = self.get(pos)
+            if elt not in seen:
+                seen.add(elt)
+                result.append(elt)
+        return result
 
     def sort(self):
         """Retrieve list of sorted data."""
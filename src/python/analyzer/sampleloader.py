@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+"""Bulk loader for metric sample files, made of 'timestamp value' lines:
+
+    1341056580 1,12
+    1341056585 1,11
+
+Lines are parsed by chunks into array('d') columns, each chunk in a single
+numpy call. Commas are accepted as decimal separators, and invalid lines are
+counted into a LoadReport instead of interrupting the load.
+
+Binary stores (see seriesstore) are accepted as well: their timestamp and
+value columns are then returned as numpy views on the mapped file, which is
+unmapped once these views are released."""
+
+from array import array
+from itertools import islice
+import numpy
+import warnings
+
+CHUNK_SIZE = 65536
+
+
+class LoadReport(object):
+    """Counts lines read by the loader, and remembers a few invalid ones."""
+
+    MAX_EXAMPLES = 5
+
+    def __init__(self):
+        self.lines = 0
+        self.bad_lines = 0
+        self.examples = []
+
+    def reject(self, number, line):
+        """Account for an invalid line"""
+
+        self.bad_lines += 1
+        if len(self.examples) < self.MAX_EXAMPLES:
+            self.examples.append((number, line.rstrip('\r\n')))
+
+    def __str__(self):
+        result = '%d lines read, %d ignored' % (self.lines, self.bad_lines)
+        for number, line in self.examples:
+            result += '\n  line %d: %r' % (number, line)
+        if self.bad_lines > len(self.examples):
+            result += '\n  ...'
+        return result
+
+
+def parse_lines(lines, columns, sep, report, first_number=1):
+    """Parse a list of lines into one array('d') per requested column."""
+
+    if sep != ',':
+        lines = [line.replace(',', '.') for line in lines]
+    try:
+        with warnings.catch_warnings():
+            # Chunks made of blank lines only are not worth a warning
+            warnings.simplefilter('ignore')
+            data = numpy.loadtxt(lines, dtype='d', delimiter=sep,
+                                 usecols=columns, comments=None, ndmin=2)
+        report.lines += len(data)
+        return tuple(array('d', data[:, i].tobytes())
+                     for i in range(len(columns)))
+    except (IndexError, ValueError):
+        pass
+    # Some lines are invalid: parse them one by one to find which ones
+    rows = [line.split(sep) for line in lines]
+    result = tuple(array('d') for c in columns)
+    for number, row in enumerate(rows, first_number):
+        if not lines[number - first_number].strip():
+            continue
+        report.lines += 1
+        try:
+            values = [float(row[c]) for c in columns]
+        except (IndexError, ValueError):
+            report.reject(number, lines[number - first_number])
+            continue
+        for column, value in zip(result, values):
+            column.append(value)
+    return result
+
+
+def open_store(path):
+    """Get a SeriesStore on 'path' if it is a binary store, None otherwise"""
+
+    import seriesstore
+    if seriesstore.is_store(path):
+        return seriesstore.SeriesStore(path)
+    return None
+
+
+def read_store(store, columns, start=0, stop=None):
+    """Get views on the requested columns of a store. They keep the mapping
+       alive after the store is closed."""
+
+    data = (store.timestamps, store.values)
+    return tuple(data[c][start:stop] for c in columns)
+
+
+def iter_chunks(path, columns=(0, 1), sep=' ', chunk_size=CHUNK_SIZE,
+                report=None):
+    """Iterate over a sample file by chunks of at most 'chunk_size' lines.
+       Each chunk is a tuple holding one array('d') per requested column."""
+
+    if report is None:
+        report = LoadReport()
+    store = open_store(path)
+    if store is not None:
+        with store:
+            report.lines += len(store)
+            for start in range(0, len(store), chunk_size):
+                yield read_store(store, columns, start, start + chunk_size)
+        return
+    f = open(path, 'r')
+    try:
+        number = 1
+        while True:
+            lines = list(islice(f, chunk_size))
+            if not lines:
+                break
+            yield parse_lines(lines, columns, sep, report, number)
+            number += len(lines)
+    finally:
+        f.close()
+
+
+def load(path, columns=(0, 1), sep=' ', report=None):
+    """Load a whole sample file. Returns a tuple holding one array('d') per
+       requested column (or one numpy view, for binary stores)."""
+
+    store = open_store(path)
+    if store is not None:
+        with store:
+            if report is not None:
+                report.lines += len(store)
+            return read_store(store, columns)
+    result = tuple(array('d') for c in columns)
+    for chunk in iter_chunks(path, columns, sep, report=report):
+        for column, values in zip(result, chunk):
+            column.extend(values)
+    return result
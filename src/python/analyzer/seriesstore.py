@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+"""Binary time-series store. A store file is made of a small header followed
+by fixed-width records:
+
+    header:  'OGTS' magic, format version (uint16), 2 padding bytes
+    records: timestamp (int64), value (float64), little endian
+
+Readers map the file in memory and expose timestamps and values as numpy
+views on it, so nothing is parsed nor copied when loading a store. Records
+are only appended, which lets collectors feed a store while it is read."""
+
+import os
+import sys
+import mmap
+import struct
+import numpy
+from sampleloader import LoadReport, iter_chunks
+
+MAGIC = b'OGTS'
+VERSION = 1
+HEADER = struct.Struct('<4sHxx')
+RECORD = numpy.dtype([('timestamp', '<i8'), ('value', '<f8')])
+
+
+def is_store(path):
+    """Check whether 'path' is a binary store rather than a text file"""
+
+    f = open(path, 'rb')
+    try:
+        return f.read(len(MAGIC)) == MAGIC
+    finally:
+        f.close()
+
+
+def append(path, timestamps, values):
+    """Append samples to a store, creating it if needed"""
+
+    records = numpy.empty(len(values), dtype=RECORD)
+    records['timestamp'] = timestamps
+    records['value'] = values
+    f = open(path, 'ab')
+    try:
+        if f.tell() == 0:
+            f.write(HEADER.pack(MAGIC, VERSION))
+        f.write(records.tobytes())
+    finally:
+        f.close()
+
+
+def write(path, timestamps, values):
+    """Write samples to a new store, replacing any existing file"""
+
+    if os.path.exists(path):
+        os.remove(path)
+    append(path, timestamps, values)
+
+
+def convert(input, output, sep=' ', report=None):
+    """Convert a text sample file into a new store"""
+
+    if os.path.exists(output):
+        os.remove(output)
+    for timestamps, values in iter_chunks(input, (0, 1), sep, report=report):
+        append(output, timestamps, values)
+
+
+class SeriesStore(object):
+    """Read-only, memory-mapped view of a store file."""
+
+    def __init__(self, path):
+        f = open(path, 'rb')
+        try:
+            magic, version = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError('%s is not a series store' % path)
+            if version != VERSION:
+                raise ValueError('%s: unsupported store version %d'
+                                 % (path, version))
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+        size = (len(self.mmap) - HEADER.size) // RECORD.itemsize
+        self.records = numpy.frombuffer(self.mmap, dtype=RECORD, count=size,
+                                        offset=HEADER.size)
+        self.timestamps = self.records['timestamp']
+        self.values = self.records['value']
+
+    def __len__(self):
+        return len(self.records)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Release the mapping. Views obtained from this store hold it too,
+           so that they stay valid: the file is unmapped once the last of
+           them is released."""
+
+        self.records = self.timestamps = self.values = self.mmap = None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print('Usage: seriesstore.py INPUT_SAMPLES OUTPUT_STORE')
+        sys.exit(1)
+    report = LoadReport()
+    convert(sys.argv[1], sys.argv[2], report=report)
+    print(report)
@@ -12,31 +12,75 @@
 # of the GNU Lesser General Public License along with this program.  If not,
 # see <http://www.gnu.org/licenses/>.
 
+import bisect
+
+
 class SuperList(list):
 
     """
     Simple custom list, extending original class to add some methods.
+
+    Queries rely on a sorted copy of the list, built on first use and kept
+    until the list is modified, so that successive queries only cost a
+    binary search.
     """
 
-    def __init__(self):
-        pass
+    def __init__(self, values=()):
+        list.__init__(self, values)
+        self.sorted_cache = None
+
+    def sorted_view(self):
+        """Get the sorted copy of the list, building it if needed."""
+
+        if self.sorted_cache is None:
+            self.sorted_cache = sorted(self)
+        return self.sorted_cache
 
     def percentage(self, percentage, reverse=False):
         """Get the value under/over which there are xx% of the values."""
 
-        sorted = list(self)
-        sorted.sort(reverse=reverse)
+        sorted = self.sorted_view()
         size = len(sorted)
         index = min(size - 1, int(size * float(percentage / 100.0)))
+        if reverse:
+            index = size - 1 - index
         return sorted[index]
 
+    def percentages(self, percentages, reverse=False):
+        """Get the value under/over which there are xx% of the values, for
+           each of the given percentages."""
+
+        return [self.percentage(p, reverse) for p in percentages]
+
     def percentage_lower_than(self, value):
-        sorted = list(self)
-        sorted.sort()
-        pos = 0
-        while pos < len(self) and sorted[pos] < value:
-            pos = pos + 1
+        pos = bisect.bisect_left(self.sorted_view(), value)
         return 100.0 * float(pos) / float(len(self))
 
+    def percentages_lower_than(self, values):
+        """Get the percentage of values lower than each of the given
+           values."""
+
+        return [self.percentage_lower_than(value) for value in values]
+
     def percentage_greater_than(self, value):
         return 100 - self.percentage_lower_than(value)
+
+
+def invalidating(name):
+    """Wrap a list method so that it drops the sorted copy of the list."""
+
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        self.sorted_cache = None
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+for name in ['append', 'extend', 'insert', 'remove', 'pop', 'reverse',
+             'sort', 'clear', '__setitem__', '__delitem__', '__iadd__',
+             '__imul__', '__setslice__', '__delslice__']:
+    if hasattr(list, name):
+        setattr(SuperList, name, invalidating(name))
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, parentdir)
+import random
+import tempfile
+import numpy
+import unittest
+from aggregation import HostMetricAggregator, Interner, parse_line, rescale
+
+# Same dump as samples/test-00.csv of mg.core tests
+TEST_00 = ['m1 1 3.0 h0\n', 'm1 1 4.0 h1\n', 'm1 1 5.0 h2\n',
+           'm2 1 5.0 h0\n', 'm2 1 2.0 h2\n', 'm2 1 6.0 h1\n']
+
+
+class AggregationTest(unittest.TestCase):
+
+    def test_interner(self):
+        interner = Interner()
+        self.assertEqual(interner.intern('b'), 0)
+        self.assertEqual(interner.intern_all(['a', 'b', 'a']).tolist(),
+                         [1, 0, 1])
+        self.assertEqual(interner.names, ['b', 'a'])
+        self.assertEqual(len(interner), 2)
+
+    def test_parse_line(self):
+        self.assertEqual(parse_line('m 1 2.5 h'), ('m', 'h', 2.5))
+        self.assertEqual(parse_line('put m 1 2.5 cpu=0 host=h'),
+                         ('m', 'h', 2.5))
+        self.assertRaises(ValueError, parse_line, 'm 1 2.5')
+        self.assertRaises(ValueError, parse_line, 'm 1 x h')
+
+    def test_matrix(self):
+        aggregator = HostMetricAggregator()
+        aggregator.add_lines(TEST_00)
+        self.assertEqual(aggregator.metrics.names, ['m1', 'm2'])
+        X, hosts, columns = aggregator.matrix(['sum'])
+        self.assertEqual(X.tolist(), [[3, 5], [4, 6], [5, 2]])
+        self.assertEqual(hosts, ['h0', 'h1', 'h2'])
+        self.assertEqual(columns, ['sum-m1', 'sum-m2'])
+        aggregator.add_lines(['m1 2 1.0 h0\n', 'm3 2 1.0 h1\n'])
+        X, hosts, columns = aggregator.matrix(['min', 'mean', 'max'])
+        self.assertEqual(hosts, ['h1'])
+        self.assertEqual(X.tolist(), [[4, 4, 4, 6, 6, 6, 1, 1, 1]])
+        self.assertEqual(aggregator.aggregate('mean')[0, :2].tolist(),
+                         [2.0, 5.0])
+        self.assertTrue(numpy.isnan(aggregator.aggregate('sum')[0, 2]))
+        self.assertRaises(ValueError, aggregator.aggregate, 'median')
+
+    def test_chunks(self):
+        """Chunked aggregation matches value by value aggregation, even
+           when arrays have to grow"""
+        rng = random.Random(42)
+        lines = ['m%d %d %s h%d\n' % (rng.randint(0, 9), i, rng.random(),
+                                     rng.randint(0, 99))
+                 for i in range(5000)]
+        lines[10] = 'put m1 10 0.5 host=h1 cpu=0\n'
+        lines[20] = 'bad line\n'
+        lines[30] = '\n'
+        path = os.path.join(tempfile.mkdtemp(), 'dump')
+        f = open(path, 'w')
+        f.write(''.join(lines))
+        f.close()
+        chunked = HostMetricAggregator(hosts=2, metrics=2).load(path, 700)
+        self.assertEqual(chunked.report.lines, 4999)
+        self.assertEqual(chunked.report.bad_lines, 1)
+        expected = HostMetricAggregator(hosts=2, metrics=2)
+        for line in lines:
+            try:
+                expected.add(*parse_line(line))
+            except ValueError:
+                pass
+        self.assertEqual(chunked.hosts.names, expected.hosts.names)
+        for name in ['sum', 'min', 'max', 'mean']:
+            self.assertTrue(numpy.allclose(chunked.aggregate(name),
+                                           expected.aggregate(name),
+                                           equal_nan=True), name)
+        os.remove(path)
+
+    def test_tagged_hosts(self):
+        """Tagged 4-field lines give the same host in both parsing paths"""
+        aggregator = HostMetricAggregator()
+        aggregator.add_lines(['m1 1 1.0 host=web01\n',
+                              'm2 1 2.0 host=web01\n'])
+        aggregator.add_lines(['m1 2 3.0 host=web01\n',
+                              'put m2 2 4.0 cpu=0 host=web01\n'])
+        aggregator.add_lines(['m1 3 5.0 web01\n', 'bad line\n'])
+        self.assertEqual(aggregator.hosts.names, ['web01'])
+        X, hosts, columns = aggregator.matrix(['sum'])
+        self.assertEqual(hosts, ['web01'])
+        self.assertEqual(X.tolist(), [[9, 6]])
+
+    def test_rescale(self):
+        X = rescale([[1.0, 5.0], [3.0, 5.0], [2.0, 5.0]])
+        self.assertEqual(X.tolist(), [[0.0, 0.0], [1.0, 0.0], [0.5, 0.0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, parentdir)
+import random
+import numpy
+import unittest
+from clustering import Dendrogram, linkage
+from approximateclustering import ApproximateClustering, Reservoir, \
+    assign, compare, rand_index
+
+
+class ApproximateClusteringTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(42)
+        self.X = numpy.array([[rng.gauss(0, 1) for j in range(3)]
+                              for i in range(300)])
+        self.X[:20] += 20
+
+    def test_reservoir(self):
+        counts = [0] * 20
+        for seed in range(500):
+            reservoir = Reservoir(5, seed)
+            for i in range(20):
+                reservoir.add(i * 10)
+            self.assertEqual(reservoir.seen, 20)
+            self.assertEqual(len(set(reservoir.indices)), 5)
+            self.assertEqual(reservoir.items,
+                             [i * 10 for i in reservoir.indices])
+            for i in reservoir.indices:
+                counts[i] += 1
+        # Every item is sampled with probability 1/4
+        for count in counts:
+            self.assertTrue(80 < count < 170, counts)
+        reservoir = Reservoir(5)
+        reservoir.add('a')
+        self.assertEqual(reservoir.items, ['a'])
+
+    def test_assign(self):
+        points = self.X[:50]
+        labels = numpy.arange(50) % 3
+        d = ((self.X[:, numpy.newaxis, :] - points[numpy.newaxis]) ** 2)
+        expected = labels[d.sum(axis=2).argmin(axis=1)]
+        self.assertEqual(assign(self.X, points, labels).tolist(),
+                         expected.tolist())
+        self.assertEqual(assign(self.X, points, labels, 'euclidean').tolist(),
+                         expected.tolist())
+
+    def test_rand_index(self):
+        self.assertEqual(rand_index([0, 0, 1, 1], [1, 1, 0, 0]), (1.0, 1.0))
+        self.assertEqual(rand_index([0, 0, 1, 1], [0, 0, 0, 1]), (0.5, 0.0))
+        self.assertEqual(rand_index([0], [3]), (1.0, 1.0))
+
+    def test_whole_sample_is_exact(self):
+        model = ApproximateClustering(3, sample_size=1000)
+        for vector in self.X:
+            model.add(vector)
+        self.assertEqual(len(model), 300)
+        indices, points = model.sample()
+        self.assertEqual(indices.tolist(), list(range(300)))
+        self.assertEqual(points.tolist(), self.X.tolist())
+        dendrogram = model.dendrogram()
+        expected = Dendrogram(linkage(self.X, 'median', 'sqeuclidean'))
+        for k in [2, 5]:
+            self.assertEqual(model.labels(dendrogram, self.X, k).tolist(),
+                             expected.cut(k).tolist())
+        self.assertRaises(ValueError, model.add, [1.0])
+
+    def test_sample(self):
+        model = ApproximateClustering(3, sample_size=50, seed=1)
+        for vector in self.X:
+            model.add(vector)
+        dendrogram = model.dendrogram()
+        self.assertEqual(len(dendrogram.Z), 49)
+        # Only the sample is kept
+        self.assertEqual(len(dendrogram.data['points']), 50)
+        labels = numpy.concatenate([model.labels(dendrogram, block)
+                                    for block in numpy.split(self.X, 3)])
+        self.assertEqual(len(labels), 300)
+        # The shifted points are well apart: they are found anyway
+        self.assertEqual(sorted(numpy.bincount(labels)), [20, 280])
+        report = compare(self.X, 50, seed=1)
+        self.assertEqual(report['adjusted_rand_index'], 1.0)
+        self.assertEqual(report['sample'], 50)
+        report = compare(self.X, 50, labels=numpy.zeros(300, dtype=int))
+        self.assertEqual(report['approximate_sizes'], [300])
+        self.assertEqual(report['adjusted_rand_index'], 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, parentdir)
+import shutil
+import tempfile
+import batchanalyzer
+import unittest
+
+SAMPLES = os.path.join(parentdir, '..', '..', '..', 'samples',
+                       'simple-metrics')
+
+
+class BatchAnalyzerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output)
+
+    def test_find_series(self):
+        paths = batchanalyzer.find_series([SAMPLES])
+        self.assertEqual(len(paths), 6)
+        paths = batchanalyzer.find_series(
+            [os.path.join(SAMPLES, 'load*.sample'),
+             os.path.join(SAMPLES, 'load100.sample'),
+             os.path.join(SAMPLES, 'missing.sample')])
+        self.assertEqual([batchanalyzer.series_name(p) for p in paths],
+                         ['load-avg', 'load100', 'load1000'])
+
+    def test_series_names(self):
+        paths = batchanalyzer.find_series([SAMPLES])
+        self.assertEqual(batchanalyzer.series_names(paths),
+                         [batchanalyzer.series_name(p) for p in paths])
+        paths = [os.path.join('data', 'web01', 'load.sample'),
+                 os.path.join('data', 'web02', 'load.sample'),
+                 os.path.join('data', 'web02', 'disk', 'sda.sample')]
+        self.assertEqual(batchanalyzer.series_names(paths),
+                         ['web01.load', 'web02.load', 'web02.disk.sda'])
+        paths.append(os.path.join('data', 'web01', 'load.txt'))
+        self.assertRaises(ValueError, batchanalyzer.series_names, paths)
+
+    def test_same_basename(self):
+        for host in ['web01', 'web02']:
+            os.mkdir(os.path.join(self.output, host))
+            shutil.copy(os.path.join(SAMPLES, 'load100.sample'),
+                        os.path.join(self.output, host))
+        paths = batchanalyzer.find_series([os.path.join(self.output, '*',
+                                                        '*.sample')])
+        rows = batchanalyzer.run(paths, self.output, workers=1)
+        self.assertEqual([row['series'] for row in rows],
+                         ['web01.load100', 'web02.load100'])
+        for row in rows:
+            self.assertTrue(os.path.exists(os.path.join(
+                self.output, row['series'] + '.anomalies.dat')))
+
+    def test_run(self):
+        paths = batchanalyzer.find_series([SAMPLES])
+        rows = batchanalyzer.run(paths, self.output, workers=2)
+        self.assertEqual([row['series'] for row in rows],
+                         sorted(batchanalyzer.series_name(p) for p in paths))
+        # Same results as when analyzing series one by one
+        for path, row in zip(paths, rows):
+            self.assertEqual(row, batchanalyzer.analyze(path, self.output))
+        f = open(os.path.join(self.output, 'summary.tsv'))
+        lines = f.readlines()
+        f.close()
+        self.assertEqual(len(lines), 7)
+        self.assertEqual(lines[0].split(), batchanalyzer.COLUMNS)
+        f = open(os.path.join(self.output, 'load100.anomalies.dat'))
+        anomalies = f.readlines()
+        f.close()
+        self.assertEqual(len(anomalies), rows[2]['anomalies'])
+        self.assertEqual(rows[2]['samples'], 100)
+
+    def test_aligned(self):
+        for host in ['web01', 'web02']:
+            os.mkdir(os.path.join(self.output, host))
+            shutil.copy(os.path.join(SAMPLES, 'load-avg.sample'),
+                        os.path.join(self.output, host))
+        paths = batchanalyzer.find_series([os.path.join(self.output, '*',
+                                                        '*.sample')])
+        rows = batchanalyzer.run_aligned(paths, self.output)
+        # Same results as when analyzing series one by one
+        names = batchanalyzer.series_names(paths)
+        for path, name, row in zip(paths, names, rows):
+            self.assertEqual(row, batchanalyzer.analyze(path, self.output,
+                                                        name=name))
+        self.assertTrue(rows[0]['anomalies'] > 0)
+        paths.append(os.path.join(SAMPLES, 'load100.sample'))
+        self.assertRaises(ValueError, batchanalyzer.run_aligned, paths,
+                          self.output)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, parentdir)
+import math
+import random
+import unittest
+from numericringbuffer import NumericRingBuffer
+from bucketwindow import Bucket, BucketWindow
+
+
+def naive(points, start, end):
+    """Bucket of the points whose timestamp is in [start, end)"""
+
+    bucket = Bucket()
+    for t, x in points:
+        if start <= t < end:
+            bucket.add(x, x)
+    return bucket
+
+
+class BucketWindowTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(42)
+        self.points = []
+        t = 1341056580
+        for i in range(3000):
+            # Regular 5 seconds samples, with a few long gaps
+            t += 5 if rng.random() > 0.01 else rng.randint(60, 3000)
+            self.points.append((t, float(rng.randint(0, 20))))
+
+    def assertSameBucket(self, actual, expected):
+        self.assertEqual(actual.count, expected.count)
+        self.assertEqual(actual.min(), expected.min())
+        self.assertEqual(actual.max(), expected.max())
+        self.assertEqual(actual.histogram, expected.histogram)
+        for name in ['mean', 'variance', 'expected_value', 'shannon_entropy']:
+            self.assertAlmostEqual(getattr(actual, name)(),
+                                   getattr(expected, name)(), 9)
+
+    def test_merge(self):
+        buffer = NumericRingBuffer(100)
+        buckets = [Bucket(), Bucket(), Bucket()]
+        for i, x in enumerate([4, 8, 15, 16, 23, 42, 8, 8]):
+            buckets[i % 3].add(x, x)
+            buffer.append(x)
+        result = Bucket()
+        for bucket in buckets:
+            result.merge(bucket)
+        self.assertEqual(result.count, 8)
+        self.assertEqual(result.sum(), 124)
+        self.assertAlmostEqual(result.mean(), buffer.mean())
+        self.assertAlmostEqual(result.variance(), buffer.variance())
+        self.assertAlmostEqual(result.shannon_entropy(),
+                               buffer.shannon_entropy())
+        self.assertEqual((result.min(), result.max()), (4, 42))
+
+    def test_windows(self):
+        window = BucketWindow([(5, 3000), (60, 300), (900, 100)])
+        for t, x in self.points:
+            window.append(x, t)
+        end = (self.points[-1][0] // 5 + 1) * 5
+        for length in [5, 60, 300, 900, 3600, 4 * 3600]:
+            self.assertSameBucket(window.window(length),
+                                  naive(self.points, end - length, end))
+        # A long window is mostly made of coarse buckets
+        runs = window.plan((end - 4 * 3600) // 5, end // 5)
+        self.assertTrue(sum(b - a + 1 for level, a, b in runs) < 60)
+        for past in [self.points[-1][0] - 600, self.points[2000][0] + 3]:
+            past_end = int(math.ceil(past / 5.0)) * 5
+            self.assertSameBucket(
+                window.window(1800, past),
+                naive(self.points, past_end - 1800, past_end))
+        vector = window.features([60, 900])
+        self.assertEqual(len(vector), 8)
+        bucket = window.window(900)
+        self.assertEqual(window.features([900], ['std', 'range']),
+                         [bucket.variance() ** 0.5,
+                          bucket.max() - bucket.min()])
+        self.assertRaises(ValueError, window.features, [60], ['slope'])
+        self.assertRaises(ValueError, window.features, [60], ['nope'])
+
+    def test_forgotten_edges(self):
+        """Fine buckets at the start of a long window are forgotten: the
+           window starts at the start of a coarser bucket"""
+        window = BucketWindow([(5, 12), (60, 5), (300, 10)])
+        points = [(t, float(t % 7)) for t in range(0, 3000, 5)]
+        for t, x in points:
+            window.append(x, t)
+        self.assertSameBucket(window.window(60), naive(points, 2940, 3000))
+        self.assertSameBucket(window.window(250), naive(points, 2700, 3000))
+        self.assertSameBucket(window.window(1000),
+                              naive(points, 1800, 3000))
+        self.assertRaises(ValueError, window.window, 3600)
+
+    def test_gaps(self):
+        window = BucketWindow([(5, 10), (60, 10)])
+        window.append(1, 0)
+        window.append(2, 5)
+        window.append(3, 1000)
+        self.assertEqual(window.window(5).count, 1)
+        self.assertEqual(window.window(60).count, 1)
+        self.assertEqual(window.window(1005).count, 3)
+        # Late values are added to their bucket, when there is one
+        window.append(4, 1001)
+        window.append(5, 7)
+        window.append(6, 300)
+        self.assertEqual(window.window(5).mean(), 3.5)
+        self.assertEqual(window.window(1005).count, 5)
+        self.assertEqual(window.dropped, 1)
+        self.assertEqual(BucketWindow().window(60).count, 0)
+
+    def test_resolutions(self):
+        self.assertRaises(ValueError, BucketWindow, [(5, 10), (12, 10)])
+        self.assertRaises(ValueError, BucketWindow, [(60, 10), (5, 10)])
+        self.assertRaises(ValueError, BucketWindow, [(5, 10), (5, 10)])
+        window = BucketWindow([(0.5, 10), (1, 10)], blur=2)
+        window.append(1.1, 0.2)
+        window.append(2.9, 0.7)
+        self.assertEqual(window.window(1).histogram, {2.0: 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, parentdir)
+import random
+import shutil
+import tempfile
+import numpy
+from clustering import Dendrogram, leaf_labels, linkage, to_tree
+import unittest
+
+
+def clusters_of(Z, n):
+    """Set of (members, distance) of the clusters built by Z"""
+
+    members = [frozenset([i]) for i in range(n)]
+    result = set()
+    for a, b, d, size in Z:
+        merged = members[int(a)] | members[int(b)]
+        assert len(merged) == size
+        members.append(merged)
+        result.add((merged, round(d, 9)))
+    return result
+
+
+def naive_linkage(X, method):
+    """Merge the closest pair of clusters, scanning all of them each time.
+       Median linkage is the algorithm of the original classifier."""
+
+    n = len(X)
+    sq = lambda v, w: ((v - w) ** 2).sum()
+    points = [numpy.array(x) for x in X]
+    clusters = [(frozenset([i]), points[i]) for i in range(n)]
+    result = set()
+
+    def distance(c1, c2):
+        if method == 'median':
+            return sq(c1[1], c2[1])
+        d = [numpy.sqrt(sq(points[i], points[j]))
+             for i in c1[0] for j in c2[0]]
+        return {'single': min, 'complete': max,
+                'average': lambda d: sum(d) / len(d)}[method](d)
+
+    while len(clusters) > 1:
+        best = None
+        for i in range(len(clusters)):
+            for j in range(i + 1, len(clusters)):
+                d = distance(clusters[i], clusters[j])
+                if best is None or d < best[0]:
+                    best = (d, i, j)
+        d, i, j = best
+        merged = (clusters[i][0] | clusters[j][0],
+                  (clusters[i][1] + clusters[j][1]) / 2.0)
+        result.add((merged[0], round(d, 9)))
+        del clusters[j]
+        del clusters[i]
+        clusters.append(merged)
+    return result
+
+
+def partition(labels):
+    """Set of the groups of points of a flat clustering"""
+
+    groups = {}
+    for point, label in enumerate(labels):
+        groups.setdefault(label, set()).add(point)
+    return set(frozenset(group) for group in groups.values())
+
+
+class ClusteringTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(42)
+        self.X = numpy.array([[rng.gauss(0, 1) for j in range(4)]
+                              for i in range(40)])
+        self.X[:5] += 10
+
+    def test_same_tree_as_naive(self):
+        n = len(self.X)
+        for method, metric in [('single', 'euclidean'),
+                               ('complete', 'euclidean'),
+                               ('average', 'euclidean'),
+                               ('median', 'sqeuclidean')]:
+            Z = linkage(self.X, method, metric)
+            self.assertEqual(Z.shape, (n - 1, 4))
+            self.assertEqual(clusters_of(Z, n),
+                             naive_linkage(self.X, method), method)
+
+    def test_linkage_matrix(self):
+        n = len(self.X)
+        Z = linkage(self.X, 'average')
+        self.assertTrue((Z[:, 0] < Z[:, 1]).all())
+        self.assertTrue((numpy.diff(Z[:, 2]) >= 0).all())
+        self.assertEqual(Z[-1, 3], n)
+        # The 5 shifted points are merged with the others last
+        sizes = [Z[int(i) - n, 3] for i in Z[-1, :2]]
+        self.assertEqual(sorted(sizes), [5, n - 5])
+
+    def test_median_metrics(self):
+        Z1 = linkage(self.X, 'median', 'sqeuclidean')
+        Z2 = linkage(self.X, 'median', 'euclidean')
+        self.assertTrue((Z1[:, :2] == Z2[:, :2]).all())
+        self.assertTrue(numpy.allclose(Z1[:, 2], Z2[:, 2] ** 2))
+
+    def test_small_inputs(self):
+        self.assertEqual(linkage([[1.0]]).shape, (0, 4))
+        Z = linkage([[0.0], [3.0]])
+        self.assertEqual(Z.tolist(), [[0, 1, 3, 2]])
+        self.assertRaises(ValueError, linkage, self.X, 'ward')
+        self.assertRaises(ValueError, linkage, self.X, 'single', 'manhattan')
+
+    def test_leaf_labels(self):
+        n = len(self.X)
+        Z = linkage(self.X, 'average')
+        labels = leaf_labels(Z, Z[-1, :2])
+        self.assertEqual(sorted(labels[:5].tolist()), [labels[0]] * 5)
+        self.assertTrue((labels[5:] != labels[0]).all())
+        # Points out of the given clusters are labelled -1
+        labels = leaf_labels(Z, [int(Z[0, 0])])
+        self.assertEqual(labels.tolist().count(0), 1)
+        self.assertEqual(labels.tolist().count(-1), n - 1)
+        self.assertEqual(leaf_labels(numpy.zeros((0, 4)), [0]).tolist(), [0])
+
+    def test_to_tree(self):
+        Z = linkage([[0.0], [1.0], [5.0]], 'median', 'euclidean')
+        root = to_tree(Z, [[0.0], [1.0], [5.0]])
+        self.assertEqual((root.id, root.count), (4, 3))
+        self.assertEqual(root.left.id, 2)
+        self.assertFalse(root.is_leaf())
+        self.assertEqual(root.right.vec.tolist(), [0.5])
+        self.assertEqual(root.vec.tolist(), [2.75])
+        self.assertTrue(root.left.is_leaf())
+        self.assertEqual(root.distance, 4.5)
+
+    def test_deep_tree(self):
+        """Chained trees deeper than the recursion limit"""
+        n = 20000
+        Z = numpy.zeros((n - 1, 4))
+        Z[0] = [0, 1, 1, 2]
+        for i in range(1, n - 1):
+            Z[i] = [i + 1, n + i - 1, i + 1, i + 2]
+        labels = leaf_labels(Z, Z[-1, :2])
+        self.assertEqual(labels[-1], 0)
+        self.assertEqual(labels[:-1].tolist(), [1] * (n - 1))
+        node = to_tree(Z)
+        depth = 0
+        while not node.is_leaf():
+            node = node.right
+            depth += 1
+        self.assertEqual(depth, n - 1)
+
+    def test_cut(self):
+        n = len(self.X)
+        for method in ['average', 'median']:
+            dendrogram = Dendrogram(linkage(self.X, method, 'euclidean'))
+            Z = dendrogram.Z
+            self.assertEqual(dendrogram.cut(k=1).tolist(), [0] * n)
+            self.assertEqual(dendrogram.cut(k=n).tolist(), list(range(n)))
+            self.assertEqual(dendrogram.cut(k=2).tolist(),
+                             leaf_labels(Z, Z[-1, :2]).tolist())
+            for k in [3, 7]:
+                labels = dendrogram.cut(k=k)
+                self.assertEqual(sorted(set(labels)), list(range(k)))
+                # Same clusters as undoing the last k - 1 merges
+                groups = [frozenset([i]) for i in range(n)]
+                for a, b, d, size in Z[:n - k]:
+                    groups.append(groups[int(a)] | groups[int(b)])
+                    groups[int(a)] = groups[int(b)] = None
+                self.assertEqual(partition(labels),
+                                 set(g for g in groups if g))
+            for threshold in [-1, 0.5, 1.5, 3, 1e9]:
+                # Points are in the same cluster when joined by merges whose
+                # subtree is not higher than the threshold
+                owner = list(range(n))
+                find = lambda i: i if owner[i] == i else find(owner[i])
+                heights = dendrogram.cophenetic_heights()
+                members = [[i] for i in range(n)]
+                for i, (a, b, d, size) in enumerate(Z):
+                    members.append(members[int(a)] + members[int(b)])
+                    if heights[n + i] <= threshold:
+                        for point in members[-1]:
+                            owner[find(point)] = find(members[-1][0])
+                labels = dendrogram.cut(threshold=threshold)
+                self.assertEqual(partition(labels),
+                                 partition([find(i) for i in range(n)]))
+        self.assertRaises(ValueError, dendrogram.cut)
+        self.assertRaises(ValueError, dendrogram.cut, 2, 1.0)
+        self.assertRaises(ValueError, dendrogram.cut, 0)
+
+    def test_save_load(self):
+        folder = tempfile.mkdtemp()
+        path = os.path.join(folder, 'dendrogram.npz')
+        dendrogram = Dendrogram(linkage(self.X), {'numbers': range(40)})
+        dendrogram.save(path)
+        loaded = Dendrogram.load(path)
+        self.assertTrue((loaded.Z == dendrogram.Z).all())
+        self.assertEqual(loaded.data['numbers'].tolist(), list(range(40)))
+        self.assertEqual(loaded.cut(k=5).tolist(),
+                         dendrogram.cut(k=5).tolist())
+        shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, parentdir)
+import shutil
+import tempfile
+import unittest
+import collector
+from collector import Collector, ProcFile, SampleWriter
+from sampleloader import load
+import seriesstore
+
+LOADAVG = '0.32 0.27 0.16 1/71 17736\n'
+VMSTAT = 'nr_free_pages 806576\nnr_inactive_anon 49037\npgfault 4479976\n'
+MEMINFO = 'MemTotal:        6147400 kB\nMemFree:         4818892 kB\n' \
+    'HugePages_Total:       0\n'
+DISKSTATS = \
+    '   7       0 loop0 1 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0\n' \
+    ' 253       0 vda 9386 2818 676522 4165 6109 5383 285570 9011 2 ' \
+    '11596 13176 0 0 0 0 0 0\n'
+
+
+class CollectorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for name, data in [('loadavg', LOADAVG), ('vmstat', VMSTAT),
+                           ('meminfo', MEMINFO), ('diskstats', DISKSTATS)]:
+            self.write(name, data)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, data):
+        f = open(os.path.join(self.root, name), 'w')
+        f.write(data)
+        f.close()
+
+    def test_parse(self):
+        self.assertEqual(collector.parse_loadavg(LOADAVG)['load-avg-15'],
+                         0.16)
+        vmstat = collector.parse_vmstat(VMSTAT)
+        self.assertEqual(vmstat['vmstat_free'], 806576)
+        self.assertEqual(vmstat['vmstat_faults'], 4479976)
+        self.assertEqual(vmstat['vmstat_nr_inactive_anon'], 49037)
+        meminfo = collector.parse_meminfo(MEMINFO)
+        self.assertEqual(meminfo['meminfo_MemFree'], 4818892)
+        self.assertEqual(meminfo['meminfo_HugePages_Total'], 0)
+        diskstats = collector.parse_diskstats(DISKSTATS)
+        self.assertEqual(sorted(diskstats),
+                         ['diskstats_vda_in_flight', 'diskstats_vda_io_ticks',
+                          'diskstats_vda_reads', 'diskstats_vda_sectors_read',
+                          'diskstats_vda_sectors_written',
+                          'diskstats_vda_writes'])
+        self.assertEqual(diskstats['diskstats_vda_io_ticks'], 11596)
+
+    def test_reread(self):
+        path = os.path.join(self.root, 'loadavg')
+        f = ProcFile(path)
+        f.size = 4
+        self.assertEqual(f.read(), LOADAVG)
+        self.write('loadavg', '1.5 1 1 1/71 17736\n')
+        self.assertEqual(f.read(), '1.5 1 1 1/71 17736\n')
+        f.close()
+
+    def test_sample(self):
+        c = Collector(['load-avg', 'meminfo_Mem*'], self.root)
+        self.assertEqual(len(c.sources), 2)
+        self.assertEqual(c.sample(), {'load-avg': 0.32,
+                                      'meminfo_MemTotal': 6147400,
+                                      'meminfo_MemFree': 4818892})
+        self.write('loadavg', '2.5 1 1 1/71 17736\n')
+        self.assertEqual(c.sample()['load-avg'], 2.5)
+        c.close()
+        os.remove(os.path.join(self.root, 'diskstats'))
+        c = Collector(['*'], self.root)
+        self.assertEqual(len(c.sources), 3)
+        c.close()
+
+    def test_run(self):
+        output = tempfile.mkdtemp()
+        c = Collector(collector.DEFAULT_METRICS, self.root)
+        writer = SampleWriter(output, batch=2)
+        c.run(writer, interval=0.01, count=5)
+        c.close()
+        self.assertEqual(sorted(os.listdir(output)),
+                         ['diskstats_vda_io_ticks.sample', 'load-avg.sample',
+                          'vmstat_faults.sample', 'vmstat_free.sample'])
+        timestamps, values = load(os.path.join(output, 'load-avg.sample'))
+        self.assertEqual(list(values), [0.32] * 5)
+        self.assertTrue(all(t1 < t2 for t1, t2 in zip(timestamps,
+                                                      timestamps[1:])))
+        shutil.rmtree(output)
+
+    def test_store(self):
+        output = tempfile.mkdtemp()
+        writer = SampleWriter(output, store=True, batch=2)
+        for t in range(3):
+            writer.add(t, {'a': t * 2.0})
+        self.assertEqual(len(os.listdir(output)), 1)
+        writer.flush()
+        with seriesstore.SeriesStore(os.path.join(output, 'a.store')) as store:
+            self.assertEqual(list(store.timestamps), [0, 1, 2])
+            self.assertEqual(list(store.values), [0.0, 2.0, 4.0])
+        shutil.rmtree(output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, parentdir)
+import random
+import numpy
+import distances
+from distances import pdist, cdist, register_metric
+import unittest
+
+
+def naive_pdist(X, distance):
+    n = len(X)
+    return [distance(X[i], X[j]) for i in range(n) for j in range(i + 1, n)]
+
+
+class DistancesTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(42)
+        self.X = numpy.array([[rng.gauss(0, 1) for j in range(3)]
+                              for i in range(25)])
+
+    def test_metrics(self):
+        sq = lambda v, w: ((v - w) ** 2).sum()
+        cos = lambda v, w: 1 - v.dot(w) / numpy.sqrt(v.dot(v) * w.dot(w))
+        VI = numpy.linalg.inv(numpy.cov(self.X, rowvar=False))
+        maha = lambda v, w: numpy.sqrt((v - w).dot(VI).dot(v - w))
+        for metric, distance in [('sqeuclidean', sq),
+                                 ('euclidean', lambda v, w: sq(v, w) ** 0.5),
+                                 ('cosine', cos),
+                                 ('mahalanobis', maha)]:
+            self.assertTrue(numpy.allclose(pdist(self.X, metric),
+                                           naive_pdist(self.X, distance)),
+                            metric)
+
+    def test_mahalanobis_identity(self):
+        self.assertTrue(numpy.allclose(
+            pdist(self.X, 'mahalanobis', VI=numpy.eye(3)),
+            pdist(self.X, 'euclidean')))
+
+    def test_blocks(self):
+        expected = pdist(self.X, 'euclidean')
+        previous = distances.BLOCK_ELEMENTS
+        try:
+            for elements in [1, 100, 250]:
+                distances.BLOCK_ELEMENTS = elements
+                self.assertTrue(numpy.allclose(pdist(self.X), expected))
+                D = cdist(self.X[:7], self.X)
+                self.assertEqual(D.shape, (7, 25))
+                self.assertTrue(numpy.allclose(D[2, 3:], expected[47:69]))
+        finally:
+            distances.BLOCK_ELEMENTS = previous
+
+    def test_register(self):
+        register_metric('chebyshev', lambda A, B: abs(
+            A[:, numpy.newaxis, :] - B[numpy.newaxis, :, :]).max(axis=2))
+        self.assertTrue(numpy.allclose(
+            pdist(self.X, 'chebyshev'),
+            naive_pdist(self.X, lambda v, w: abs(v - w).max())))
+        self.assertRaises(ValueError, pdist, self.X, 'unknown')
+
+    def test_small_inputs(self):
+        self.assertEqual(len(pdist([[1.0, 2.0]])), 0)
+        self.assertEqual(pdist([[0.0, 0.0], [3.0, 4.0]]).tolist(), [5.0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, parentdir)
+import unittest
+from numericringbuffer import NumericRingBuffer
+from features import FEATURES, FeatureExtractor, register_feature
+
+
+class FeaturesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+
+        def counted(buffer, mean):
+            self.calls.append(buffer.appended)
+            return mean * 2
+
+        register_feature('double_mean', counted, ['mean'])
+
+    def tearDown(self):
+        del FEATURES['double_mean']
+
+    def test_default_features(self):
+        buf = NumericRingBuffer(5)
+        extractor = FeatureExtractor(buf)
+        for x in [4, 8, 15, 16, 23, 42]:
+            buf.append(x)
+        self.assertEqual(extractor.vector(),
+                         [buf.mean(), buf.shannon_entropy(),
+                          buf.variance(), buf.mean()])
+
+    def test_computed_once_per_tick(self):
+        buf = NumericRingBuffer(5)
+        extractor = FeatureExtractor(buf, ['double_mean', 'mean'])
+        buf.append(1)
+        buf.append(3)
+        self.assertEqual(extractor.vector(), [4.0, 2.0])
+        self.assertEqual(extractor.get('double_mean'), 4.0)
+        self.assertEqual(self.calls, [2])
+        buf.append(5)
+        self.assertEqual(extractor.vector(), [6.0, 3.0])
+        self.assertEqual(self.calls, [2, 3])
+
+    def test_lazy(self):
+        buf = NumericRingBuffer(5)
+        extractor = FeatureExtractor(buf, ['double_mean'])
+        buf.append(1)
+        self.assertEqual(extractor.get('mean'), 1.0)
+        self.assertEqual(self.calls, [])
+
+    def test_slope(self):
+        buf = NumericRingBuffer(4)
+        extractor = FeatureExtractor(buf, ['slope'])
+        for x in [100, 1, 3, 5, 7]:
+            buf.append(x)
+        self.assertAlmostEqual(extractor.get('slope'), 2.0)
+        buf.append(7)
+        self.assertAlmostEqual(extractor.get('slope'), 1.4)
+
+    def test_derived(self):
+        buf = NumericRingBuffer(4)
+        extractor = FeatureExtractor(buf, ['std', 'range'])
+        for x in [2, 4, 4, 6]:
+            buf.append(x)
+        self.assertAlmostEqual(extractor.vector()[0], 2 ** 0.5)
+        self.assertEqual(extractor.vector()[1], 4.0)
+
+    def test_unknown(self):
+        buf = NumericRingBuffer(4)
+        self.assertRaises(ValueError, FeatureExtractor, buf, ['nope'])
+        self.assertRaises(ValueError, register_feature, 'x',
+                          lambda b, y: y, ['nope'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, parentdir)
+import math
+import random
+import numpy
+import gaussian
+from gaussian import MultivariateGaussian, IncrementalGaussian
+import unittest
+
+
+def naive_pdf(X, mu, sigma):
+    n = len(mu)
+    A = X - mu
+    return (2 * math.pi) ** (-n / 2.0) * numpy.linalg.det(sigma) ** -0.5 * \
+        numpy.exp(-0.5 * (A.dot(numpy.linalg.inv(sigma)) * A).sum(axis=1))
+
+
+class MultivariateGaussianTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(42)
+        self.X = numpy.array([[rng.gauss(0, 1), rng.gauss(5, 2),
+                               rng.gauss(-1, 0.5)] for i in range(500)])
+        self.X[:, 1] += self.X[:, 0]
+
+    def test_estimation(self):
+        M = [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0], [7.0, 8.0, 9.0]]
+        model = MultivariateGaussian().fit(M)
+        self.assertEqual(model.mu.tolist(), [4.0, 5.0, 6.0])
+        self.assertEqual(model.sigma.tolist(), [[9.0] * 3] * 3)
+        model = MultivariateGaussian().fit([[6, 4], [2, 5], [5, 3]])
+        self.assertTrue(numpy.allclose(model.sigma,
+                                       [[13 / 3.0, -1.5], [-1.5, 1.0]]))
+
+    def test_pdf(self):
+        model = MultivariateGaussian().fit(self.X)
+        self.assertFalse(model.singular)
+        expected = naive_pdf(self.X, model.mu, model.sigma)
+        self.assertTrue(numpy.allclose(model.pdf(self.X), expected))
+        self.assertTrue(numpy.allclose(model.logpdf(self.X),
+                                       numpy.log(expected)))
+
+    def test_blocks(self):
+        model = MultivariateGaussian().fit(self.X)
+        expected = model.logpdf(self.X)
+        previous = gaussian.BLOCK_SIZE
+        try:
+            gaussian.BLOCK_SIZE = 7
+            self.assertTrue(numpy.allclose(model.logpdf(self.X), expected))
+        finally:
+            gaussian.BLOCK_SIZE = previous
+
+    def test_singular(self):
+        X = numpy.hstack((self.X, self.X[:, :1] * 2))
+        model = MultivariateGaussian().fit(X)
+        self.assertTrue(model.singular)
+        self.assertEqual(model.rank, 3)
+        p = model.logpdf(X)
+        self.assertTrue(numpy.isfinite(p).all())
+        # Same density as without the redundant feature, up to the scale
+        reference = MultivariateGaussian().fit(self.X).logpdf(self.X)
+        self.assertTrue(numpy.allclose(p - reference, p[0] - reference[0]))
+        model = MultivariateGaussian().fit([[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+        self.assertEqual(model.rank, 1)
+
+    def test_outliers(self):
+        X = numpy.vstack((self.X, [[0, 15, -1], [3, 0, -1]]))
+        model = MultivariateGaussian().fit(self.X)
+        self.assertEqual(model.outliers(X, 1e-6).tolist(), [500, 501])
+
+    def test_incremental(self):
+        model = IncrementalGaussian(3, prior=1e-12)
+        model.update_all(self.X)
+        batch = MultivariateGaussian().fit(self.X, ddof=0)
+        self.assertTrue(numpy.allclose(model.mu, batch.mu))
+        self.assertTrue(numpy.allclose(model.covariance(), batch.sigma))
+        self.assertTrue(numpy.allclose(model.sigma, batch.sigma))
+        self.assertTrue(numpy.allclose(model.logpdf(self.X),
+                                       batch.logpdf(self.X)))
+        self.assertEqual(model.outliers(self.X, 1e-6).tolist(),
+                         batch.outliers(self.X, 1e-6).tolist())
+
+    def test_forgetting(self):
+        forgetting = 0.99
+        model = IncrementalGaussian(3, forgetting=forgetting, prior=1e-12)
+        model.update_all(self.X)
+        weights = forgetting ** numpy.arange(len(self.X) - 1, -1, -1)
+        mu = (weights[:, numpy.newaxis] * self.X).sum(axis=0) / weights.sum()
+        A = self.X - mu
+        sigma = (weights[:, numpy.newaxis] * A).T.dot(A) / weights.sum()
+        self.assertTrue(numpy.allclose(model.mu, mu))
+        self.assertTrue(numpy.allclose(model.covariance(), sigma))
+        expected = MultivariateGaussian(mu, sigma).logpdf(self.X)
+        self.assertTrue(numpy.allclose(model.logpdf(self.X), expected))
+
+if __name__ == '__main__':
+    unittest.main()
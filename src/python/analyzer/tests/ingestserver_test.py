@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, parentdir)
+import io
+import socket
+import tempfile
+import unittest
+try:
+    import asyncio
+    import ingestserver
+    from ingestserver import IngestServer, StreamProtocol, parse_line
+except (ImportError, SyntaxError):
+    ingestserver = None
+
+
+class ThresholdModel(object):
+    """Labels vectors whose first feature is over a threshold"""
+
+    def classify(self, vector):
+        return int(vector[0] > 100)
+
+
+class FakeTransport(object):
+
+    def __init__(self):
+        self.reading = True
+
+    def pause_reading(self):
+        self.reading = False
+
+    def resume_reading(self):
+        self.reading = True
+
+
+@unittest.skipIf(ingestserver is None, 'asyncio is not available')
+class IngestServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.output = io.StringIO()
+        self.server = IngestServer(self.output, window_size=3,
+                                   features=['max'],
+                                   model_factory=ThresholdModel)
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_until(self, samples):
+        """Run the event loop until 'samples' samples are ingested"""
+        for i in range(500):
+            if self.server.samples >= samples:
+                break
+            self.loop.run_until_complete(asyncio.sleep(0.01))
+        self.assertEqual(self.server.samples, samples)
+
+    def test_parse_line(self):
+        self.assertEqual(parse_line('1341056580 1,12'),
+                         ('default', 1341056580, 1.12))
+        self.assertEqual(parse_line('load 1.5 10', 'x'), ('load', 10, 1.5))
+        self.assertEqual(parse_line('load 10 1.5 web01'),
+                         ('load{host=web01}', 10, 1.5))
+        self.assertEqual(parse_line('put load 10 1.5 host=a dc=b'),
+                         ('load{dc=b,host=a}', 10, 1.5))
+        for line in ['1341056580', 'put load 10', 'put load 10 1 host',
+                     'a b', 'load 10 1.5 web01 extra']:
+            self.assertRaises(ValueError, parse_line, line)
+
+    def test_routing(self):
+        self.server.ingest(['a 1 1', 'b 1 1', 'a 500 2', 'b 2 2', 'garbage',
+                            '', 'a 3 3', 'a 4 4', 'a 5 5'])
+        self.assertEqual(sorted(self.server.series), ['a', 'b'])
+        self.assertEqual(self.server.samples, 7)
+        self.assertEqual(self.server.anomalies, 3)
+        self.assertEqual(self.output.getvalue(), 'a 2 500.0\na 3 3.0\n'
+                         'a 4 4.0\n')
+        self.assertEqual(self.server.report.bad_lines, 1)
+
+    def test_max_series(self):
+        self.server.max_series = 2
+        self.server.ingest(['a 1 1', 'b 1 1', 'c 1 1', 'a 2 2'])
+        self.assertEqual(sorted(self.server.series), ['a', 'b'])
+        self.assertEqual(self.server.samples, 3)
+        self.assertEqual(self.server.report.bad_lines, 1)
+
+    def test_bounded_buffer(self):
+        protocol = StreamProtocol(self.server, self.loop, max_buffer=1000,
+                                  batch_size=100)
+        transport = FakeTransport()
+        protocol.connection_made(transport)
+        data = ''.join('%d %d\n' % (i, i % 7) for i in range(1000))
+        protocol.data_received(data.encode('ascii'))
+        self.assertFalse(transport.reading)
+        self.run_until(1000)
+        self.assertTrue(transport.reading)
+        self.assertEqual(len(protocol.buffer), 0)
+
+    def test_long_line(self):
+        protocol = StreamProtocol(self.server, self.loop)
+        protocol.connection_made(FakeTransport())
+        protocol.data_received(b'1' * (ingestserver.MAX_LINE + 1))
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertEqual(len(protocol.buffer), 0)
+        self.assertEqual(self.server.report.bad_lines, 1)
+
+    def test_tcp_client(self):
+        listeners = ingestserver.listen(self.loop, self.server, port=0,
+                                        udp_port=0)
+        port = listeners[0].sockets[0].getsockname()[1]
+        udp_port = listeners[1].get_extra_info('sockname')[1]
+        client = socket.create_connection(('127.0.0.1', port))
+        client.sendall(b'1 1\n2 2\n3 ')
+        client.sendall(b'500\n4 4\nload 1 5')
+        client.close()
+        self.run_until(5)
+        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        client.sendto(b'6 6\n7 7\n', ('127.0.0.1', udp_port))
+        client.close()
+        self.run_until(7)
+        for listener in listeners:
+            listener.close()
+        self.assertEqual(self.output.getvalue(),
+                         'default 3 500.0\ndefault 4 4.0\ndefault 6 6.0\n')
+        self.assertEqual(sorted(self.server.series), ['default', 'load'])
+
+    @unittest.skipIf(not hasattr(socket, 'AF_UNIX'), 'no unix sockets')
+    def test_unix_client(self):
+        path = os.path.join(tempfile.mkdtemp(), 'ingest.sock')
+        listeners = ingestserver.listen(self.loop, self.server,
+                                        unix_path=path)
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(path)
+        client.sendall(b'x 1 1\nx 500 2\n')
+        client.close()
+        self.run_until(2)
+        listeners[0].close()
+        os.remove(path)
+        self.assertEqual(self.output.getvalue(), 'x 2 500.0\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, parentdir)
+import random
+import numpy
+from numericringbuffer import NumericRingBuffer
+from features import FEATURES
+from multiringbuffer import MultiRingBuffer, MultiSeriesClassifier
+import unittest
+
+
+class MultiRingBufferTest(unittest.TestCase):
+
+    def check(self, buffer, singles):
+        for name in ['mean', 'variance', 'min', 'max', 'shannon_entropy',
+                     'expected_value', 'slope', 'trend_value',
+                     'residual_variance']:
+            expected = [getattr(single, name)() for single in singles]
+            self.assertTrue(numpy.allclose(getattr(buffer, name)(), expected),
+                            name)
+        for p in [0, 50, 90, 100]:
+            expected = [single.percentage(p) for single in singles]
+            self.assertEqual(buffer.percentage(p).tolist(), expected)
+
+    def test_same_as_numeric_ring_buffer(self):
+        rng = random.Random(42)
+        for size, blur in [(1, 0), (7, 0), (20, 0), (20, 0.5)]:
+            buffer = MultiRingBuffer(size, 3, blur=blur)
+            singles = [NumericRingBuffer(size, blur=blur) for i in range(3)]
+            t = 1.4e9
+            for i in range(100):
+                values = [rng.randint(0, 5), rng.gauss(1e6, 1),
+                          rng.random() * 4]
+                t += rng.choice([5, 5, 30])
+                buffer.append(values, t)
+                for single, value in zip(singles, values):
+                    single.append(value, t)
+                self.check(buffer, singles)
+            self.assertEqual(buffer.last().tolist(), values)
+
+    def test_features(self):
+        buffer = MultiRingBuffer(10, 2)
+        buffer.append([1, 5])
+        buffer.append([3, 5])
+        self.assertEqual(buffer.features().tolist(),
+                         [[2, 1, 1, 2], [5, 0, 0, 5]])
+        self.assertEqual(buffer.features(['range', 'std']).tolist(),
+                         [[2, 1], [0, 0]])
+        buffer.append([5, 6])
+        self.assertTrue(numpy.allclose(buffer.features(['slope',
+                                                        'trend_value']),
+                                       [[2, 5], [0.5, 6 - 1 / 6.0]]))
+        # Every registered feature is supported
+        self.assertEqual(buffer.features(sorted(FEATURES)).shape,
+                         (2, len(FEATURES)))
+
+    def test_empty(self):
+        buffer = MultiRingBuffer(10, 2)
+        self.assertEqual(buffer.min(), None)
+        self.assertEqual(buffer.max(), None)
+        self.assertEqual(buffer.percentage(50), None)
+        self.assertEqual(buffer.mean().tolist(), [0, 0])
+
+    def test_classifier(self):
+        rng = random.Random(42)
+        classifier = MultiSeriesClassifier(2)
+        self.assertEqual(classifier.add([0, 0]), None)
+        labels = []
+        for i in range(1000):
+            values = [rng.gauss(10, 1), rng.gauss(0, 1)]
+            if i == 800:
+                values[1] = 1000
+            labels.append(classifier.add(values))
+        self.assertEqual(labels[800].tolist(), [0, 1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -65,6 +65,59 @@ class NumericRingBufferTest(unittest.TestCase):
         buffer = NumericRingBuffer(10)
         self.assertEqual(buffer.variance(), 0)
 
+    def test_running_statistics(self):
+        buffer = NumericRingBuffer(10)
+        for x in [4, 8, 15, 16, 23, 42]:
+            buffer.append(x)
+        self.assertAlmostEqual(buffer.mean(), 18.0)
+        self.assertAlmostEqual(buffer.variance(), 910 / 6.0)
+        buffer = NumericRingBuffer(2)
+        for x in [1, 100, 3, 5]:
+            buffer.append(x)
+        self.assertEqual(buffer.mean(), 4)
+        self.assertEqual(buffer.variance(), 1)
+        self.assertEqual(buffer.min(), 3)
+        self.assertEqual(buffer.max(), 5)
+
+    def test_consistency(self):
+        """Incremental statistics must match the naive computations"""
+        import random
+        random.seed(42)
+        for size in [1, 2, 7, 50]:
+            buffer = NumericRingBuffer(size, check=True)
+            for i in range(500):
+                buffer.append(random.gauss(1e6, 10))
+                buffer.mean()
+                buffer.variance()
+                buffer.min()
+                buffer.max()
+                buffer.expected_value()
+            buffer = NumericRingBuffer(size, check=True)
+            for i in range(500):
+                buffer.append(random.randint(0, 20))
+                buffer.shannon_entropy()
+                buffer.shannon_entropy(10)
+                buffer.expected_value()
+
+    def test_blur(self):
+        buffer = NumericRingBuffer(10, blur=0.5, check=True)
+        for x in [1.1, 0.9, 1.2, 3.0]:
+            buffer.append(x)
+        self.assertEqual(sorted(buffer.distinct()), [1.0, 3.0])
+        self.assertEqual(buffer.p_x(1.05), 0.75)
+        self.assertEqual(buffer.count(1.1), 1)
+        self.assertAlmostEqual(buffer.expected_value(), 1.5)
+        expected = -0.75 * math.log(0.75, 2) - 0.25 * math.log(0.25, 2)
+        self.assertAlmostEqual(buffer.shannon_entropy(), expected)
+        self.assertEqual(buffer.shannon_entropy(blur=10), 0)
+
+    def test_check_mode(self):
+        buffer = NumericRingBuffer(10, check=True)
+        buffer.append(1)
+        buffer.append(2)
+        buffer.running_mean += 1.0
+        self.assertRaises(AssertionError, buffer.mean)
+
     def test_distribution(self):
         buffer = NumericRingBuffer(100)
         for i in range(100):
@@ -74,5 +127,80 @@ class NumericRingBufferTest(unittest.TestCase):
         self.assertEqual(buffer.percentage(100), 100)
         self.assertEqual(buffer.percentage(101), 100)
 
+    def test_view(self):
+        buffer = NumericRingBuffer(4)
+        self.assertEqual(buffer.view(), [])
+        for i in range(3):
+            buffer.append(i)
+        segments = buffer.view()
+        self.assertEqual(len(segments), 1)
+        self.assertEqual(segments[0].tolist(), [0, 1, 2])
+        for i in range(3, 6):
+            buffer.append(i)
+        segments = buffer.view()
+        self.assertEqual(len(segments), 2)
+        self.assertEqual(segments[0].tolist() + segments[1].tolist(),
+                         [2, 3, 4, 5])
+        self.assertFalse(segments[0].flags.owndata)
+
+    def test_min_max(self):
+        buffer = NumericRingBuffer(3)
+        self.assertEqual(buffer.min(), None)
+        self.assertEqual(buffer.max(), None)
+        for x in [4, -2, 7, 1]:
+            buffer.append(x)
+        self.assertEqual(buffer.min(), -2)
+        self.assertEqual(buffer.max(), 7)
+
+    def test_sliding_distribution(self):
+        import random
+        random.seed(42)
+        buffer = NumericRingBuffer(50, check=True)
+        for i in range(20):
+            buffer.append(random.random())
+        buffer.percentage(50)
+        for i in range(500):
+            buffer.append(random.random())
+            for p in [0, 50, 90, 99, 100]:
+                buffer.percentage(p)
+        self.assertEqual(buffer.sort(), sorted(buffer))
+        self.assertEqual(buffer.rank(-1), 0)
+        self.assertEqual(buffer.rank(2), 50)
+        self.assertEqual(buffer.percentage_lower_than(buffer.percentage(90)),
+                         90)
+
+    def test_trend(self):
+        buffer = NumericRingBuffer(4)
+        for x in [100, 1, 3, 5, 7]:
+            buffer.append(x)
+        self.assertAlmostEqual(buffer.slope(), 2.0)
+        self.assertAlmostEqual(buffer.trend_value(), 7.0)
+        self.assertAlmostEqual(buffer.residual_variance(), 0.0)
+        # Irregular sampling: the slope follows timestamps, not positions
+        buffer = NumericRingBuffer(3)
+        for t, x in [(0, 9), (10, 1), (11, 2), (20, 3)]:
+            buffer.append(x, t)
+        self.assertAlmostEqual(buffer.slope(), 15 / 91.0)
+        self.assertAlmostEqual(buffer.trend_value(), 277 / 91.0)
+        self.assertAlmostEqual(buffer.residual_variance(), 32 / 91.0)
+        buffer = NumericRingBuffer(3)
+        buffer.append(1, 5)
+        buffer.append(2, 5)
+        self.assertEqual(buffer.slope(), 0.0)
+
+    def test_trend_consistency(self):
+        import random
+        random.seed(42)
+        for size in [2, 3, 7, 50]:
+            buffer = NumericRingBuffer(size, check=True)
+            t = 1.4e9
+            for i in range(500):
+                t += random.choice([10, 10, 10, 60])
+                buffer.append(random.gauss(1e3, 10) + i, t)
+                buffer.slope()
+                buffer.trend_value()
+                buffer.residual_variance()
+            self.assertTrue(abs(buffer.trend_value() - buffer.last()) < 100)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, parentdir)
+import random
+from onlineclustering import OnlineClustering
+import unittest
+
+
+class OnlineClusteringTest(unittest.TestCase):
+
+    def test_spikes(self):
+        rng = random.Random(42)
+        model = OnlineClustering()
+        labels = []
+        for i in range(2000):
+            vector = [rng.gauss(10, 1), rng.gauss(0, 0.1)]
+            if i % 500 == 499:
+                vector[0] += 50
+            labels.append(model.classify(vector))
+        self.assertEqual([labels[i] for i in range(499, 2000, 500)],
+                         [1, 1, 1, 1])
+        self.assertTrue(sum(labels) < 0.05 * len(labels))
+        self.assertTrue(model.clusters <= model.max_clusters)
+
+    def test_bounded_clusters(self):
+        model = OnlineClustering(max_clusters=3, threshold=0.5, warmup=0)
+        for i in range(100):
+            model.classify([float(i % 10)])
+        self.assertEqual(model.clusters, 3)
+        self.assertEqual(model.centroids.shape, (3, 1))
+        self.assertAlmostEqual(model.weights.sum(), 100)
+
+    def test_decay(self):
+        model = OnlineClustering(decay=0.5, warmup=0)
+        for i in range(10):
+            model.classify([1.0])
+        self.assertAlmostEqual(model.weights.sum(), 2.0, places=2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, parentdir)
+from quantilesketch import QuantileSketch
+from superlist import SuperList
+import random
+import unittest
+
+class QuantileSketchTest(unittest.TestCase):
+
+    def test_exact(self):
+        """Small inputs are not compacted and behave like a SuperList"""
+        sketch = QuantileSketch(k=200)
+        sl = SuperList()
+        for i in range(100):
+            sketch.append(100 - i)
+            sl.append(100 - i)
+        self.assertTrue(sketch.is_exact())
+        self.assertEqual(sketch.error(), 0)
+        for p in [0, 50, 90, 99, 100, 101]:
+            self.assertEqual(sketch.percentage(p), sl.percentage(p))
+            self.assertEqual(sketch.percentage(p, reverse=True),
+                             sl.percentage(p, reverse=True))
+        for v in [-1, 11, 33.3, 101]:
+            self.assertEqual(sketch.percentage_lower_than(v),
+                             sl.percentage_lower_than(v))
+
+    def test_bounded_error(self):
+        sketch = QuantileSketch(k=200, seed=42)
+        rng = random.Random(42)
+        n = 100000
+        for i in range(n):
+            sketch.append(rng.random())
+        self.assertEqual(len(sketch), n)
+        self.assertFalse(sketch.is_exact())
+        self.assertTrue(sketch.stored < 1000)
+        self.assertEqual(sketch.percentage(100), sketch.max)
+        error = sketch.error()
+        for p in [10, 50, 90, 99]:
+            self.assertTrue(abs(sketch.percentage(p) - p / 100.0) < error)
+            self.assertTrue(abs(sketch.percentage_lower_than(p / 100.0) - p)
+                            < 100 * error)
+
+    def test_merge(self):
+        a = QuantileSketch(k=100, seed=1)
+        b = QuantileSketch(k=100, seed=2)
+        for i in range(20000):
+            a.append(i)
+            b.append(20000 + i)
+        a.merge(b)
+        self.assertEqual(len(a), 40000)
+        self.assertEqual(a.min, 0)
+        self.assertEqual(a.max, 39999)
+        self.assertTrue(abs(a.percentage(50) - 20000) < 40000 * a.error())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -44,6 +44,8 @@ class RingBufferTest(unittest.TestCase):
         self.assertEqual(buffer[1], 42)
         buffer.append('33')
         self.assertEqual(buffer[1:3], ['21', 42])
+        self.assertEqual(buffer[1:], ['21', 42])
+        self.assertEqual(buffer[-2:], ['21', 42])
 
     def test_size(self):
         buffer = RingBuffer(10)
@@ -61,6 +63,27 @@ class RingBufferTest(unittest.TestCase):
         for i in buffer:
             self.assertTrue(buffer[i] is not None)
 
+    def test_wrap_around(self):
+        buffer = RingBuffer(3)
+        for i in range(7):
+            buffer.append(i)
+        self.assertEqual(buffer.size, 3)
+        self.assertEqual(buffer.last(), 6)
+        self.assertEqual(buffer.oldest(), 4)
+        self.assertEqual(list(buffer), [6, 5, 4])
+        self.assertEqual(buffer[0:3], [6, 5, 4])
+        self.assertEqual(buffer[1:], [5, 4])
+        self.assertRaises(IndexError, buffer.get, 3)
+        self.assertRaises(IndexError, buffer.get, -1)
+
+    def test_count(self):
+        buffer = RingBuffer(3)
+        self.assertEqual(buffer.count(None), 0)
+        for i in [1, 2, 1, 1]:
+            buffer.append(i)
+        self.assertEqual(buffer.count(1), 2)
+        self.assertEqual(buffer.count(2), 1)
+
     def test_distinct(self):
         buffer = RingBuffer(10)
         d = buffer.distinct()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, parentdir)
+import tempfile
+from sampleloader import LoadReport, load, iter_chunks
+import seriesstore
+import unittest
+
+SAMPLES = os.path.join(parentdir, '..', '..', '..', 'samples',
+                       'simple-metrics')
+
+
+class SampleLoaderTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.sample')
+        f = os.fdopen(fd, 'w')
+        f.write('1341056580 1,12\n1341056585 1.11\n\nnope\n'
+                '1341056590\n1341056595 x\n1341056600 2\n')
+        f.close()
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_load(self):
+        report = LoadReport()
+        timestamps, values = load(self.path, report=report)
+        self.assertEqual(list(timestamps), [1341056580, 1341056585,
+                                            1341056600])
+        self.assertEqual(list(values), [1.12, 1.11, 2])
+        self.assertEqual(report.lines, 6)
+        self.assertEqual(report.bad_lines, 3)
+        self.assertEqual(report.examples[0], (4, 'nope'))
+
+    def test_columns(self):
+        (values,) = load(self.path, columns=[1])
+        self.assertEqual(len(values), 3)
+
+    def test_chunks(self):
+        path = os.path.join(SAMPLES, 'load-avg.sample')
+        report = LoadReport()
+        chunks = list(iter_chunks(path, chunk_size=1000, report=report))
+        self.assertEqual([len(c[0]) for c in chunks], [1000, 1000, 821])
+        self.assertEqual(report.bad_lines, 0)
+        self.assertEqual(chunks[0][1][0], 1.12)
+        timestamps, values = load(path)
+        self.assertEqual(len(values), 2821)
+        self.assertEqual(values[-1], chunks[-1][1][-1])
+
+    def test_blank_chunk(self):
+        report = LoadReport()
+        f = open(self.path, 'w')
+        f.write('1 2\n3 4\n\n\n5 6 7\n')
+        f.close()
+        chunks = list(iter_chunks(self.path, chunk_size=2, report=report))
+        self.assertEqual([list(c[1]) for c in chunks], [[2, 4], [], [6]])
+        self.assertEqual(report.lines, 3)
+        self.assertEqual(report.bad_lines, 0)
+
+    def test_store(self):
+        fd, path = tempfile.mkstemp(suffix='.store')
+        os.close(fd)
+        try:
+            seriesstore.write(path, [10, 15, 20], [1.5, 2.5, -3])
+            timestamps, values = load(path)
+            self.assertFalse(values.flags.owndata)
+            chunks = list(iter_chunks(path, columns=[1], chunk_size=2))
+            self.assertEqual([list(c[0]) for c in chunks], [[1.5, 2.5], [-3]])
+        finally:
+            os.remove(path)
+        self.assertEqual(list(timestamps), [10, 15, 20])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+# This file is part of OpenGossip.
+#
+# This program is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.  This program is distributed in the hope that it
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser
+# General Public License for more details.  You should have received a copy
+# of the GNU Lesser General Public License along with this program.  If not,
+# see <http://www.gnu.org/licenses/>.
+
+import os
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0, parentdir)
+import tempfile
+import seriesstore
+from seriesstore import SeriesStore
+from sampleloader import LoadReport, load, iter_chunks
+from numericringbuffer import NumericRingBuffer
+import unittest
+
+SAMPLES = os.path.join(parentdir, '..', '..', '..', 'samples',
+                       'simple-metrics')
+
+
+class SeriesStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.ogts')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_write_read(self):
+        seriesstore.write(self.path, [10, 15, 20], [1.5, 2.5, -3])
+        self.assertTrue(seriesstore.is_store(self.path))
+        store = SeriesStore(self.path)
+        self.assertEqual(len(store), 3)
+        self.assertEqual(list(store.timestamps), [10, 15, 20])
+        self.assertEqual(list(store.values), [1.5, 2.5, -3])
+        self.assertFalse(store.values.flags.owndata)
+        seriesstore.append(self.path, [25], [4])
+        with SeriesStore(self.path) as store:
+            self.assertEqual(len(store), 4)
+            values = store.values
+        self.assertEqual(store.mmap, None)
+        # Views keep the mapping alive
+        self.assertEqual(list(values), [1.5, 2.5, -3, 4])
+
+    def test_empty(self):
+        seriesstore.write(self.path, [], [])
+        store = SeriesStore(self.path)
+        self.assertEqual(len(store), 0)
+        self.assertEqual(list(iter_chunks(self.path)), [])
+
+    def test_not_a_store(self):
+        path = os.path.join(SAMPLES, 'load-avg.sample')
+        self.assertFalse(seriesstore.is_store(path))
+        self.assertRaises(ValueError, SeriesStore, path)
+
+    def test_convert(self):
+        path = os.path.join(SAMPLES, 'load-avg.sample')
+        report = LoadReport()
+        seriesstore.convert(path, self.path, report=report)
+        self.assertEqual(report.lines, 2821)
+        expected = load(path)
+        report = LoadReport()
+        actual = load(self.path, report=report)
+        self.assertEqual(report.lines, 2821)
+        self.assertEqual(list(actual[0]), list(expected[0]))
+        self.assertEqual(list(actual[1]), list(expected[1]))
+        chunks = list(iter_chunks(self.path, [1], chunk_size=1000))
+        self.assertEqual([len(c[0]) for c in chunks], [1000, 1000, 821])
+        buffer = NumericRingBuffer(100)
+        buffer.extend(actual[1][-100:])
+        self.assertEqual(buffer.last(), expected[1][-1])
+        self.assertEqual(buffer.size, 100)
+
+if __name__ == '__main__':
+    unittest.main()
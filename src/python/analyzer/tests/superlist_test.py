@@ -49,5 +49,41 @@ class SuperListTest(unittest.TestCase):
         self.assertEqual(sl.percentage_greater_than(11), 90)
         self.assertEqual(sl.percentage_greater_than(101), 0)
 
+    def test_batch(self):
+        sl = SuperList(range(100, 0, -1))
+        self.assertEqual(sl.percentages([0, 90, 100]), [1, 91, 100])
+        self.assertEqual(sl.percentages([0, 90], reverse=True), [100, 10])
+        self.assertEqual(sl.percentages_lower_than([-1, 11, 101]),
+                         [0, 10, 100])
+
+    def test_invalidation(self):
+        sl = SuperList([3, 1, 2])
+        self.assertEqual(sl.percentage(0), 1)
+        sl.append(0)
+        self.assertEqual(sl.percentage(0), 0)
+        sl[0] = -5
+        self.assertEqual(sl.percentage(0), -5)
+        del sl[0]
+        self.assertEqual(sl.percentage(0), 0)
+        sl.extend([-1])
+        self.assertEqual(sl.percentage(0), -1)
+        sl += [-2]
+        self.assertEqual(sl.percentage(0), -2)
+        sl.pop()
+        sl.remove(-1)
+        self.assertEqual(sl.percentage(0), 0)
+        sl[0:2] = [-3]
+        self.assertEqual(sl.percentage(0), -3)
+        self.assertEqual(sl.percentage_lower_than(0), 50)
+
+    @unittest.skipUnless(hasattr(list, 'clear'), 'list.clear needs python 3')
+    def test_clear(self):
+        sl = SuperList([1, 2, 3])
+        self.assertEqual(sl.percentage(0), 1)
+        sl.clear()
+        sl.append(10)
+        self.assertEqual(sl.percentage(0), 10)
+        self.assertEqual(sl.percentage_lower_than(5), 0)
+
 if __name__ == '__main__':
     unittest.main()